@@ -17,6 +17,10 @@
 // custom movement for python goto, feedback for all actions
 // normalised name to ALT instead of DEC or DE
 // added fine focus
+// custom focus steps (Q W) for temperature compensation
+// guiding corrections (g): both axes at once, short answer, no delay
+// dew control (w): PWM duties of the rocker fans and of the polyimide heater, set by the odroid
+// profiled slews (m): both axes at once with the speed and acceleration planned by the odroid (odroid_motion.py)
 
 // focus connector:
 
@@ -88,6 +92,10 @@ DHT dht_intake(PIN_DHT22_intake, DHTTYPE); //// Initialize DHT sensor
 DHT dht_outflow(PIN_DHT22_outflow, DHTTYPE); //// Initialize DHT sensor
 DHT dht_eq_table(PIN_DHT22_eq_table, DHTTYPE); //// Initialize DHT sensor
 
+// PIN dew control (PWM, through MOSFETs)
+#define  PIN_FAN 44
+#define  PIN_HEATER 45
+
 // PIN Infra-Red
 #define IR_RECEIVE_PIN 5
 
@@ -170,6 +178,8 @@ int dir = 1;
 int posi = 1600;
 int previous_alt_dir = 0;
 int previous_azimut_dir = 0;
+int fan_duty = 0;
+int heater_duty = 0;
 
 ////////////////////////////////////// 
 // about acceleration
@@ -273,6 +283,63 @@ void fullstep() {
                digitalWrite(PIN_ALT_MS2, LOW);
 }
 
+// guiding correction: both axes move together, slowly, signed number of steps
+// answers GUIDE-DONE straight away so that the guiding loop is not slowed down
+void Guide(long az_steps, long alt_steps) {
+          digitalWrite(PIN_azimut_Sleep, HIGH);
+          digitalWrite(PIN_alt_Sleep, HIGH);
+          delay(2);   // driver wake up
+          AzimutStepper.setCurrentPosition(0);
+          AltStepper.setCurrentPosition(0);
+          AzimutStepper.setMaxSpeed(300.0);
+          AltStepper.setMaxSpeed(300.0);
+          AzimutStepper.setAcceleration(1000.0);
+          AltStepper.setAcceleration(1000.0);
+          AzimutStepper.moveTo(az_steps);
+          AltStepper.moveTo(alt_steps);
+          while ( (AzimutStepper.distanceToGo() != 0) || (AltStepper.distanceToGo() != 0) ) {
+            AzimutStepper.run();
+            AltStepper.run();
+          }
+          digitalWrite(PIN_azimut_Sleep, LOW);
+          digitalWrite(PIN_alt_Sleep, LOW);
+          Serial.println("GUIDE-DONE");
+          odroid_serial = ' ';
+}
+
+// profiled slew: both axes start and stop together, each with the speed and acceleration planned by the
+// odroid for its measured limits (same trapezoid scaled by the steps of each axis), 1/8 step like custom()
+// answers MOVE-DONE without the delays of the custom moves
+void Slew(long az_steps, long alt_steps, long az_speed, long alt_speed, long az_accel, long alt_accel) {
+          digitalWrite(PIN_AZ_MS1, HIGH);
+          digitalWrite(PIN_AZ_MS2, HIGH);
+          digitalWrite(PIN_ALT_MS1, HIGH);
+          digitalWrite(PIN_ALT_MS2, HIGH);
+          digitalWrite(LED_BUILTIN, LOW);
+          digitalWrite(PIN_azimut_Sleep, HIGH);
+          digitalWrite(PIN_alt_Sleep, HIGH);
+          delay(2);   // driver wake up
+          AzimutStepper.setCurrentPosition(0);
+          AltStepper.setCurrentPosition(0);
+          AzimutStepper.setMaxSpeed(az_speed);
+          AltStepper.setMaxSpeed(alt_speed);
+          AzimutStepper.setAcceleration(az_accel);
+          AltStepper.setAcceleration(alt_accel);
+          AzimutStepper.moveTo(az_steps);
+          AltStepper.moveTo(alt_steps);
+          while ( (AzimutStepper.distanceToGo() != 0) || (AltStepper.distanceToGo() != 0) ) {
+            AzimutStepper.run();
+            AltStepper.run();
+          }
+          digitalWrite(PIN_azimut_Sleep, LOW);
+          digitalWrite(PIN_alt_Sleep, LOW);
+          digitalWrite(LED_BUILTIN, HIGH);
+          if (az_steps != 0) { previous_azimut_dir = (az_steps > 0) ? 1 : -1; }
+          if (alt_steps != 0) { previous_alt_dir = (alt_steps > 0) ? 1 : -1; }
+          Serial.println("MOVE-DONE");
+          odroid_serial = ' ';
+}
+
 /// changed "int pos" to "int posi" ///
 void Alt(int dir, int posi) {
           AltStepper.setCurrentPosition(0);
@@ -381,6 +448,12 @@ void setup() {
   pinMode(PIN_ALT_MS1, OUTPUT);
   pinMode(PIN_ALT_MS2, OUTPUT);
 
+  // fans and heater off until the odroid sets them
+  pinMode(PIN_FAN, OUTPUT);
+  pinMode(PIN_HEATER, OUTPUT);
+  analogWrite(PIN_FAN, 0);
+  analogWrite(PIN_HEATER, 0);
+
 
 
 // set default step to 1/2 step ( key CH )
@@ -435,6 +508,8 @@ if (odroid_serial =='Y') {
   Serial.print("\"t_intake\":");Serial.print(t_intake);Serial.print(",");
   Serial.print("\"h_intake\":");Serial.print(h_intake);Serial.print(",");
   Serial.print("\"t_outflow\":");Serial.print(t_outflow);Serial.print(",");
+  Serial.print("\"fan\":");Serial.print(fan_duty);Serial.print(",");
+  Serial.print("\"heater\":");Serial.print(heater_duty);Serial.print(",");
   Serial.print("\"h_outflow\":");Serial.println(h_outflow);
   delay(1000);
   odroid_serial = ' ';
@@ -532,6 +607,96 @@ if (odroid_serial =='K') {
     }
  }
 
+//////////// guiding ////////////
+// g followed by "az,alt\n" (signed steps), e.g. g-12,40
+
+if (odroid_serial =='g') {
+    String line = Serial.readStringUntil('\n');
+    int comma = line.indexOf(',');
+    if (comma > 0) {
+      long az_steps = line.substring(0, comma).toInt();
+      long alt_steps = line.substring(comma + 1).toInt();
+      Guide(az_steps, alt_steps);
+    }
+    else {
+      Serial.println("GUIDE-ERROR");
+    }
+    odroid_serial = ' ';
+ }
+
+//////////// profiled slew ////////////
+// m followed by "az,alt,az_speed,alt_speed,az_accel,alt_accel\n" (signed steps, steps/s, steps/s²)
+// e.g. m-12000,3000,1200,300,1500,375
+
+if (odroid_serial =='m') {
+    String line = Serial.readStringUntil('\n');
+    long values[6];
+    int count = 0;
+    int start = 0;
+    while (count < 6) {
+      int comma = line.indexOf(',', start);
+      if (comma < 0) {
+        values[count++] = line.substring(start).toInt();
+        break;
+      }
+      values[count++] = line.substring(start, comma).toInt();
+      start = comma + 1;
+    }
+    if (count == 6 && values[2] > 0 && values[3] > 0 && values[4] > 0 && values[5] > 0) {
+      Slew(values[0], values[1], values[2], values[3], values[4], values[5]);
+    }
+    else {
+      Serial.println("MOVE-ERROR");
+    }
+    odroid_serial = ' ';
+ }
+
+//////////// dew control ////////////
+// w followed by "fan,heater\n" (PWM duties 0-255), e.g. w255,96
+
+if (odroid_serial =='w') {
+    String line = Serial.readStringUntil('\n');
+    int comma = line.indexOf(',');
+    if (comma > 0) {
+      fan_duty = constrain(line.substring(0, comma).toInt(), 0, 255);
+      heater_duty = constrain(line.substring(comma + 1).toInt(), 0, 255);
+      analogWrite(PIN_FAN, fan_duty);
+      analogWrite(PIN_HEATER, heater_duty);
+      Serial.println("DEW-DONE");
+    }
+    else {
+      Serial.println("DEW-ERROR");
+    }
+    odroid_serial = ' ';
+ }
+
+//////////// custom focus for temperature compensation ////////////
+// Q (in) and W (out) followed by the number of half steps, same handshake as O P K L
+
+if (odroid_serial =='Q' || odroid_serial =='W') {
+    String steps = "";
+    String message_to_odroid = "";
+    int focus_dir = 1;
+    if (odroid_serial =='Q') { focus_dir = -1; }
+    while (Serial.available() == 0) {}
+    steps = Serial.readString();
+    if (steps == "") {
+      message_to_odroid = "steps is empty";
+    }
+    else {
+    steps.trim();
+    int gosteps = steps.toInt();
+    if (focus_dir == 1) { message_to_odroid = "start FOCUS+" + steps; }
+    else { message_to_odroid = "start FOCUS-" + steps; }
+    delay(200);
+    Serial.println(message_to_odroid);   // send back to Odroid to check it's OK
+    delay(200);
+    //move slowly, these are small corrections
+    Focus(focus_dir,gosteps,300);
+    odroid_serial = ' '; // rien
+    }
+ }
+
 //////////// slow ////////////
 // if odroid requests azimut run CCW
 if (odroid_serial =='X') {
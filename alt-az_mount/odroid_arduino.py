@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+
+## about this script
+# serial link with the arduino Mega of the rocker, without any GUI
+# can be imported by the GUI scripts or by background services (focus compensation, ...)
+# the protocol is the one of arduino_altaz_stepper_bigeasydriver.ino:
+#       one letter per command (Y = sensors, F G R T N B = focus, S X Z A V C I H D E U J = moves)
+#       O P K L (moves) and Q W (focus) are followed by a number of steps
+#       the arduino answers "start ..." then "ARDUINO-DONE" when a move is finished
+#       g is followed by "az,alt\n" (signed steps, guiding), the arduino answers "GUIDE-DONE"
+#       w is followed by "fan,heater\n" (PWM duties 0-255, dew control), the arduino answers "DEW-DONE"
+#       m is followed by "az,alt,az_speed,alt_speed,az_accel,alt_accel\n" (slew planned by odroid_motion.py,
+#           signed steps, steps/s, steps/s²), the arduino answers "MOVE-DONE" when both axes have arrived
+# moves, custom steps, slews, guiding and sensor requests are timed spans (odroid_trace.py)
+# g, w and m wait for their answer until a deadline and raise TimeoutError (an arduino that was not
+#   reflashed ignores them, an answer can be lost): the serial lines are opened without timeout
+
+## functions:
+
+# open_arduino          open the serial line if the arduino is connected, returns None otherwise
+# MountLink             wraps the serial line: sensors, focus steps, custom moves, slews, guiding corrections,
+#                           fans and heater
+# as_link               MountLink of an opened serial line, a link of the mount worker as it is
+
+
+######################
+## import modules ####
+######################
+
+import serial               # arduino communication
+import json                 # handle arduino data
+from pathlib import Path    # check if device exists
+from time import monotonic, sleep  # delay between command and steps, deadline of the answers
+from odroid_motion import trapezoid_time  # planned duration of a slew
+import odroid_trace as trace    # timed spans of the commands
+
+
+ARDUINO_PORT = "/dev/ttyACM0"
+
+# s to wait for GUIDE-DONE and DEW-DONE, and after the planned duration of a slew for MOVE-DONE
+GUIDE_TIMEOUT = 10
+DEW_TIMEOUT = 5
+SLEW_MARGIN = 10
+
+
+######################
+####  functions  #####
+######################
+
+def open_arduino(port=ARDUINO_PORT, timeout=.5):
+    """
+    open the serial line (device, baud rate) and clear it
+    returns None if the arduino is not connected
+    """
+    if not Path(port).exists():
+        return None
+    ser = trace.TracedSerial(serial.Serial(port, 9600, timeout=timeout), "mega")
+    ser.flushInput()
+    return ser
+
+
+class MountLink:
+    """
+    commands sent to the arduino Mega through an already opened serial line
+    """
+
+    def __init__(self, ser):
+        self.ser = ser
+
+    def send(self, command):
+        """
+        send a single letter command, does not wait for the arduino
+        """
+        self.ser.write(bytes(command, 'UTF-8'))
+
+    def readline(self):
+        """
+        wait until the arduino sends something and return the line without \r\n
+        """
+        # blocks in the read (timeout of the serial line) instead of polling inWaiting(): a polling
+        # loop at the real time priority of the mount would keep its core from the USB driver
+        line = self.ser.readline()
+        while not line:
+            line = self.ser.readline()
+        return line.decode('utf-8').strip()
+
+    def wait_for(self, answers, timeout):
+        """
+        lines of the arduino until one of answers, which is returned
+        raises TimeoutError if none has come after timeout seconds
+        """
+        deadline = monotonic() + timeout
+        # the pyserial line, under odroid_trace.TracedSerial: its timeout bounds each read
+        port = getattr(self.ser, "ser", self.ser)
+        saved = getattr(port, "timeout", None)
+        try:
+            while True:
+                left = deadline - monotonic()
+                if left <= 0:
+                    raise TimeoutError("no {} from the arduino after {:.0f} s".format(" or ".join(answers), timeout))
+                if hasattr(port, "timeout"):
+                    port.timeout = left if saved is None else min(left, saved)
+                line = self.ser.readline().decode('utf-8').strip()
+                if line in answers:
+                    return line
+        finally:
+            if hasattr(port, "timeout") and port.timeout != saved:
+                port.timeout = saved
+
+    def wait_for_arduino(self):
+        """
+        wait for the next message of the arduino ("start ..." or "ARDUINO-DONE") and return it
+        """
+        return self.readline()
+
+    def move(self, command):
+        """
+        preset move (slow, normal or fast letter), returns when the arduino says it's done
+        """
+        with trace.span("mount.move", command=command) as s:
+            self.send(command)
+            sleep(0.5)
+            answer = self.wait_for_arduino()
+            if answer == "ARDUINO-DONE":
+                sleep(1)
+            self.ser.flushInput()
+            s["answer"] = answer
+        return answer
+
+    def move_steps(self, command, steps):
+        """
+        custom move (O P K L), returns when the move is done
+        """
+        return self.send_steps(command, steps)
+
+    def settle(self, seconds):
+        """
+        let the tube stop vibrating before the next move or image
+        """
+        sleep(seconds)
+
+    def send_steps(self, command, steps):
+        """
+        custom move: letter followed by the number of steps
+        the arduino confirms the number of steps, then says when the move is done
+        returns the two messages
+        """
+        with trace.span("mount.steps", command=command, steps=abs(int(steps))):
+            self.ser.flushInput()   # old ARDUINO-DONE lines of the GUI buttons
+            self.send(command)
+            sleep(0.1)
+            self.ser.write(bytes(str(abs(int(steps))), 'UTF-8'))
+            sleep(1.3)
+            with trace.span("mount.wait_start"):
+                started = self.wait_for_arduino()  # confirms stepper start moving
+            with trace.span("mount.wait_done"):
+                done = self.wait_for_arduino()     # confirms stepper finished
+        return started, done
+
+    def focus_steps(self, steps):
+        """
+        move the focus by a number of half steps, positive like the focus + buttons (W), negative like - (Q)
+        """
+        if steps == 0:
+            return None
+        if steps > 0:
+            return self.send_steps('W', steps)
+        return self.send_steps('Q', steps)
+
+    def guide(self, az_steps, alt_steps):
+        """
+        small correction on both axes at once (signed steps), returns when the move is done
+        """
+        with trace.span("mount.guide", az=int(az_steps), alt=int(alt_steps)) as s:
+            self.ser.write(bytes("g{},{}\n".format(int(az_steps), int(alt_steps)), 'UTF-8'))
+            answer = self.wait_for(("GUIDE-DONE", "GUIDE-ERROR"), GUIDE_TIMEOUT)
+            s["answer"] = answer
+        return answer == "GUIDE-DONE"
+
+    def slew(self, az_steps, alt_steps, az_speed, alt_speed, az_acceleration, alt_acceleration):
+        """
+        both axes at once with the profile of odroid_motion.plan_slew (signed steps), returns when they
+        have arrived
+        """
+        with trace.span("mount.slew", az=int(az_steps), alt=int(alt_steps)) as s:
+            self.ser.flushInput()   # old ARDUINO-DONE lines of the GUI buttons
+            self.ser.write(bytes("m{},{},{},{},{},{}\n".format(int(az_steps), int(alt_steps), int(az_speed),
+                                                                int(alt_speed), int(az_acceleration),
+                                                                int(alt_acceleration)), 'UTF-8'))
+            duration = max(trapezoid_time(az_steps, max(az_speed, 1), max(az_acceleration, 1)),
+                           trapezoid_time(alt_steps, max(alt_speed, 1), max(alt_acceleration, 1)))
+            answer = self.wait_for(("MOVE-DONE", "MOVE-ERROR"), duration + SLEW_MARGIN)
+            s["answer"] = answer
+        return answer == "MOVE-DONE"
+
+    def set_dew(self, fan, heater):
+        """
+        PWM duties (0-255) of the rocker fans and of the heater, returns when the arduino has set them
+        """
+        with trace.span("mount.dew", fan=int(fan), heater=int(heater)) as s:
+            self.ser.write(bytes("w{},{}\n".format(int(fan), int(heater)), 'UTF-8'))
+            answer = self.wait_for(("DEW-DONE", "DEW-ERROR"), DEW_TIMEOUT)
+            s["answer"] = answer
+        return answer == "DEW-DONE"
+
+    def request_sensors(self):
+        """
+        request arduino sensor measurements and return them as a dictionary
+        keys: temp, t_eq_table, h_eq_table, t_intake, h_intake, t_outflow, h_outflow, fan, heater (duties)
+        lines left in the buffer (e.g. ARDUINO-DONE after a focus move) are skipped
+        """
+        with trace.span("mount.sensors"):
+            self.ser.flushInput()
+            self.send('Y')
+            output_string = self.readline()
+            while not output_string.startswith('"temp"'):
+                output_string = self.readline()
+        # a DHT22 that could not be read prints nan, which is not valid json
+        output_string = output_string.replace("nan", "NaN")
+        # append curly brackets so we can use the ouput as a dictionary
+        return json.loads("{" + output_string + "}")
+
+
+def as_link(device):
+    """
+    what the hardware probe found: an opened serial line (MountLink of it), a link that already has the
+    commands (odroid_workers.WorkerMount, the serial line is in the mount worker) or None
+    """
+    if device is None or hasattr(device, "move_steps"):
+        return device
+    return MountLink(device)
@@ -0,0 +1,548 @@
+#!/usr/bin/env python3
+
+## about this script
+# time-to-target benchmark of the pointing pipeline, without telescope
+# each iteration goes through the stages of a goto from the solve and goto GUI:
+#       target      find_object in Sac72.txt (odroid_catalog.py)
+#       capture     camera.capture()
+#       solve       solver.solve()
+#       compare     odroid_pointing.compare
+#       goto        odroid_pointing.go_to (custom moves or slew, capture and solve of the new image)
+#       move        each custom move or slew sent by go_to
+#       total       target + capture + solve + compare + goto
+# and reports the latency percentiles of each stage (table, or json with --json)
+#
+# hardware:
+#   simulated (default): the sky position is a linear function of the motor steps, the camera writes a
+#       full size frame (4144x2822, 16 bits) so that the file write is measured, the solver gives back the
+#       sky position of the frame. with --model-latency, the mount sleeps like MountLink (serial delays and
+#       travel time of arduino custom()), the camera sleeps the exposure and the solver --solve-seconds
+#       with --profiles the gotos are slews of both axes at once (odroid_motion.py, limits of
+#       motion_limits.json or the default ones) instead of custom moves, to compare the time to target
+#   recorded (--session archive.zip from odroid_session.py): frames of the session are given back in turn,
+#       with their recorded solution (or solved again by astap_cli with --resolve). the durations recorded
+#       on the telescope (commands, frames, solutions) are reported as well
+#
+# acknowledgement latency (--acks): round trip of a guiding command of 0 steps (g0,0 -> GUIDE-DONE) through
+#   MountLink, with --load busy processes standing for astap_cli and the live stack, first with no policy,
+#   then with the cores and priorities of odroid_scheduling.py: the spread of the answers (p99, max, std)
+#   is what a move waits for on top of the arduino. With --port the real Mega answers, otherwise a
+#   simulated Mega on a pseudo terminal that answers at once (it keeps the core of the mount in both runs)
+#
+# usage: python3 odroid_benchmark.py [--iterations 20] [--session s.zip [--resolve]] [--model-latency] [--profiles]
+#                                    [--json out.json]
+#        --trace goto.json writes the spans of all the calls as a chrome trace (goto.jsonl: one json line per span)
+#        python3 odroid_benchmark.py --acks 500 [--load 6] [--port /dev/ttyACM0] [--json out.json]
+
+## functions:
+
+# StageTimes            collects the durations of each stage (also given as recorder to odroid_session proxies)
+# percentiles           count, mean, min, p50, p90, p99, max of a list of durations
+# SimulatedSky          motor position and sky coordinates of the simulated telescope
+# SkyMount              custom moves of the simulated telescope
+# SkyCamera             writes a full size frame, remembers where the telescope was pointing
+# SkySolver             gives back the sky position of the frame
+# SessionFrames         recorded frames and solutions of a session, in turn
+# recorded_times        durations recorded on the telescope
+# run_benchmark         runs the iterations, returns the results as a dictionary
+# simulated_mega        answers GUIDE-DONE to every g line on a pseudo terminal
+# busy                  keeps a core busy (astap_cli, live stack)
+# run_ack_benchmark     acknowledgement latency without and with the scheduling policy
+
+
+######################
+## import modules ####
+######################
+
+import argparse                         # command line
+import datetime                         # date of the results
+import json                             # machine-readable results
+import multiprocessing                  # simulated Mega and load of the acknowledgement benchmark
+import os                               # pseudo terminal of the simulated Mega
+import platform                         # computer the benchmark ran on
+import threading                        # acknowledgements measured in a thread that takes the policy
+import shutil                           # temporary frames
+import tempfile                         # temporary frames
+import zipfile                          # session archive
+from collections import defaultdict     # durations per stage
+from math import cos, sin
+from pathlib import Path
+from time import perf_counter, sleep
+import numpy as np                      # frames and percentiles
+import serial                           # pseudo terminal of the simulated Mega
+import odroid_motion as motion          # travel time of the custom moves and of the slews
+import odroid_pointing as pointing      # compare and go_to
+import odroid_scheduling as scheduling  # cores and priorities of the acknowledgement benchmark
+import odroid_session as session        # recording proxies and session archives
+from odroid_arduino import MountLink, open_arduino
+from odroid_catalog import CATALOG_FILE, find_object
+from odroid_solver import AstapSolver
+import odroid_trace as trace            # spans of each call, exported with --trace
+
+
+STAGES = ["target", "capture", "solve", "compare", "goto", "move", "total"]
+
+# kind of the events of odroid_session.py and stage they are timed in
+EVENT_STAGES = {"command": "move", "frame": "capture", "solve": "solve"}
+
+# ASI294MC Pro, full size
+FRAME_SHAPE = (2822, 4144)
+
+# MountLink.send_steps sleeps before waiting for the arduino
+SERIAL_DELAY = 0.1 + 1.3
+# the m command is one line and one answer
+SLEW_DELAY = 0.05
+
+# s between two acknowledgements (the guiding loop sends a few corrections per second at most)
+ACK_INTERVAL = 0.01
+
+# M42 when the catalog file is not there
+DEFAULT_TARGET = pointing.Target(83.83, -5.38, "05", 85.0)
+
+
+######################
+####  timing  ########
+######################
+
+class StageTimes:
+    """
+    add(stage, seconds) or time(stage, function, *args)
+    record() and add_frame() make it usable as recorder of the odroid_session proxies
+    """
+
+    def __init__(self):
+        self.times = defaultdict(list)
+
+    def add(self, stage, seconds):
+        self.times[stage].append(seconds)
+
+    def time(self, stage, function, *args):
+        start = perf_counter()
+        result = function(*args)
+        self.add(stage, perf_counter() - start)
+        return result
+
+    def record(self, kind, **data):
+        if kind in EVENT_STAGES and "duration" in data:
+            self.add(EVENT_STAGES[kind], data["duration"])
+
+    def add_frame(self, path, **data):
+        self.record("frame", **data)
+
+
+def percentiles(durations):
+    """
+    statistics of a list of durations in seconds
+    """
+    if not durations:
+        return {"count": 0}
+    values = np.asarray(durations, dtype=float)
+    p50, p90, p99 = np.percentile(values, [50, 90, 99])
+    return {"count": len(values), "mean": float(values.mean()), "min": float(values.min()),
+            "p50": float(p50), "p90": float(p90), "p99": float(p99), "max": float(values.max())}
+
+
+######################
+####  simulated  #####
+######################
+
+class SimulatedSky:
+    """
+    telescope position in motor steps, sky coordinates from the calibration (inverse of convert_coord)
+    """
+
+    def __init__(self, calibration, target, rng):
+        self.calibration = calibration
+        self.target = target
+        self.rng = rng
+        self.az_target, self.vc_target = pointing.convert_coord(target.ra, target.dec, calibration.angle_av)
+        self.az = 0
+        self.alt = 0
+
+    def scatter(self, steps=20000):
+        """
+        the telescope starts somewhere around the target
+        """
+        self.az, self.alt = (int(s) for s in self.rng.integers(-steps, steps, 2))
+
+    def coordinates(self):
+        c = self.calibration
+        az = self.az_target + self.az / pointing.FAST_STEPS * c.step_az
+        vc = self.vc_target + self.alt / pointing.FAST_STEPS * c.step_vc
+        return (az * cos(c.angle_av) - vc * sin(c.angle_av),
+                az * sin(c.angle_av) + vc * cos(c.angle_av))
+
+
+class SkyMount:
+
+    # direction of the custom moves on the simulated axes
+    DIRECTIONS = {'O': (1, 0), 'P': (-1, 0), 'K': (0, 1), 'L': (0, -1)}
+
+    def __init__(self, sky, model_latency=False):
+        self.sky = sky
+        self.model_latency = model_latency
+
+    def move(self, command):
+        return "ARDUINO-DONE"
+
+    def move_steps(self, command, steps):
+        az, alt = self.DIRECTIONS[command]
+        self.sky.az += az * abs(int(steps))
+        self.sky.alt += alt * abs(int(steps))
+        if self.model_latency:
+            sleep(SERIAL_DELAY + motion.custom_move_time(steps))
+        return "start", "ARDUINO-DONE"
+
+    def slew(self, az_steps, alt_steps, az_speed, alt_speed, az_acceleration, alt_acceleration):
+        # motor steps: the opposite of the custom moves (O turns Azimut(-1))
+        self.sky.az -= int(az_steps)
+        self.sky.alt -= int(alt_steps)
+        if self.model_latency:
+            sleep(SLEW_DELAY + max(motion.trapezoid_time(az_steps, az_speed, az_acceleration),
+                                   motion.trapezoid_time(alt_steps, alt_speed, alt_acceleration)))
+        return True
+
+    def settle(self, seconds):
+        pass
+
+
+class SkyCamera:
+    """
+    the frame is noise generated once, it is written at each capture like the zwo png
+    """
+
+    def __init__(self, sky, directory, shape=FRAME_SHAPE, exposure=0.0, seed=1):
+        self.sky = sky
+        self.path = Path(directory) / "frame.raw"
+        self.exposure = exposure
+        rng = np.random.default_rng(seed)
+        self.frame = rng.integers(200, 800, shape, dtype=np.uint16)
+        self.pointing = None
+
+    def capture(self):
+        if self.exposure:
+            sleep(self.exposure)
+        self.pointing = self.sky.coordinates()
+        self.frame.tofile(self.path)
+        return self.path
+
+
+class SkySolver:
+
+    def __init__(self, camera, seconds=0.0):
+        self.camera = camera
+        self.seconds = seconds
+
+    def solve(self, path, ra_hrs, spd):
+        if self.seconds:
+            sleep(self.seconds)
+        return self.camera.pointing
+
+
+######################
+####  recorded  ######
+######################
+
+class SessionFrames:
+    """
+    camera and solver giving back the frames of a session archive in turn (they start again at the end)
+    the recorded solution of the frame, or solver.solve() on it if a solver is given
+    """
+
+    def __init__(self, archive, events, directory, solver=None):
+        self.archive = zipfile.ZipFile(archive)
+        self.directory = directory
+        frames = [e for e in events if e["kind"] == "frame"]
+        solutions = [e for e in events if e["kind"] == "solve"]
+        # frames and solutions are recorded in turn by take_and_solve
+        self.frames = [(frame["file"], solve["solution"]) for frame, solve in zip(frames, solutions)]
+        if not self.frames:
+            raise session.ReplayError("no solved frame in the session")
+        self.solver = solver
+        self.index = -1
+
+    def capture(self):
+        self.index = (self.index + 1) % len(self.frames)
+        return self.archive.extract(self.frames[self.index][0], self.directory)
+
+    def solve(self, path, ra_hrs, spd):
+        if self.solver is not None:
+            return self.solver.solve(path, ra_hrs, spd)
+        solution = self.frames[self.index][1]
+        return tuple(solution) if solution is not None else None
+
+    def close(self):
+        self.archive.close()
+
+
+def recorded_times(events):
+    """
+    percentiles of the durations measured on the telescope, per stage and per arduino command
+    """
+    times = StageTimes()
+    commands = defaultdict(list)
+    for event in events:
+        if "duration" in event:
+            times.record(event["kind"], duration=event["duration"])
+        if event["kind"] == "command":
+            commands[event["command"]].append(event["duration"])
+    results = {stage: percentiles(durations) for stage, durations in times.times.items()}
+    results["commands"] = {command: percentiles(durations) for command, durations in sorted(commands.items())}
+    return results
+
+
+######################
+####  benchmark  #####
+######################
+
+def run_benchmark(iterations=20, archive=None, resolve=False, model_latency=False, solve_seconds=3.0,
+                  catalog=("Messier", "42"), catalog_file=CATALOG_FILE, seed=1, profiles=False):
+    """
+    returns a dictionary: configuration, percentiles per stage, recorded percentiles (session only)
+    """
+    rng = np.random.default_rng(seed)
+    times = StageTimes()
+    # {}: custom moves
+    limits = (motion.load_limits() or motion.DEFAULT_LIMITS) if profiles else {}
+    directory = tempfile.mkdtemp(prefix="dobson-benchmark-")
+    has_catalog = Path(catalog_file).is_file()
+    recorded = None
+    frames = None
+    try:
+        if archive is not None:
+            events = session.load_session(archive)
+            recorded = recorded_times(events)
+            frames = SessionFrames(archive, events, directory, AstapSolver() if resolve else None)
+            camera = solver = frames
+            requests = [e for e in events if e["kind"] in ("calibrate", "goto")]
+            results = [e["result"] for e in events if e["kind"] == "calibration"]
+            if not requests or not (results or requests[-1]["kind"] == "goto"):
+                raise session.ReplayError("no calibration in the session")
+            calibration = pointing.Calibration(**(requests[-1]["calibration"] if requests[-1]["kind"] == "goto"
+                                                  else results[-1]))
+            target = pointing.Target(*requests[-1]["target"])
+            sky = SimulatedSky(calibration, target, rng)
+        else:
+            target = DEFAULT_TARGET
+            calibration = pointing.Calibration(0.3, 0.25, 0.35, target.ra, target.dec)
+            sky = SimulatedSky(calibration, target, rng)
+            camera = SkyCamera(sky, directory, exposure=1.0 if model_latency else 0.0, seed=seed)
+            solver = SkySolver(camera, solve_seconds if model_latency else 0.0)
+        mount = SkyMount(sky, model_latency)
+
+        # durations of the proxies go to times (capture, solve, move)
+        mount = session.RecordingMount(mount, times)
+        camera = session.RecordingCamera(camera, times)
+        solver = session.RecordingSolver(solver, times)
+
+        residuals = []
+        for iteration in range(iterations):
+            sky.scatter()
+            start = perf_counter()
+            if has_catalog:
+                found = times.time("target", find_object, catalog[0], catalog[1], catalog_file)
+                if found is not None and archive is None:
+                    target = found
+            path = camera.capture()
+            solution = solver.solve(path, target.ra_hrs, target.spd)
+            if solution is None:
+                continue
+            ra_img, dec_img = solution
+            result = times.time("compare", pointing.compare, calibration, target, ra_img, dec_img)
+            try:
+                ra_img, dec_img, result = times.time("goto", pointing.go_to, mount, camera, solver, calibration,
+                                                     target, result["stepper_az"], result["stepper_vc"],
+                                                     pointing.nothing, limits)
+            except pointing.PointingError:
+                continue
+            times.add("total", perf_counter() - start)
+            residuals.append(max(abs(result["diff_ra"]), abs(result["diff_dec"])))
+    finally:
+        if frames is not None:
+            frames.close()
+        shutil.rmtree(directory, ignore_errors=True)
+
+    results = {
+        "benchmark": "pointing",
+        "time": datetime.datetime.now().isoformat(timespec="seconds"),
+        "host": platform.node(),
+        "machine": platform.machine(),
+        "python": platform.python_version(),
+        "hardware": "recorded" if archive is not None else "simulated",
+        "config": {"iterations": iterations, "session": str(archive) if archive else None, "resolve": resolve,
+                   "model_latency": model_latency, "solve_seconds": solve_seconds if model_latency else 0.0,
+                   "profiles": {axis: list(value) for axis, value in limits.items()} if limits else None,
+                   "catalog": list(catalog) if has_catalog else None, "seed": seed},
+        "stages": {stage: percentiles(times.times[stage]) for stage in STAGES},
+        # pointing error after goto (degrees), only meaningful with simulated hardware
+        "residual": percentiles(residuals),
+    }
+    if recorded is not None:
+        results["recorded"] = recorded
+    return results
+
+
+def simulated_mega(fd, roles):
+    """
+    reads the master side of a pseudo terminal, answers GUIDE-DONE to each line
+    """
+    scheduling.apply("mount", roles)
+    pending = b""
+    while True:
+        data = os.read(fd, 256)
+        if not data:
+            return
+        pending += data
+        while b"\n" in pending:
+            _, pending = pending.split(b"\n", 1)
+            os.write(fd, b"GUIDE-DONE\r\n")
+
+
+def busy(roles):
+    """
+    sorts random numbers until terminated, on the cores of the solver when roles is given
+    """
+    if roles is not None:
+        scheduling.apply("solver", roles)
+    values = np.random.default_rng().random(100000)
+    while True:
+        np.sort(values)
+
+
+def _acknowledgements(link, count, roles, times, applied):
+    if roles is not None:
+        applied.update(scheduling.apply("mount", roles))
+    for _ in range(count):
+        start = perf_counter()
+        link.guide(0, 0)
+        times.append(perf_counter() - start)
+        sleep(ACK_INTERVAL)
+
+
+def run_ack_benchmark(count=500, load=None, port=None, roles=None):
+    """
+    returns a dictionary: configuration, percentiles and standard deviation of the acknowledgement
+    latency with no policy ("default") and with the policy ("policy", what could be set in "applied")
+    """
+    load = os.cpu_count() if load is None else load
+    roles = scheduling.policy() if roles is None else roles
+    # fork: the simulated Mega inherits the pseudo terminal
+    context = multiprocessing.get_context("fork")
+    results = {
+        "benchmark": "acknowledgements",
+        "time": datetime.datetime.now().isoformat(timespec="seconds"),
+        "host": platform.node(),
+        "machine": platform.machine(),
+        "python": platform.python_version(),
+        "hardware": port or "simulated",
+        "config": {"count": count, "load": load, "interval": ACK_INTERVAL, "policy": roles},
+    }
+    for run, policy in (("default", None), ("policy", roles)):
+        processes = [context.Process(target=busy, args=(policy,), daemon=True) for _ in range(load)]
+        if port is None:
+            master, slave = os.openpty()
+            processes.append(context.Process(target=simulated_mega, args=(master, roles), daemon=True))
+            ser = serial.Serial(os.ttyname(slave), 9600, timeout=.5)
+        else:
+            ser = open_arduino(port)
+            if ser is None:
+                raise OSError("arduino not connected on " + port)
+        for process in processes:
+            process.start()
+        times, applied = [], {}
+        try:
+            # a new thread: the policy does not stay on the thread of the benchmark
+            thread = threading.Thread(target=_acknowledgements, args=(MountLink(ser), count, policy, times, applied))
+            thread.start()
+            thread.join()
+        finally:
+            for process in processes:
+                process.terminate()
+                process.join()
+            ser.close()
+            if port is None:
+                os.close(master)
+                os.close(slave)
+        results[run] = dict(percentiles(times), std=float(np.std(times)))
+        if policy is not None:
+            results["applied"] = applied
+    return results
+
+
+def print_acks(results):
+    """
+    one line per run, milliseconds
+    """
+    print("{:10s} {:>6s} {:>10s} {:>10s} {:>10s} {:>10s} {:>10s}".format("run", "count", "mean ms", "p50 ms",
+                                                                          "p99 ms", "max ms", "std ms"))
+    for run in ("default", "policy"):
+        stats = results[run]
+        print("{:10s} {:6d} {:10.2f} {:10.2f} {:10.2f} {:10.2f} {:10.2f}".format(
+            run, stats["count"], *(1000 * stats[key] for key in ("mean", "p50", "p99", "max", "std"))))
+    print("policy applied: {}".format(json.dumps(results["applied"])))
+
+
+def print_table(results):
+    """
+    one line per stage, milliseconds
+    """
+    print("{:10s} {:>6s} {:>10s} {:>10s} {:>10s} {:>10s} {:>10s}".format("stage", "count", "mean ms", "p50 ms",
+                                                                          "p90 ms", "p99 ms", "max ms"))
+    sections = [("", results["stages"])]
+    if "recorded" in results:
+        sections.append(("recorded", {k: v for k, v in results["recorded"].items() if k != "commands"}))
+        sections.append(("commands", results["recorded"]["commands"]))
+    for title, stages in sections:
+        if title:
+            print(title)
+        for stage, stats in stages.items():
+            if not stats["count"]:
+                print("{:10s} {:6d}".format(stage, 0))
+                continue
+            print("{:10s} {:6d} {:10.1f} {:10.1f} {:10.1f} {:10.1f} {:10.1f}".format(
+                stage, stats["count"], *(1000 * stats[key] for key in ("mean", "p50", "p90", "p99", "max"))))
+
+
+######################
+######  main  ########
+######################
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="time-to-target benchmark of the pointing pipeline")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--session", help="session archive (.zip) recorded by the solve and goto GUI")
+    parser.add_argument("--resolve", action="store_true", help="solve the recorded frames again with astap_cli")
+    parser.add_argument("--model-latency", action="store_true",
+                        help="simulated hardware sleeps like the telescope (serial, travel, exposure, solve)")
+    parser.add_argument("--solve-seconds", type=float, default=3.0, help="solve time with --model-latency")
+    parser.add_argument("--profiles", action="store_true", help="slews of both axes at once instead of custom moves")
+    parser.add_argument("--target", nargs=2, default=["Messier", "42"], metavar=("CATALOG", "REF"))
+    parser.add_argument("--catalog-file", default=CATALOG_FILE)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="write the results to this file ('-' for stdout)")
+    parser.add_argument("--trace", help="write the spans to this file (.json chrome trace, .jsonl one line per span)")
+    parser.add_argument("--acks", type=int, metavar="COUNT",
+                        help="measure the latency of COUNT acknowledgements of the Mega instead, without and with "
+                             "the scheduling policy")
+    parser.add_argument("--load", type=int, help="busy processes during --acks (default: one per core)")
+    parser.add_argument("--port", help="serial line of the Mega for --acks (default: simulated Mega)")
+    args = parser.parse_args()
+
+    if args.acks:
+        results, print_results = run_ack_benchmark(args.acks, args.load, args.port), print_acks
+    else:
+        results = run_benchmark(args.iterations, args.session, args.resolve, args.model_latency,
+                                args.solve_seconds, tuple(args.target), args.catalog_file, args.seed, args.profiles)
+        print_results = print_table
+    if args.json == "-":
+        print(json.dumps(results, indent=2))
+    else:
+        print_results(results)
+        if args.json:
+            with open(args.json, "w") as file:
+                json.dump(results, file, indent=2)
+    if args.trace:
+        if args.trace.endswith(".json"):
+            trace.TRACER.export_chrome(args.trace)
+        else:
+            trace.TRACER.export_jsonl(args.trace)
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+
+## about this script
+# target lookup in the Saguaro Astronomy Club catalog without any GUI
+# static file Sac72.txt, source https://www.saguaroastro.org/sac-downloads/
+# a line looks like this: "M  42","NGC 1976","BRTNB","ORI","05 35.3","-05 23","4",...
+#   (object, other name, type, constellation, ra hh mm.m, dec dd mm, magnitude, ...)
+# the whole catalog can also be loaded once as numpy arrays (CatalogTable) for the planner
+# sun, moon and planets are not in it: catalog "Planet" computes them now (odroid_ephemeris.py)
+# the catalog is J2000, the sun, moon and planets of the date (JNow): each Target says its frame
+
+## functions:
+
+# object_name           builds the object name with spaces as in the data file
+# find_object           grep the object in the catalog, returns a Target (odroid_pointing.py)
+# make_target           Target from ra and dec in degrees, with the hints for astap
+# CatalogTable          the whole catalog as numpy arrays: names, types, ra, dec, magnitude
+# load_table            read the catalog file once into a CatalogTable
+# find_body             position of the sun, moon or a planet now, as a Target
+# Catalog               catalog object used by odroid_goto.py, apparent() the catalog of tonight (JNow)
+
+
+######################
+## import modules ####
+######################
+
+import csv                              # whole catalog for the planner
+import subprocess                       # grep in the catalog file
+from collections import namedtuple
+from time import time                   # position of the planets now
+import numpy as np                      # catalog arrays
+import odroid_ephemeris as ephemeris    # sun, moon and planets
+from odroid_epoch import J2000, JNOW, j2000_to_jnow
+from odroid_pointing import Target
+from odroid_solver import hms_dms_dd
+
+
+CATALOG_FILE = "sac72/Sac72.txt"
+
+# catalog name in the GUI: name in the data file, width of the object column
+CATALOG_NAMES = {"Messier": ("M", 5), "IC": ("IC", 8), "VDB": ("vdB", 7), "NGC": ("NGC", 8)}
+
+# catalog name in the GUI of the solar system bodies, the reference is the name ("mars", "moon")
+SOLAR_SYSTEM = "Planet"
+
+# magnitude of the objects without one in the data file
+UNKNOWN_MAGNITUDE = 79.9
+
+
+######################
+####  functions  #####
+######################
+
+def object_name(cat, ref):
+    """
+    build skyobject with spaces as in the data file ("M  42", "NGC 7000", "IC    59")
+    returns None for an unknown catalog or a reference that is too long
+    """
+    if cat not in CATALOG_NAMES or not ref:
+        return None
+    prefix, width = CATALOG_NAMES[cat]
+    if len(prefix) + len(ref) >= width:
+        return None
+    return prefix + ref.rjust(width - len(prefix))
+
+
+def find_object(cat, ref, file=CATALOG_FILE):
+    """
+    get skyobject coordinates, returns a Target or None if not found
+    ra and dec in degrees as in the catalog, ra_hrs and spd (dec + 90) are the hints for astap
+    """
+    skyobject = object_name(cat, ref)
+    if skyobject is None:
+        return None
+    try:
+        line = subprocess.check_output(['grep', skyobject, file], encoding="latin-1")
+    except subprocess.CalledProcessError:
+        return None
+    fields = line.split("\n")[0].split(",")
+    ra_target_raw = fields[4].replace('"','')
+    dec_target_raw = fields[5].replace('"','')
+
+    # add ss at 00 since Sat72 only has hh mm
+    ra_target_raw = ra_target_raw + " 00"
+    dec_target_raw = dec_target_raw + " 00"
+
+    ra_hrs = ra_target_raw.split(' ')[0]                # astap needs just hrs
+    spd = 90 + float(dec_target_raw.split(' ')[0])      # astap uses south pole distance so we add 90 degrees
+
+    ra, dec = hms_dms_dd(ra_target_raw, dec_target_raw)
+    return Target(ra, dec, ra_hrs, spd)
+
+
+def make_target(ra, dec, frame=J2000):
+    """
+    Target of ra, dec in degrees, ra_hrs and spd as find_object gives them (whole hours and degrees)
+    """
+    return Target(ra, dec, "{:02d}".format(int(ra / 15) % 24), float(90 + int(dec)), frame)
+
+
+class CatalogTable(namedtuple("CatalogTable", ["names", "types", "ra", "dec", "magnitude", "index"])):
+    """
+    names, types: lists of strings, ra, dec (degrees) and magnitude: numpy arrays (nan if unknown)
+    index: object name as in the data file ("M  42", "NGC 1976") -> row, both names of a line are in it
+    """
+    __slots__ = ()
+
+    def row(self, cat, ref):
+        """
+        row of the object, None if not found
+        """
+        return self.index.get(object_name(cat, ref))
+
+    def target(self, row):
+        return make_target(float(self.ra[row]), float(self.dec[row]))
+
+
+def load_table(file=CATALOG_FILE):
+    """
+    parse the catalog file once, coordinates as arrays so that hundreds of targets are planned at once
+    """
+    names, types, ra, dec, magnitude, index = [], [], [], [], [], {}
+    with open(file, encoding="latin-1") as data:
+        for fields in csv.reader(data):
+            if len(fields) < 7:
+                continue
+            ra_h, ra_m = fields[4].split()
+            dec_d, dec_m = fields[5].split()
+            row = len(names)
+            names.append(fields[0].strip())
+            types.append(fields[2].strip())
+            ra.append(15 * (int(ra_h) + float(ra_m) / 60))
+            dec.append((-1 if dec_d.startswith("-") else 1) * (abs(int(dec_d)) + float(dec_m) / 60))
+            try:
+                mag = float(fields[6])
+            except ValueError:
+                mag = UNKNOWN_MAGNITUDE
+            magnitude.append(np.nan if mag == UNKNOWN_MAGNITUDE else mag)
+            for name in (fields[0], fields[1]):
+                if name.strip():
+                    index.setdefault(name, row)
+    return CatalogTable(names, types, np.array(ra), np.array(dec), np.array(magnitude), index)
+
+
+def find_body(name, timestamp=None):
+    """
+    Target of a body of odroid_ephemeris.BODIES at timestamp (now by default), None if unknown (JNow)
+    """
+    try:
+        ra, dec = ephemeris.position(name.strip(), time() if timestamp is None else timestamp)
+    except ValueError:
+        return None
+    return make_target(float(ra), float(dec), JNOW)
+
+
+class Catalog:
+    """
+    find(cat, ref) returns a Target or None, table() the whole catalog (loaded on first use)
+    """
+
+    NAMES = tuple(CATALOG_NAMES) + (SOLAR_SYSTEM,)
+
+    def __init__(self, file=CATALOG_FILE):
+        self.file = file
+        self._table = None
+        self._apparent = None           # (day, ra, dec)
+
+    def find(self, cat, ref):
+        if cat == SOLAR_SYSTEM:
+            return find_body(ref)
+        return find_object(cat, ref, self.file)
+
+    def table(self):
+        if self._table is None:
+            self._table = load_table(self.file)
+        return self._table
+
+    def apparent(self, timestamp=None):
+        """
+        ra, dec arrays of the table precessed to the date (JNow), computed once per day
+        """
+        if timestamp is None:
+            timestamp = time()
+        day = int(timestamp // 86400)
+        if self._apparent is None or self._apparent[0] != day:
+            table = self.table()
+            self._apparent = (day,) + tuple(j2000_to_jnow(table.ra, table.dec, day * 86400 + 43200))
+        return self._apparent[1:]
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+
+## about this script
+# dew control of the rocker and of the equatorial table
+#   the dew point is computed from the intake DHT22 (outside air, Magnus formula), the optics are
+#   followed by the outflow DHT22 (air that has been over the mirror): the margin is
+#   t_outflow - dew point, the optics fog when it reaches 0
+#   polyimide heater (Mega): PI controller that keeps the margin at MARGIN_TARGET, switched on when the
+#   margin is below HEATER_ON and off above HEATER_OFF (hysteresis: it does not toggle every minute)
+#   rocker fans (Mega): on while the mirror is warmer than the air (cool down), off when the intake air
+#   is so damp that blowing it over the mirror would fog it
+#   table fan (Uno): on when the table electronics are close to their dew point or the driver is hot
+#   the arduinos get a command only when a duty changes (a few bytes every few minutes at most),
+#   each update is logged with the duty cycles in dew_log.csv
+#
+# usage: see RockerController.start_dew / dew_control (odroid_rocker.py) and the checkbox "dew control"
+#   of odroid_sensors_motors_gui.py
+
+## functions:
+
+# dew_point             dew point in °C from temperature and relative humidity (Magnus)
+# Hysteresis            on / off state that switches at two different thresholds
+# PIController          proportional-integral controller with clamped output and no windup
+# DewController         fans and heater duties from the sensors, sends them when they change, logs them
+# log_dew               append the duties and margins to dew_log.csv
+
+
+######################
+## import modules ####
+######################
+
+import csv                  # dew log file
+import datetime             # timestamp of dew log entries
+from math import isnan, log  # dew point, DHT22 returns nan when it could not be read
+from pathlib import Path    # dew log file
+import time                 # time between two updates of the PI controller
+
+
+DEW_LOG = Path("/home/dlg/Documents/python") / "dew_log.csv"
+DEW_LOG_FIELDS = ["time", "dew_point", "margin", "table_margin", "fan", "heater", "table_fan", "heater_mean"]
+
+# Magnus coefficients (over water, -45 to 60 °C)
+MAGNUS_B = 17.62
+MAGNUS_C = 243.12
+
+# PWM duties of the arduinos
+DUTY_MAX = 255
+# duties are sent in steps of DUTY_STEP: a change of a few units is not worth a command
+DUTY_STEP = 16
+
+# heater: margin (°C) kept between the optics and the dew point, on / off thresholds
+MARGIN_TARGET = 3.0
+HEATER_ON = 2.0
+HEATER_OFF = 5.0
+HEATER_KP = 60.0            # duty per °C below the target
+HEATER_KI = 0.5             # duty per °C and per second
+
+# rocker fans: mirror warmer than the air by (°C), off above this intake humidity (%)
+FAN_ON = 1.0
+FAN_OFF = 0.3
+FAN_HUMIDITY_OFF = 90.0
+FAN_HUMIDITY_ON = 85.0
+
+# table fan: margin of the table air (°C), driver temperature (LM35 of the Uno, °C)
+TABLE_MARGIN_ON = 3.0
+TABLE_MARGIN_OFF = 5.0
+TABLE_DRIVER_ON = 45.0
+TABLE_DRIVER_OFF = 40.0
+
+
+######################
+####  functions  #####
+######################
+
+def dew_point(temperature, humidity):
+    """
+    dew point in °C, None if a value is missing (nan) or the humidity is 0
+    """
+    if temperature is None or humidity is None or isnan(temperature) or isnan(humidity) or humidity <= 0:
+        return None
+    gamma = log(humidity / 100.0) + MAGNUS_B * temperature / (MAGNUS_C + temperature)
+    return MAGNUS_C * gamma / (MAGNUS_B - gamma)
+
+
+def _value(sensors, key):
+    value = sensors.get(key) if sensors else None
+    if value is None or isnan(value):
+        return None
+    return value
+
+
+class Hysteresis:
+    """
+    update(value) returns the state: on once the value reaches on, off once it reaches off
+    on < off: on when the value is low (margin), on > off: on when the value is high (temperature)
+    """
+
+    def __init__(self, on, off, state=False):
+        self.on = on
+        self.off = off
+        self.state = state
+
+    def update(self, value):
+        if value is None:
+            return self.state
+        if self.on < self.off:
+            if value <= self.on:
+                self.state = True
+            elif value >= self.off:
+                self.state = False
+        else:
+            if value >= self.on:
+                self.state = True
+            elif value <= self.off:
+                self.state = False
+        return self.state
+
+
+class PIController:
+    """
+    update(error, dt) returns kp * error + ki * integral of the error, clamped to low, high
+    the integral stops growing while the output is clamped (no windup)
+    """
+
+    def __init__(self, kp, ki, low=0, high=DUTY_MAX):
+        self.kp = kp
+        self.ki = ki
+        self.low = low
+        self.high = high
+        self.integral = 0.0
+
+    def reset(self):
+        self.integral = 0.0
+
+    def update(self, error, dt):
+        integral = self.integral + error * dt
+        output = self.kp * error + self.ki * integral
+        if self.low < output < self.high:
+            self.integral = integral
+        return min(self.high, max(self.low, output))
+
+
+def _quantize(duty):
+    """
+    duty rounded to DUTY_STEP, full on stays full on
+    """
+    duty = int(round(duty / DUTY_STEP)) * DUTY_STEP
+    return min(DUTY_MAX, max(0, duty))
+
+
+class DewController:
+    """
+    link: MountLink (fans and heater of the rocker), table: EqTable (its fan), either can be None
+    update(sensors, table_status) computes the duties, sends those that changed and logs them
+    the duties are in fan, heater, table_fan (0-255), heater_mean is the mean heater duty since start
+    """
+
+    def __init__(self, link, table=None, log=DEW_LOG):
+        self.link = link
+        self.table = table
+        self.log = log
+        self.heater_enabled = Hysteresis(HEATER_ON, HEATER_OFF)
+        self.heater_pi = PIController(HEATER_KP, HEATER_KI)
+        self.fan_cooling = Hysteresis(FAN_ON, FAN_OFF, state=True)
+        self.fan_damp = Hysteresis(FAN_HUMIDITY_OFF, FAN_HUMIDITY_ON)
+        self.table_damp = Hysteresis(TABLE_MARGIN_ON, TABLE_MARGIN_OFF)
+        self.table_hot = Hysteresis(TABLE_DRIVER_ON, TABLE_DRIVER_OFF)
+        self.fan = None                 # duties last sent, None before the first update
+        self.heater = None
+        self.table_fan = None
+        self.dew_point = None
+        self.margin = None
+        self.table_margin = None
+        self.heater_seconds = 0.0       # heater duty integrated over time, for its mean
+        self.seconds = 0.0
+        self.last_time = None
+
+    def update(self, sensors, table_status=None, now=None):
+        """
+        returns the duties {"fan", "heater", "table_fan"} and the margins
+        """
+        now = time.monotonic() if now is None else now
+        dt = 0.0 if self.last_time is None else now - self.last_time
+        self.last_time = now
+
+        t_intake = _value(sensors, "t_intake")
+        t_outflow = _value(sensors, "t_outflow")
+        self.dew_point = dew_point(t_intake, _value(sensors, "h_intake"))
+        self.margin = None if self.dew_point is None or t_outflow is None else t_outflow - self.dew_point
+
+        # heater: PI on the margin while enabled, the integral restarts each time it is switched on
+        if self.margin is None:
+            heater = self.heater or 0
+        elif self.heater_enabled.update(self.margin):
+            heater = _quantize(self.heater_pi.update(MARGIN_TARGET - self.margin, dt))
+        else:
+            self.heater_pi.reset()
+            heater = 0
+
+        # rocker fans: cool the mirror down unless the air is damp
+        if t_intake is not None and t_outflow is not None:
+            self.fan_cooling.update(t_outflow - t_intake)
+        damp = self.fan_damp.update(_value(sensors, "h_intake"))
+        fan = DUTY_MAX if self.fan_cooling.state and not damp else 0
+
+        # table fan: damp air in the table or hot driver
+        t_table = _value(sensors, "t_eq_table")
+        table_dew_point = dew_point(t_table, _value(sensors, "h_eq_table"))
+        self.table_margin = None if table_dew_point is None else t_table - table_dew_point
+        damp_table = self.table_damp.update(self.table_margin)
+        hot_table = self.table_hot.update(_value(table_status, "temp"))
+        table_fan = DUTY_MAX if damp_table or hot_table else 0
+
+        if self.link is not None and (fan, heater) != (self.fan, self.heater):
+            self.link.set_dew(fan, heater)
+        if self.table is not None and table_fan != self.table_fan:
+            self.table.set_fan(table_fan)
+        if self.heater is not None:
+            self.heater_seconds += self.heater * dt
+            self.seconds += dt
+        self.fan, self.heater, self.table_fan = fan, heater, table_fan
+
+        duties = {"fan": fan, "heater": heater, "table_fan": table_fan, "dew_point": self.dew_point,
+                  "margin": self.margin, "table_margin": self.table_margin,
+                  "heater_mean": self.heater_seconds / self.seconds if self.seconds else float(heater)}
+        if self.log is not None:
+            try:
+                log_dew(duties, self.log)
+            except OSError:
+                pass
+        return duties
+
+    def stop(self):
+        """
+        fans and heater off
+        """
+        if self.link is not None:
+            self.link.set_dew(0, 0)
+        if self.table is not None:
+            self.table.set_fan(0)
+        self.fan = self.heater = self.table_fan = 0
+
+
+def log_dew(duties, path=DEW_LOG):
+    """
+    append a line to the dew log (creates the file and its header if needed)
+    """
+    new_file = not Path(path).exists()
+    with open(path, "a", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=DEW_LOG_FIELDS)
+        if new_file:
+            writer.writeheader()
+        row = {key: None if duties[key] is None else round(duties[key], 2) for key in DEW_LOG_FIELDS[1:]}
+        row["time"] = datetime.datetime.now().isoformat(timespec="seconds")
+        writer.writerow(row)
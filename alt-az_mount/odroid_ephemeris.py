@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+
+## about this script
+# offline ephemeris with numpy, for whole arrays of times and targets at once
+#   planets: keplerian elements and their rates (E.M. Standish, JPL "Approximate positions of the
+#       planets", table 1, 1800-2050), a few arcminutes
+#   sun and moon: low precision series of the Astronomical Almanac (sun 0.01°, moon 0.3°),
+#       the moon is topocentric when the site is given (parallax up to 1°)
+#   position() gives all bodies of the date (JNow, odroid_epoch.py), planet_position J2000
+# visibility of catalog arrays: alt / az, airmass, separation from the moon, dark part of the night
+#   a scheduler or a target picker filters thousands of objects at once (targets x times arrays)
+#
+# usage: python3 odroid_ephemeris.py [--date "2024-03-01 22:00"]    (prints the solar system)
+
+## functions:
+
+# julian_date           julian date of unix timestamps (array)
+# sidereal_time         local mean sidereal time in degrees (array)
+# separation            angular distance in degrees (arrays, broadcast)
+# planet_position       ra, dec of a planet (J2000)
+# sun_position          ra, dec of the sun (of date)
+# moon_position         ra, dec of the moon (of date, topocentric with latitude and longitude)
+# position              ra, dec of any body of BODIES
+# alt_az                altitude and azimut of targets x times (ra, dec of date: JNow)
+# airmass               airmass of altitudes (Kasten and Young), nan below the horizon
+# moon_separation       distance to the moon of targets x times
+# dark_window           start and end of the night (sun below -18°)
+# visible               which targets are high enough, under the airmass limit and far enough from the moon
+
+
+######################
+## import modules ####
+######################
+
+import argparse                         # command line
+import datetime
+from time import time
+import numpy as np
+from odroid_epoch import j2000_to_jnow  # planets of the date
+
+
+# observing site (degrees, longitude east positive)
+LATITUDE = 48.85
+LONGITUDE = 2.35
+
+OBLIQUITY_J2000 = 23.43928              # degrees
+
+# a (au), e, I, L, longitude of perihelion, longitude of ascending node (degrees), then their rates per century
+PLANET_ELEMENTS = {
+    "mercury": ((0.38709927, 0.20563593, 7.00497902, 252.25032350, 77.45779628, 48.33076593),
+                (0.00000037, 0.00001906, -0.00594749, 149472.67411175, 0.16047689, -0.12534081)),
+    "venus": ((0.72333566, 0.00677672, 3.39467605, 181.97909950, 131.60246718, 76.67984255),
+              (0.00000390, -0.00004107, -0.00078890, 58517.81538729, 0.00268329, -0.27769418)),
+    "earth": ((1.00000261, 0.01671123, -0.00001531, 100.46457166, 102.93768193, 0.0),
+              (0.00000562, -0.00004392, -0.01294668, 35999.37244981, 0.32327364, 0.0)),
+    "mars": ((1.52371034, 0.09339410, 1.84969142, -4.55343205, -23.94362959, 49.55953891),
+             (0.00001847, 0.00007882, -0.00813131, 19140.30268499, 0.44441088, -0.29257343)),
+    "jupiter": ((5.20288700, 0.04838624, 1.30439695, 34.39644051, 14.72847983, 100.47390909),
+                (-0.00011607, -0.00013253, -0.00183714, 3034.74612775, 0.21252668, 0.20469106)),
+    "saturn": ((9.53667594, 0.05386179, 2.48599187, 49.95424423, 92.59887831, 113.66242448),
+               (-0.00125060, -0.00050991, 0.00193609, 1222.49362201, -0.41897216, -0.28867794)),
+    "uranus": ((19.18916464, 0.04725744, 0.77263783, 313.23810451, 170.95427630, 74.01692503),
+               (-0.00196176, -0.00004397, -0.00242939, 428.48202785, 0.40805281, 0.04240589)),
+    "neptune": ((30.06992276, 0.00859048, 1.77004347, -55.12002969, 44.96476227, 131.78422574),
+                (0.00026291, 0.00005105, 0.00035372, 218.45945325, -0.32241464, -0.00508664)),
+}
+
+BODIES = ("sun", "moon", "mercury", "venus", "mars", "jupiter", "saturn", "uranus", "neptune")
+
+DARK_SUN_ALTITUDE = -18     # degrees, astronomical twilight
+MIN_MOON_SEPARATION = 30    # degrees, when the moon is up
+
+
+######################
+####  functions  #####
+######################
+
+def julian_date(timestamps):
+    return np.asarray(timestamps, dtype=float) / 86400.0 + 2440587.5
+
+
+def _centuries(timestamps):
+    """
+    julian centuries since J2000
+    """
+    return (julian_date(timestamps) - 2451545.0) / 36525
+
+
+def sidereal_time(timestamps, longitude=LONGITUDE):
+    """
+    local mean sidereal time in degrees (IAU 1982, good to a fraction of a second of time)
+    """
+    d = julian_date(timestamps) - 2451545.0
+    t = d / 36525
+    gmst = 280.46061837 + 360.98564736629 * d + 0.000387933 * t ** 2 - t ** 3 / 38710000
+    return (gmst + longitude) % 360
+
+
+def separation(ra, dec, ras, decs):
+    """
+    great circle distance in degrees between (ra, dec) and (ras, decs), numpy broadcasting rules
+    """
+    ra, dec, ras, decs = (np.radians(np.asarray(value, dtype=float)) for value in (ra, dec, ras, decs))
+    cos_d = np.sin(dec) * np.sin(decs) + np.cos(dec) * np.cos(decs) * np.cos(ras - ra)
+    return np.degrees(np.arccos(np.clip(cos_d, -1, 1)))
+
+
+def _ra_dec(x, y, z):
+    ra = np.degrees(np.arctan2(y, x)) % 360
+    dec = np.degrees(np.arctan2(z, np.hypot(x, y)))
+    return ra, dec
+
+
+def _ecliptic_to_equatorial(x, y, z, obliquity):
+    eps = np.radians(obliquity)
+    return x, np.cos(eps) * y - np.sin(eps) * z, np.sin(eps) * y + np.cos(eps) * z
+
+
+def _heliocentric(name, t):
+    """
+    ecliptic J2000 position in au of a planet (or the earth-moon barycentre), t in centuries
+    """
+    elements, rates = PLANET_ELEMENTS[name]
+    a, e, inc, mean_long, peri, node = (value + rate * t for value, rate in zip(elements, rates))
+    omega = np.radians(peri - node)
+    node, inc = np.radians(node), np.radians(inc)
+    mean_anomaly = np.radians((mean_long - peri + 180) % 360 - 180)
+    # kepler equation, newton iterations (e < 0.21)
+    anomaly = mean_anomaly + e * np.sin(mean_anomaly)
+    for _ in range(6):
+        anomaly = anomaly - (anomaly - e * np.sin(anomaly) - mean_anomaly) / (1 - e * np.cos(anomaly))
+    xp = a * (np.cos(anomaly) - e)
+    yp = a * np.sqrt(1 - e ** 2) * np.sin(anomaly)
+    x = ((np.cos(omega) * np.cos(node) - np.sin(omega) * np.sin(node) * np.cos(inc)) * xp
+         + (-np.sin(omega) * np.cos(node) - np.cos(omega) * np.sin(node) * np.cos(inc)) * yp)
+    y = ((np.cos(omega) * np.sin(node) + np.sin(omega) * np.cos(node) * np.cos(inc)) * xp
+         + (-np.sin(omega) * np.sin(node) + np.cos(omega) * np.cos(node) * np.cos(inc)) * yp)
+    z = np.sin(omega) * np.sin(inc) * xp + np.cos(omega) * np.sin(inc) * yp
+    return x, y, z
+
+
+def planet_position(name, timestamps):
+    """
+    geocentric ra, dec in degrees (J2000) of mercury ... neptune
+    """
+    t = _centuries(timestamps)
+    planet = _heliocentric(name, t)
+    earth = _heliocentric("earth", t)
+    x, y, z = (p - e for p, e in zip(planet, earth))
+    return _ra_dec(*_ecliptic_to_equatorial(x, y, z, OBLIQUITY_J2000))
+
+
+def _obliquity(n):
+    return 23.439 - 0.0000004 * n
+
+
+def sun_position(timestamps):
+    """
+    ra, dec in degrees of the sun (of date), 0.01°
+    """
+    n = julian_date(timestamps) - 2451545.0
+    mean_long = 280.460 + 0.9856474 * n
+    g = np.radians(357.528 + 0.9856003 * n)
+    longitude = np.radians(mean_long + 1.915 * np.sin(g) + 0.020 * np.sin(2 * g))
+    return _ra_dec(*_ecliptic_to_equatorial(np.cos(longitude), np.sin(longitude), 0 * n, _obliquity(n)))
+
+
+def moon_position(timestamps, latitude=None, longitude=None):
+    """
+    ra, dec in degrees of the moon (of date), 0.3°
+    geocentric, or topocentric if the site is given
+    """
+    t = _centuries(timestamps)
+
+    def s(a, b):
+        return np.sin(np.radians(a + b * t))
+
+    def c(a, b):
+        return np.cos(np.radians(a + b * t))
+
+    lam = (218.32 + 481267.881 * t + 6.29 * s(135.0, 477198.87) - 1.27 * s(259.3, -413335.36)
+           + 0.66 * s(235.7, 890534.22) + 0.21 * s(269.9, 954397.74) - 0.19 * s(357.5, 35999.05)
+           - 0.11 * s(186.5, 966404.03))
+    beta = 5.13 * s(93.3, 483202.02) + 0.28 * s(228.2, 960400.89) - 0.28 * s(318.3, 6003.15) - 0.17 * s(217.6, -407332.21)
+    parallax = (0.9508 + 0.0518 * c(135.0, 477198.87) + 0.0095 * c(259.3, -413335.36)
+                + 0.0078 * c(235.7, 890534.22) + 0.0028 * c(269.9, 954397.74))
+    distance = 1 / np.sin(np.radians(parallax))          # earth radii
+    lam, beta = np.radians(lam), np.radians(beta)
+    x, y, z = _ecliptic_to_equatorial(distance * np.cos(beta) * np.cos(lam), distance * np.cos(beta) * np.sin(lam),
+                                      distance * np.sin(beta), _obliquity(t * 36525))
+    if latitude is not None:
+        # observer on the earth surface, in earth radii
+        lst = np.radians(sidereal_time(timestamps, longitude))
+        lat = np.radians(latitude)
+        x, y, z = x - np.cos(lat) * np.cos(lst), y - np.cos(lat) * np.sin(lst), z - np.sin(lat)
+    return _ra_dec(x, y, z)
+
+
+def position(body, timestamps, latitude=LATITUDE, longitude=LONGITUDE):
+    """
+    ra, dec in degrees of a body of BODIES (of date), ValueError for an unknown one
+    """
+    body = body.lower()
+    if body == "sun":
+        return sun_position(timestamps)
+    if body == "moon":
+        return moon_position(timestamps, latitude, longitude)
+    if body in PLANET_ELEMENTS and body != "earth":
+        # one precession for all the times: it changes by 0.14" a day
+        ra, dec = planet_position(body, timestamps)
+        return j2000_to_jnow(ra, dec, float(np.mean(timestamps)))
+    raise ValueError("unknown body " + repr(body))
+
+
+def _horizontal(ra, dec, timestamps, latitude, longitude):
+    """
+    altitude and azimut in degrees, same broadcasting as numpy
+    """
+    ra, dec = np.radians(ra), np.radians(dec)
+    hour_angle = np.radians(sidereal_time(timestamps, longitude)) - ra
+    lat = np.radians(latitude)
+    sin_alt = np.sin(lat) * np.sin(dec) + np.cos(lat) * np.cos(dec) * np.cos(hour_angle)
+    alt = np.arcsin(np.clip(sin_alt, -1, 1))
+    az = np.arctan2(-np.cos(dec) * np.sin(hour_angle), np.cos(lat) * np.sin(dec) - np.sin(lat) * np.cos(dec) * np.cos(hour_angle))
+    return np.degrees(alt), np.degrees(az) % 360
+
+
+def _unit_vectors(ra, dec):
+    """
+    n x 3 equatorial unit vectors
+    """
+    ra = np.radians(np.atleast_1d(np.asarray(ra, dtype=float)))
+    dec = np.radians(np.atleast_1d(np.asarray(dec, dtype=float)))
+    return np.stack([np.cos(dec) * np.cos(ra), np.cos(dec) * np.sin(ra), np.sin(dec)], axis=1)
+
+
+def alt_az(ra, dec, timestamps, latitude=LATITUDE, longitude=LONGITUDE):
+    """
+    ra, dec: arrays of n targets (degrees, of date), timestamps: array of m times
+    returns altitude and azimut (from north through east) in degrees, n x m each
+    the targets are unit vectors projected on the zenith, north and east of each time: three matrix products
+    """
+    targets = _unit_vectors(ra, dec)
+    lst = np.radians(np.atleast_1d(sidereal_time(timestamps, longitude)))
+    lat = np.radians(latitude)
+    zenith = np.stack([np.cos(lat) * np.cos(lst), np.cos(lat) * np.sin(lst), np.full_like(lst, np.sin(lat))], axis=1)
+    north = np.stack([-np.sin(lat) * np.cos(lst), -np.sin(lat) * np.sin(lst), np.full_like(lst, np.cos(lat))], axis=1)
+    east = np.stack([-np.sin(lst), np.cos(lst), np.zeros_like(lst)], axis=1)
+    alt = np.degrees(np.arcsin(np.clip(targets @ zenith.T, -1, 1)))
+    az = np.degrees(np.arctan2(targets @ east.T, targets @ north.T)) % 360
+    return alt, az
+
+
+def airmass(altitude):
+    """
+    Kasten and Young (1989), 1 at the zenith, about 38 on the horizon, nan below
+    """
+    altitude = np.asarray(altitude, dtype=float)
+    with np.errstate(invalid="ignore"):
+        mass = 1 / (np.sin(np.radians(altitude)) + 0.50572 * (altitude + 6.07995) ** -1.6364)
+    return np.where(altitude >= 0, mass, np.nan)
+
+
+def moon_separation(ra, dec, timestamps, latitude=LATITUDE, longitude=LONGITUDE):
+    """
+    distance in degrees to the moon, n targets x m times, and the altitude of the moon (m)
+    """
+    timestamps = np.atleast_1d(np.asarray(timestamps, dtype=float))
+    moon_ra, moon_dec = moon_position(timestamps, latitude, longitude)
+    cos_d = _unit_vectors(ra, dec) @ _unit_vectors(moon_ra, moon_dec).T
+    distance = np.degrees(np.arccos(np.clip(cos_d, -1, 1)))
+    moon_alt = _horizontal(moon_ra, moon_dec, timestamps, latitude, longitude)[0]
+    return distance, moon_alt
+
+
+def dark_window(timestamp=None, latitude=LATITUDE, longitude=LONGITUDE, sun_altitude=DARK_SUN_ALTITUDE, step=300):
+    """
+    start and end (timestamps) of the next night, or of the current one if it is already dark
+    None if the sun does not go that low in the next 24 h (summer far north)
+    """
+    if timestamp is None:
+        timestamp = time()
+    times = timestamp + np.arange(0, 86400 + 2 * step, step)
+    sun_ra, sun_dec = sun_position(times)
+    sun_alt = _horizontal(sun_ra, sun_dec, times, latitude, longitude)[0]
+    dark = sun_alt <= sun_altitude
+    if not dark.any():
+        return None
+    first = int(np.argmax(dark))
+    light = np.flatnonzero(~dark[first:])
+    last = first + (light[0] if len(light) else len(dark) - first) - 1
+    return float(times[first]), float(times[last])
+
+
+def visible(ra, dec, timestamps, latitude=LATITUDE, longitude=LONGITUDE, min_altitude=0, max_airmass=None,
+            min_moon=MIN_MOON_SEPARATION):
+    """
+    n targets x m times mask: above min_altitude, below max_airmass, and min_moon away from the moon when it is up
+    """
+    alt, _ = alt_az(ra, dec, timestamps, latitude, longitude)
+    mask = alt >= min_altitude
+    if max_airmass is not None:
+        mask &= airmass(alt) <= max_airmass
+    if min_moon:
+        distance, moon_alt = moon_separation(ra, dec, timestamps, latitude, longitude)
+        mask &= (distance >= min_moon) | (moon_alt[None, :] < 0)
+    return mask
+
+
+######################
+######  main  ########
+######################
+
+def main():
+    parser = argparse.ArgumentParser(description="positions of the sun, moon and planets")
+    parser.add_argument("--date", help="'YYYY-MM-DD HH:MM' local time, now by default")
+    parser.add_argument("--lat", type=float, default=LATITUDE)
+    parser.add_argument("--lon", type=float, default=LONGITUDE, help="east positive")
+    args = parser.parse_args()
+
+    now = datetime.datetime.strptime(args.date, "%Y-%m-%d %H:%M").timestamp() if args.date else time()
+    print("{:<8} {:>8} {:>8} {:>7} {:>7} {:>7}".format("body", "ra", "dec", "alt", "az", "airmass"))
+    for body in BODIES:
+        ra, dec = position(body, now, args.lat, args.lon)
+        alt, az = alt_az(ra, dec, now, args.lat, args.lon)
+        print("{:<8} {:>8.2f} {:>8.2f} {:>7.1f} {:>7.1f} {:>7.2f}".format(
+            body, float(ra), float(dec), alt[0, 0], az[0, 0], float(airmass(alt[0, 0]))))
+    window = dark_window(now, args.lat, args.lon)
+    if window is not None:
+        print("night: " + " - ".join(datetime.datetime.fromtimestamp(t).strftime("%Y-%m-%d %H:%M") for t in window))
+
+
+if __name__ == "__main__":
+    main()
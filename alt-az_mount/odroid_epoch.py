@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+
+## about this script
+# coordinate frames of the targets and of the images
+#   J2000: the catalog (Sac72.txt) and the solutions of astap, the frame of compare / go to
+#   JNow: the equator and equinox of the date, what the sky looks like tonight: alt / az, the sun and
+#       the moon (odroid_ephemeris.py), and the coordinates KStars / EKOS send (odroid_lx200.py)
+#   the two differ by the precession (50" a year on the ecliptic, 0.3° by 2024) and the nutation (up to 17")
+#   every Target says its frame, odroid_pointing.compare brings the target to the frame of the images
+# rotation matrices: precession IAU 1976 (Lieske), nutation IAU 1980 with its four largest terms (0.5"),
+#   applied to whole arrays of unit vectors at once (the catalog is precessed in one matrix product)
+#   the annual aberration (20") is left out
+
+## functions:
+
+# precession_matrix     J2000 to mean equator and equinox of the date
+# nutation_matrix       mean to true equator and equinox of the date
+# frame_matrix          J2000 to JNow
+# j2000_to_jnow         ra, dec arrays in degrees
+# jnow_to_j2000         ra, dec arrays in degrees
+# convert               ra, dec from one frame to the other
+# target_in             Target in the given frame
+
+
+######################
+## import modules ####
+######################
+
+from time import time
+import numpy as np                      # rotation matrices
+
+
+J2000 = "J2000"
+JNOW = "JNow"
+
+ARCSEC = np.pi / (180 * 3600)
+
+
+######################
+####  functions  #####
+######################
+
+def _centuries(timestamp):
+    """
+    julian centuries since J2000 (unix timestamp)
+    """
+    return (timestamp / 86400.0 + 2440587.5 - 2451545.0) / 36525
+
+
+def precession_matrix(timestamp):
+    t = _centuries(timestamp)
+    zeta = (2306.2181 * t + 0.30188 * t ** 2 + 0.017998 * t ** 3) * ARCSEC
+    z = (2306.2181 * t + 1.09468 * t ** 2 + 0.018203 * t ** 3) * ARCSEC
+    theta = (2004.3109 * t - 0.42665 * t ** 2 - 0.041833 * t ** 3) * ARCSEC
+    cz, sz, cZ, sZ, ct, st = np.cos(zeta), np.sin(zeta), np.cos(z), np.sin(z), np.cos(theta), np.sin(theta)
+    return np.array([[cz * cZ * ct - sz * sZ, -sz * cZ * ct - cz * sZ, -cZ * st],
+                     [cz * sZ * ct + sz * cZ, -sz * sZ * ct + cz * cZ, -sZ * st],
+                     [cz * st, -sz * st, ct]])
+
+
+def _rotation_x(angle):
+    c, s = np.cos(angle), np.sin(angle)
+    return np.array([[1, 0, 0], [0, c, s], [0, -s, c]])
+
+
+def _rotation_z(angle):
+    c, s = np.cos(angle), np.sin(angle)
+    return np.array([[c, s, 0], [-s, c, 0], [0, 0, 1]])
+
+
+def nutation_matrix(timestamp):
+    t = _centuries(timestamp)
+    node = np.radians(125.04452 - 1934.136261 * t)          # ascending node of the moon
+    sun = np.radians(2 * (280.4665 + 36000.7698 * t))       # twice the mean longitudes
+    moon = np.radians(2 * (218.3165 + 481267.8813 * t))
+    dpsi = (-17.20 * np.sin(node) - 1.32 * np.sin(sun) - 0.23 * np.sin(moon) + 0.21 * np.sin(2 * node)) * ARCSEC
+    deps = (9.20 * np.cos(node) + 0.57 * np.cos(sun) + 0.10 * np.cos(moon) - 0.09 * np.cos(2 * node)) * ARCSEC
+    eps = (84381.448 - 46.8150 * t - 0.00059 * t ** 2 + 0.001813 * t ** 3) * ARCSEC
+    return _rotation_x(-(eps + deps)) @ _rotation_z(-dpsi) @ _rotation_x(eps)
+
+
+def frame_matrix(timestamp=None):
+    """
+    J2000 vector -> JNow vector at timestamp (now by default)
+    """
+    if timestamp is None:
+        timestamp = time()
+    return nutation_matrix(timestamp) @ precession_matrix(timestamp)
+
+
+def _rotate(ra, dec, matrix):
+    ra, dec = np.radians(ra), np.radians(dec)
+    vectors = np.stack([np.cos(dec) * np.cos(ra), np.cos(dec) * np.sin(ra), np.sin(dec)], axis=-1) @ matrix.T
+    ra = np.degrees(np.arctan2(vectors[..., 1], vectors[..., 0])) % 360
+    dec = np.degrees(np.arcsin(np.clip(vectors[..., 2], -1, 1)))
+    return ra, dec
+
+
+def j2000_to_jnow(ra, dec, timestamp=None):
+    """
+    ra, dec in degrees (floats or arrays)
+    """
+    return _rotate(np.asarray(ra, dtype=float), np.asarray(dec, dtype=float), frame_matrix(timestamp))
+
+
+def jnow_to_j2000(ra, dec, timestamp=None):
+    # the inverse of a rotation is its transpose
+    return _rotate(np.asarray(ra, dtype=float), np.asarray(dec, dtype=float), frame_matrix(timestamp).T)
+
+
+def convert(ra, dec, from_frame, to_frame, timestamp=None):
+    """
+    ra, dec in degrees from one frame to the other, ValueError for an unknown frame
+    """
+    if from_frame == to_frame:
+        return ra, dec
+    if (from_frame, to_frame) == (J2000, JNOW):
+        return j2000_to_jnow(ra, dec, timestamp)
+    if (from_frame, to_frame) == (JNOW, J2000):
+        return jnow_to_j2000(ra, dec, timestamp)
+    raise ValueError("unknown frame " + repr(from_frame) + " or " + repr(to_frame))
+
+
+def target_in(target, frame, timestamp=None):
+    """
+    Target (odroid_pointing.py) in the given frame, the astap hints are kept (they are only hints)
+    """
+    if target.frame == frame:
+        return target
+    ra, dec = convert(target.ra, target.dec, target.frame, frame, timestamp)
+    return target._replace(ra=float(ra), dec=float(dec), frame=frame)
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+
+## about this script
+# serial link with the arduino Uno of the equatorial table, without any GUI
+# the protocol is the one of arduino_equatorial_table_stepper_bigeasydriver.ino (115200 baud):
+#       one command per line: Y (telemetry), V<speed> (steps/s), R (reset position and tracking time),
+#       D<duty> (fan, PWM 0-255)
+#       each command answers with one telemetry line "speed":725.00,"running":1,...
+# the table stops by itself when it reaches STOP_SWITCH: knowing its position and speed,
+# we can tell how long we can still track
+
+## functions:
+
+# open_eq_table         open the serial line if the Uno is connected, returns None otherwise
+# EqTable               telemetry, set/read speed, reset after rewinding the table, fan
+# time_to_end           seconds left before the table reaches STOP_SWITCH
+# format_duration       seconds as h:mm:ss for the GUI
+
+
+######################
+## import modules ####
+######################
+
+import serial               # arduino communication
+import json                 # handle arduino data
+from pathlib import Path    # check if device exists
+from time import sleep      # the Uno resets when the serial line is opened
+import odroid_trace as trace    # timed spans of the commands
+
+
+# the rocker Mega is the first arduino plugged (/dev/ttyACM0)
+TABLE_PORT = "/dev/ttyACM1"
+TABLE_BAUDRATE = 115200
+
+# number of steps between the rewound position and STOP_SWITCH
+# measure it once: press R when rewound, let the table run to the switch and read "position"
+TABLE_TRAVEL_STEPS = 725 * 3600
+
+
+######################
+####  functions  #####
+######################
+
+def open_eq_table(port=TABLE_PORT, timeout=1):
+    """
+    open the serial line of the Uno, returns None if not connected
+    """
+    if not Path(port).exists():
+        return None
+    ser = trace.TracedSerial(serial.Serial(port, TABLE_BAUDRATE, timeout=timeout), "uno")
+    sleep(2)            # opening the line resets the Uno
+    ser.flushInput()
+    return EqTable(ser)
+
+
+class EqTable:
+    """
+    commands sent to the arduino Uno through an already opened serial line
+    """
+
+    def __init__(self, ser):
+        self.ser = ser
+
+    def command(self, line):
+        """
+        send one command line and return the telemetry the Uno answers with, as a dictionary
+        keys: speed, running, stop_switch, flip_switch, elapsed (s), position (steps), fan (duty), temp (°C)
+        """
+        with trace.span("table.command", command=line):
+            self.ser.flushInput()
+            self.ser.write(bytes(line + "\n", 'UTF-8'))
+            output_string = self.ser.readline().decode('utf-8').strip()
+        if not output_string.startswith('"speed"'):
+            raise IOError("no answer from the equatorial table: " + repr(output_string))
+        return json.loads("{" + output_string + "}")
+
+    def status(self):
+        return self.command("Y")
+
+    def get_speed(self):
+        return self.status()["speed"]
+
+    def set_speed(self, speed):
+        """
+        new tracking speed in steps/s, returns the telemetry (the Uno ignores speeds outside 0-2000)
+        """
+        return self.command("V{:.3f}".format(speed))
+
+    def reset(self):
+        """
+        to be called once the table has been rewound
+        """
+        return self.command("R")
+
+    def set_fan(self, duty):
+        """
+        PWM duty of the fan (0-255, dew control), returns the telemetry
+        """
+        return self.command("D{}".format(int(duty)))
+
+
+def time_to_end(status, travel_steps=TABLE_TRAVEL_STEPS):
+    """
+    seconds left before the table reaches STOP_SWITCH at the current speed
+    returns 0 if the switch is already pressed
+    """
+    if status["stop_switch"]:
+        return 0
+    steps_left = max(0, travel_steps - status["position"])
+    return steps_left / status["speed"]
+
+
+def format_duration(seconds):
+    """
+    3725 => "1:02:05"
+    """
+    seconds = int(seconds)
+    return "{}:{:02d}:{:02d}".format(seconds // 3600, (seconds % 3600) // 60, seconds % 60)
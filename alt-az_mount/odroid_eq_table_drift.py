@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+
+## about this script
+# closed loop correction of the equatorial table speed
+#   the table runs at a fixed speed (725 steps/s) without any feedback
+#   this loop takes and solves an image every minute, fits the drift of ra and dec over time
+#   (least squares straight line) and sends a corrected speed to the arduino Uno
+#
+# if the table tracked perfectly, the ra of the image centre would not change.
+# a telescope that does not track sees the ra of its field increase at the sidereal rate,
+# so with a table running at speed s the ra drifts at sidereal * (1 - s / s_ideal), which gives:
+#       s_ideal = s / (1 - ra_rate / sidereal)
+# the dec drift comes from the polar alignment of the table, it cannot be corrected by the speed
+# and is only reported.
+#
+# do not use it during a goto: the mount must stay still while the drift is measured
+#
+# usage (target coordinates as hint for astap): python3 odroid_eq_table_drift.py --ra 83.8 --dec -5.4
+
+## functions:
+
+# unwrap_ra             keeps ra values continuous around 0/360
+# fit_drift             least squares ra and dec rates (deg/s) and residuals (arcsec)
+# corrected_speed       table speed that cancels the measured ra drift
+# DriftLoop             capture, solve, fit and correct periodically
+
+
+######################
+## import modules ####
+######################
+
+import argparse                         # command line
+from math import sqrt                   # residuals
+from time import monotonic, sleep       # timestamps and interval between images
+from odroid_eq_table import open_eq_table          # arduino Uno of the table
+from odroid_solver import IMAGE_DIR, capture_image, solve_image
+import odroid_trace as trace            # DOBSON_TRACE=file writes the timed spans
+
+
+SIDEREAL_RATE = 360 / 86164.0905        # deg/s
+DRIFT_IMAGE = IMAGE_DIR / "drift_image.png"
+
+
+######################
+####  functions  #####
+######################
+
+def unwrap_ra(ra_values):
+    """
+    359.9, 0.1 => 359.9, 360.1 so that the fit does not see a 360 degrees jump
+    """
+    unwrapped = []
+    for ra in ra_values:
+        if unwrapped:
+            while ra - unwrapped[-1] > 180:
+                ra -= 360
+            while ra - unwrapped[-1] < -180:
+                ra += 360
+        unwrapped.append(ra)
+    return unwrapped
+
+
+def fit_line(times, values):
+    """
+    least squares straight line, returns slope and rms of residuals
+    """
+    n = len(times)
+    t_mean = sum(times) / n
+    v_mean = sum(values) / n
+    stt = sum((t - t_mean) ** 2 for t in times)
+    slope = sum((t - t_mean) * (v - v_mean) for t, v in zip(times, values)) / stt
+    residuals = [v - (v_mean + slope * (t - t_mean)) for t, v in zip(times, values)]
+    return slope, sqrt(sum(r * r for r in residuals) / n)
+
+
+def fit_drift(times, ra_values, dec_values):
+    """
+    times in seconds, coordinates in degrees
+    returns ra_rate, dec_rate (deg/s) and rms of the residuals in ra and dec (arcsec)
+    """
+    ra_rate, ra_rms = fit_line(times, unwrap_ra(ra_values))
+    dec_rate, dec_rms = fit_line(times, dec_values)
+    return ra_rate, dec_rate, ra_rms * 3600, dec_rms * 3600
+
+
+def corrected_speed(speed, ra_rate):
+    """
+    speed (steps/s) at which the ra of the image would stay constant
+    """
+    return speed / (1 - ra_rate / SIDEREAL_RATE)
+
+
+class DriftLoop:
+    """
+    measure() takes and solves one image, correct() fits the last measures and updates the table speed
+    capture() must return the path of a new image, solve(path, hint) returns (ra,dec) or None,
+    hint being the last (ra,dec) solved
+    """
+
+    def __init__(self, table, capture, solve, interval=60, min_points=5, window=15, max_change=0.02):
+        self.table = table              # EqTable
+        self.capture = capture
+        self.solve = solve
+        self.interval = interval        # s between two images
+        self.min_points = min_points    # measures needed before a correction
+        self.window = window            # only the last measures are fitted
+        self.max_change = max_change    # max relative change of speed in one correction
+        self.times = []
+        self.ra_values = []
+        self.dec_values = []
+        self.hint = None
+
+    def measure(self):
+        """
+        returns the solved (ra,dec), or None if the image could not be solved (it is then ignored)
+        """
+        start = monotonic()
+        path = self.capture()
+        # time of the middle of the exposure
+        middle = (start + monotonic()) / 2
+        coords = self.solve(path, self.hint)
+        if coords is None:
+            return None
+        self.hint = coords
+        self.times.append(middle)
+        self.ra_values.append(coords[0])
+        self.dec_values.append(coords[1])
+        del self.times[:-self.window], self.ra_values[:-self.window], self.dec_values[:-self.window]
+        return coords
+
+    def correct(self):
+        """
+        fit the drift and send the new speed, returns a dictionary with the results
+        or None if there are not enough measures yet
+        measures are cleared after a correction since they were taken at the old speed
+        """
+        if len(self.times) < self.min_points:
+            return None
+        ra_rate, dec_rate, ra_rms, dec_rms = fit_drift(self.times, self.ra_values, self.dec_values)
+        speed = self.table.get_speed()
+        new_speed = corrected_speed(speed, ra_rate)
+        # limit the change, a bad solve must not ruin the tracking
+        new_speed = max(speed * (1 - self.max_change), min(speed * (1 + self.max_change), new_speed))
+        self.table.set_speed(new_speed)
+        del self.times[:], self.ra_values[:], self.dec_values[:]
+        return {"speed": speed, "new_speed": new_speed,
+                "ra_drift": ra_rate * 3600 * 60, "dec_drift": dec_rate * 3600 * 60,   # arcsec/min
+                "ra_rms": ra_rms, "dec_rms": dec_rms}
+
+    def run(self, cycles=None):
+        """
+        measure every interval, correct as soon as enough measures are available
+        cycles = None runs until interrupted
+        """
+        cycle = 0
+        while cycles is None or cycle < cycles:
+            start = monotonic()
+            coords = self.measure()
+            if coords is None:
+                print("drift: could not solve image")
+            else:
+                result = self.correct()
+                if result is not None:
+                    print("drift: ra {ra_drift:+.1f}\"/min dec {dec_drift:+.1f}\"/min (rms {ra_rms:.1f}\" {dec_rms:.1f}\")"
+                          " => speed {speed:.3f} -> {new_speed:.3f} steps/s".format(**result))
+            cycle += 1
+            sleep(max(0, self.interval - (monotonic() - start)))
+
+
+######################
+######  main  ########
+######################
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="closed loop correction of the equatorial table speed")
+    parser.add_argument("--ra", type=float, required=True, help="approximate ra of the field (degrees)")
+    parser.add_argument("--dec", type=float, required=True, help="approximate dec of the field (degrees)")
+    parser.add_argument("--interval", type=float, default=60, help="seconds between two images")
+    args = parser.parse_args()
+    trace.start_from_environment()
+
+    table = open_eq_table()
+    if table is None:
+        raise SystemExit("equatorial table not connected")
+
+    def capture():
+        return capture_image(DRIFT_IMAGE)
+
+    def solve(path, hint):
+        # wide search for the first image, then around the last solution
+        if hint is None:
+            return solve_image(path, args.ra / 15, args.dec + 90, radius=15)
+        return solve_image(path, hint[0] / 15, hint[1] + 90, radius=2)
+
+    DriftLoop(table, capture, solve, interval=args.interval).run()
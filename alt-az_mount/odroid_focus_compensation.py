@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+
+## about this script
+# temperature compensation of the focus
+#   the tube cools down during the night and the focus drifts with the temperature
+#   each time the telescope has been focused (manually or by an autofocus run), the focus position
+#   and the rocker temperatures are logged in focus_log.csv
+#   a least squares fit of position vs temperature gives a coefficient in steps per °C
+#   during the session, when the temperature has drifted enough, a small focus correction is sent
+#   to the arduino instead of a full refocus
+
+# the arduino does not know the absolute focus position: the position is counted in half steps
+# by the GUI since it was launched, so each session has its own zero.
+# the fit therefore uses one common slope with one intercept per session (pooled within-session regression)
+
+## functions:
+
+# tube_temperature          temperature used for the compensation (average of intake and outflow DHT22)
+# log_focus                 append focus position and temperatures to focus_log.csv
+# load_focus_log            read focus_log.csv
+# fit_steps_per_degree      least squares coefficient in steps per °C, from all logged sessions
+# FocusCompensator          keeps track of the reference and sends corrections when temperature drifts
+
+
+######################
+## import modules ####
+######################
+
+import csv                  # focus log file
+import datetime             # timestamp of focus log entries
+from math import isnan      # DHT22 returns nan when it could not be read
+from pathlib import Path    # focus log file
+
+
+FOCUS_LOG = Path("/home/dlg/Documents/python") / "focus_log.csv"
+FOCUS_LOG_FIELDS = ["time", "session", "position", "t_tube", "t_intake", "t_outflow", "t_eq_table"]
+
+# half steps sent by each focus command of the arduino (see Focus() calls in the .ino)
+FOCUS_STEPS = {'N': 100, 'B': -100, 'F': 500, 'G': -500, 'R': 3000, 'T': -3000}
+
+
+######################
+####  functions  #####
+######################
+
+def tube_temperature(sensors):
+    """
+    average of intake and outflow air temperature, or the one that could be read
+    returns None if none of them is available
+    """
+    values = [sensors.get(key) for key in ("t_intake", "t_outflow")]
+    values = [value for value in values if value is not None and not isnan(value)]
+    if not values:
+        return None
+    return sum(values) / len(values)
+
+
+def log_focus(session, position, sensors, path=FOCUS_LOG):
+    """
+    append a line to the focus log (creates the file and its header if needed)
+    returns False if the temperature could not be read
+    """
+    t_tube = tube_temperature(sensors)
+    if t_tube is None:
+        return False
+    new_file = not Path(path).exists()
+    with open(path, "a", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=FOCUS_LOG_FIELDS)
+        if new_file:
+            writer.writeheader()
+        writer.writerow({
+            "time": datetime.datetime.now().isoformat(timespec="seconds"),
+            "session": session,
+            "position": position,
+            "t_tube": t_tube,
+            "t_intake": sensors.get("t_intake"),
+            "t_outflow": sensors.get("t_outflow"),
+            "t_eq_table": sensors.get("t_eq_table"),
+        })
+    return True
+
+
+def load_focus_log(path=FOCUS_LOG):
+    """
+    returns the log as a list of (session, position, t_tube)
+    """
+    if not Path(path).exists():
+        return []
+    with open(path, newline="") as f:
+        return [(row["session"], float(row["position"]), float(row["t_tube"])) for row in csv.DictReader(f)]
+
+
+def fit_steps_per_degree(entries):
+    """
+    least squares slope of focus position vs tube temperature
+    each session gets its own intercept (positions are relative to the start of the session),
+    so only the variations within a session are used:
+        slope = sum of (t - t_mean)(p - p_mean) / sum of (t - t_mean)^2, means taken per session
+    returns None if there is not enough temperature spread to get a coefficient
+    """
+    sessions = {}
+    for session, position, t_tube in entries:
+        sessions.setdefault(session, []).append((position, t_tube))
+
+    sxy = 0.0
+    sxx = 0.0
+    for points in sessions.values():
+        if len(points) < 2:
+            continue
+        p_mean = sum(p for p, t in points) / len(points)
+        t_mean = sum(t for p, t in points) / len(points)
+        sxy += sum((t - t_mean) * (p - p_mean) for p, t in points)
+        sxx += sum((t - t_mean) ** 2 for p, t in points)
+
+    # less than half a degree of spread in total: the coefficient would be mostly noise
+    if sxx < 0.25:
+        return None
+    return sxy / sxx
+
+
+class FocusCompensator:
+    """
+    after the telescope has been focused, call start() with the focus position and the sensors
+    then call update() with new sensor values every few minutes:
+    the expected position is reference position + coefficient * (temperature - reference temperature)
+    and a correction is sent when the difference with the current position is large enough
+    """
+
+    def __init__(self, link, steps_per_degree, min_steps=30, max_steps=400):
+        self.link = link                            # MountLink
+        self.steps_per_degree = steps_per_degree
+        self.min_steps = min_steps                  # smaller corrections are not worth it (and backlash)
+        self.max_steps = max_steps                  # never move more than this at once
+        self.reference_position = None
+        self.reference_temperature = None
+        self.position = None
+
+    def start(self, position, sensors):
+        """
+        new reference, e.g. just after focusing
+        """
+        t_tube = tube_temperature(sensors)
+        if t_tube is None:
+            return False
+        self.reference_position = position
+        self.reference_temperature = t_tube
+        self.position = position
+        return True
+
+    def correction(self, t_tube):
+        """
+        number of half steps needed to follow the temperature (0 if below min_steps)
+        """
+        expected = self.reference_position + self.steps_per_degree * (t_tube - self.reference_temperature)
+        steps = int(round(expected - self.position))
+        if abs(steps) < self.min_steps:
+            return 0
+        return max(-self.max_steps, min(self.max_steps, steps))
+
+    def update(self, sensors):
+        """
+        send a correction to the arduino if needed, returns the number of half steps moved
+        """
+        if self.reference_temperature is None:
+            return 0
+        t_tube = tube_temperature(sensors)
+        if t_tube is None:
+            return 0
+        steps = self.correction(t_tube)
+        if steps:
+            self.link.focus_steps(steps)
+            self.position += steps
+        return steps
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+
+## about this script
+# frame store: every frame of the camera is kept for later (stacking, autofocus, analysis, replay)
+#   instead of being overwritten in calibration_image.png
+#   frames are appended to FITS cubes preallocated on disk (CHUNK_FRAMES frames each, uint16 as
+#   BITPIX 16 with BZERO 32768, astap and siril read them) and written through numpy.memmap: nothing
+#   is held in memory, the page cache writes the frames back and a reader maps only the cube it reads
+#   (16 ASI294 frames are a 375 MB cube, far from the 4 GB of the odroid)
+#   index.jsonl has one line per frame (number, cube and slot, shape and type, time, exposure, gain,
+#   target, path) and one line per solve result, added when the frame is solved
+#   a frame of another shape or type than the cube being written (binning or roi changed in the toml)
+#   starts a new cube: each cube has one shape, the one of its frames in the index
+#
+# usage:
+#   store = FrameStore(); camera.listeners.append(store.listener); solver = StoringSolver(solver, store)
+#   python3 odroid_frames.py /home/dlg/Documents/python/frames/20240301-213000    (lists the frames)
+
+## functions:
+
+# camera_settings       exposure and gain of the camera configuration file (zwo_asi.toml)
+# FrameStore            appends frames to memory-mapped FITS cubes, index.jsonl, reads them back
+# to_native             stored frame back to its numpy type
+# StoringSolver         wraps the solver, adds each solution to the index of its frame
+# load_index            the entries of index.jsonl, solve results merged in their frame
+
+
+######################
+## import modules ####
+######################
+
+import argparse                         # command line
+import datetime                         # name of the store, time of the frames
+import json                             # index
+from pathlib import Path                # store directory
+import numpy as np                      # memory-mapped cubes
+from odroid_image import FITS_BLOCK, FITS_TYPES, fits_header
+from odroid_solver import CAMERA_CONF, IMAGE_DIR
+import odroid_trace as trace            # timed spans of each frame written
+
+
+FRAME_DIR = IMAGE_DIR / "frames"
+
+# frames per cube file
+CHUNK_FRAMES = 16
+
+
+######################
+####  functions  #####
+######################
+
+def camera_settings(conf_path=CAMERA_CONF):
+    """
+    exposure and gain found in the camera configuration (toml), None for what is not found
+    """
+    try:
+        import tomllib                  # python 3.11
+        with open(conf_path, "rb") as file:
+            conf = tomllib.load(file)
+    except (ImportError, OSError, ValueError):
+        return {"exposure": None, "gain": None}
+
+    settings = {}
+
+    def search(table):
+        for key, value in table.items():
+            if isinstance(value, dict):
+                if key.lower() in ("exposure", "gain") and "value" in value:
+                    settings.setdefault(key.lower(), value["value"])
+                else:
+                    search(value)
+            elif key.lower() in ("exposure", "gain"):
+                settings.setdefault(key.lower(), value)
+
+    search(conf)
+    return {"exposure": settings.get("exposure"), "gain": settings.get("gain")}
+
+
+class FrameStore:
+    """
+    add(frame, **data) appends a frame and returns its number, solved(number, solution) adds its solution
+    listener(frame, path) is a camera listener (odroid_solver.ZwoCamera)
+    frame(number) is a read-only memmap view of a stored frame (no copy, FITS type: see to_native)
+    """
+
+    def __init__(self, directory=FRAME_DIR, name=None, chunk_frames=CHUNK_FRAMES, settings=None):
+        name = name or datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+        self.path = Path(directory) / name
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.chunk_frames = chunk_frames
+        self.settings = camera_settings() if settings is None else settings
+        self.context = {}               # added to each frame (target of the goto)
+        self.index = open(self.path / "index.jsonl", "a")
+        self.entries = load_index(self.path)
+        self.count = len(self.entries)
+        self.cube = None                # memmap being written
+        # cube and slot of the next frame, shape and type of the cube (after the last frame of the index)
+        self.cube_number, self.slot = 0, 0
+        self.cube_format = None
+        if self.entries:
+            last = self.entries[-1]
+            self.cube_number = last.get("cube", last["frame"] // self.chunk_frames)
+            self.slot = last["slot"] + 1
+            self.cube_format = (tuple(last["shape"]), np.dtype(last["dtype"]))
+        self.last_path = None           # file of the last frame, to match its solve result
+        self.readers = {}
+
+    def _cube_file(self, number):
+        return self.path / "cube_{:03d}.fits".format(number)
+
+    def _open_cube(self, number, shape, dtype, mode):
+        """
+        memmap of the frames of a cube, created at its full size (sparse file) when written first
+        """
+        header = fits_header(shape, dtype, self.chunk_frames, creator="odroid_frames.py")
+        file = self._cube_file(number)
+        _, _, fits_type = FITS_TYPES[np.dtype(dtype)]
+        if mode == "r+" and not file.exists():
+            size = len(header) + self.chunk_frames * int(np.prod(shape)) * np.dtype(fits_type).itemsize
+            with open(file, "wb") as data:
+                data.write(header)
+                data.truncate(size + (-size % FITS_BLOCK))
+        return np.memmap(file, dtype=fits_type, mode=mode, offset=len(header), shape=(self.chunk_frames,) + tuple(shape))
+
+    def add(self, frame, **data):
+        frame = np.asarray(frame)
+        number = self.count
+        with trace.span("frames.add", frame=number):
+            frame_format = (frame.shape, frame.dtype)
+            if self.slot >= self.chunk_frames or (self.cube_format is not None and frame_format != self.cube_format):
+                # cube full, or a frame of another shape or type: the next cube
+                if self.cube is not None:
+                    self.cube.flush()
+                self.cube = None
+                self.cube_number += 1
+                self.slot = 0
+            if self.cube is None:
+                self.cube = self._open_cube(self.cube_number, frame.shape, frame.dtype, "r+")
+                self.cube_format = frame_format
+            cube_number, slot = self.cube_number, self.slot
+            _, bzero, _ = FITS_TYPES[frame.dtype]
+            if bzero:
+                # x - 32768 on 16 bits is x with its top bit flipped
+                np.bitwise_xor(frame, 0x8000, out=self.cube[slot].view(">u2"))
+            else:
+                self.cube[slot] = frame
+            self.cube.flush()
+            self.slot += 1
+        entry = {"frame": number, "cube": cube_number, "file": self._cube_file(cube_number).name, "slot": slot,
+                 "shape": list(frame.shape), "dtype": frame.dtype.name,
+                 "time": datetime.datetime.now().isoformat(timespec="milliseconds")}
+        entry.update(self.settings)
+        entry.update(self.context)
+        entry.update(data)
+        self._write(entry)
+        self.entries.append(entry)
+        self.count += 1
+        self.last_path = data.get("path")
+        return number
+
+    def listener(self, frame, path):
+        self.add(frame, path=str(path))
+
+    def solved(self, number, solution):
+        entry = {"frame": number, "solution": list(solution) if solution is not None else None}
+        self._write(entry)
+        self.entries[number].update(entry)
+
+    def _write(self, entry):
+        self.index.write(json.dumps(entry) + "\n")
+        self.index.flush()
+
+    def frame(self, number):
+        """
+        read-only view of a frame in the cube on disk, pages are read only when used
+        """
+        entry = self.entries[number]
+        cube_number = entry.get("cube", number // self.chunk_frames)
+        if cube_number not in self.readers:
+            # one cube mapped at a time: the address space of a 32 bits odroid is small
+            self.readers = {cube_number: self._open_cube(cube_number, tuple(entry["shape"]), entry["dtype"], "r")}
+        return self.readers[cube_number][entry["slot"]]
+
+    def close(self):
+        if self.cube is not None:
+            self.cube.flush()
+        self.cube = None
+        self.readers = {}
+        self.index.close()
+        return self.path
+
+
+def to_native(view):
+    """
+    frame in its numpy type (uint16 for BZERO 32768), this one copies
+    """
+    if view.dtype == np.dtype(">i2"):
+        return view.view(">u2") ^ np.uint16(0x8000)
+    return view.astype(view.dtype.newbyteorder("="))
+
+
+class StoringSolver:
+    """
+    solver wrapper: the solution of the last stored frame is added to the index
+    """
+
+    def __init__(self, solver, store):
+        self.solver = solver
+        self.store = store
+
+    def solve(self, path, ra_hrs, spd):
+        solution = self.solver.solve(path, ra_hrs, spd)
+        if self.store.count and self.store.last_path == str(path):
+            self.store.solved(self.store.count - 1, solution)
+        return solution
+
+
+def load_index(directory):
+    """
+    entries of index.jsonl in frame order, the solve results merged in their frame
+    """
+    entries = []
+    try:
+        with open(Path(directory) / "index.jsonl") as file:
+            for line in file:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                if entry["frame"] < len(entries):
+                    entries[entry["frame"]].update(entry)
+                else:
+                    entries.append(entry)
+    except FileNotFoundError:
+        pass
+    return entries
+
+
+######################
+######  main  ########
+######################
+
+def main():
+    parser = argparse.ArgumentParser(description="list the frames of a frame store")
+    parser.add_argument("store", help="directory of the store")
+    args = parser.parse_args()
+
+    entries = load_index(args.store)
+    print("{:>5} {:<24} {:>9} {:>6} {:>9} {:>9}".format("frame", "time", "exposure", "gain", "ra", "dec"))
+    for entry in entries:
+        solution = entry.get("solution") or (None, None)
+        print("{:>5} {:<24} {:>9} {:>6} {:>9} {:>9}".format(
+            entry["frame"], entry["time"], str(entry.get("exposure")), str(entry.get("gain")),
+            "-" if solution[0] is None else "{:.4f}".format(solution[0]),
+            "-" if solution[1] is None else "{:.4f}".format(solution[1])))
+    print("{} frames, {} solved".format(len(entries), sum(bool(e.get("solution")) for e in entries)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+
+## about this script
+# goto controller: what odroid_solve_and_goto_gui.py does, without any GUI
+#   it keeps the state that the GUI used to keep in globals: target, position of the last image,
+#   calibration and number of steps to the target, and the session being recorded
+#   the GUI only reads the fields and displays them, so the same sequence can be run from a script:
+#       goto = GotoController(MountLink(open_arduino()), ZwoCamera(), AstapSolver(), Catalog())
+#       goto.find_target("Messier", "42")
+#       goto.calibrate()
+#       goto.compare()
+#       goto.go_to()
+
+## functions:
+
+# GotoController        find target, take and solve image, calibrate, compare, go to, record the session,
+#                           store the frames (odroid_frames.py), skip the frames that cannot be solved
+#                           (odroid_quality.py)
+
+
+######################
+## import modules ####
+######################
+
+import odroid_pointing as pointing      # calibrate, compare and go to
+import odroid_session as session        # record sessions so that they can be replayed
+import odroid_frames as frames          # keep every frame in memory-mapped FITS cubes
+import odroid_quality as quality        # health of each frame, hopeless frames are not solved
+from odroid_pointing import PointingError, nothing
+
+
+class GotoController:
+    """
+    mount, camera and solver as in odroid_pointing.py (None if not connected), catalog has find(cat, ref)
+    after each step the results are in: target, ra_img, dec_img, calibration, result, stepper_az, stepper_vc
+    """
+
+    def __init__(self, mount, camera, solver, catalog):
+        self.mount = mount
+        self.camera = camera
+        self.solver = solver
+        self.catalog = catalog
+        self.recorder = None
+        self.store = None               # FrameStore while the frames are stored
+        self.health = quality.FrameMonitor()
+        self.target = None
+        self.calibration = None
+        self.ra_img = None
+        self.dec_img = None
+        self.result = None
+        self.stepper_az = None
+        self.stepper_vc = None
+        # the solver prepares a small frame from the last frame of the camera (odroid_solver.AstapSolver)
+        # and every frame is measured before it is solved
+        listeners = getattr(camera, "listeners", None)
+        if listeners is not None:
+            listeners.append(self.health.listener)
+            if hasattr(solver, "listener"):
+                listeners.append(solver.listener)
+        # the path of the camera is always the same file: what was kept of the last frame is dropped when
+        # the next capture starts
+        start_listeners = getattr(camera, "start_listeners", None)
+        if start_listeners is not None:
+            start_listeners.append(self.health.forget)
+            if hasattr(solver, "forget"):
+                start_listeners.append(solver.forget)
+
+    def find_target(self, cat, ref):
+        """
+        returns the Target, or None if it is not in the catalog
+        """
+        self.target = self.catalog.find(cat, ref)
+        return self.target
+
+    def take_image(self):
+        """
+        returns the path of the new image
+        """
+        return self.camera.capture()
+
+    def solve(self, path):
+        """
+        solves an image around the target, returns ra,dec in degrees
+        raises PointingError if it cannot be solved
+        """
+        solver = self.storing(self.solver)
+        solution = solver.solve(path, self.target.ra_hrs, self.target.spd)
+        if solution is None:
+            raise PointingError(solver.skipped or "could not solve image")
+        self.ra_img = float(solution[0])
+        self.dec_img = float(solution[1])
+        return self.ra_img, self.dec_img
+
+    def hardware(self):
+        """
+        mount, camera and solver, wrapped so that the session can be replayed when recording
+        """
+        solver = self.storing(self.solver)
+        if self.recorder is None:
+            return self.mount, self.camera, solver
+        return (session.RecordingMount(self.mount, self.recorder),
+                session.RecordingCamera(self.camera, self.recorder),
+                session.RecordingSolver(solver, self.recorder))
+
+    def storing(self, solver):
+        """
+        the solver, wrapped so that the hopeless frames are not solved and the solutions go to the index
+        of the frame store
+        """
+        if self.store is not None:
+            solver = frames.StoringSolver(solver, self.store)
+        return quality.CheckingSolver(solver, self.health)
+
+    def record(self, kind, **data):
+        if self.recorder is not None:
+            self.recorder.record(kind, **data)
+
+    def start_recording(self, directory=session.SESSION_DIR):
+        self.recorder = session.SessionRecorder(directory)
+
+    def stop_recording(self):
+        """
+        returns the path of the session archive
+        """
+        archive = self.recorder.close()
+        self.recorder = None
+        return archive
+
+    def start_storing(self, directory=frames.FRAME_DIR):
+        """
+        every frame of the camera goes to a frame store, with the target it was taken for
+        """
+        self.store = frames.FrameStore(directory)
+        self.camera.listeners.append(self.store_frame)
+
+    def store_frame(self, frame, path):
+        target = self.target
+        self.store.add(frame, path=str(path), target=None if target is None else [target.ra, target.dec])
+
+    def stop_storing(self):
+        """
+        returns the directory of the frame store
+        """
+        self.camera.listeners.remove(self.store_frame)
+        directory = self.store.close()
+        self.store = None
+        return directory
+
+    def calibrate(self, report=nothing, progress=nothing):
+        """
+        see odroid_pointing.calibrate, the telescope position is the one of the last image
+        raises PointingError
+        """
+        mount, camera, solver = self.hardware()
+        self.record("calibrate", target=list(self.target))
+        try:
+            calibration = pointing.calibrate(mount, camera, solver, self.target, report, progress)
+        except PointingError as error:
+            self.record("calibration", result={"error": str(error)})
+            raise
+        self.record("calibration", result=calibration._asdict())
+        self.calibration = calibration
+        self.ra_img = calibration.ra_img
+        self.dec_img = calibration.dec_img
+        return calibration
+
+    def compare(self):
+        """
+        difference between last image and target, number of steps to the target
+        """
+        self.result = self.calibration.compare(self.target, self.ra_img, self.dec_img)
+        self.stepper_az = self.result["stepper_az"]
+        self.stepper_vc = self.result["stepper_vc"]
+        return self.result
+
+    def go_to(self, report=nothing):
+        """
+        see odroid_pointing.go_to, the new image is compared again so that go_to can be repeated
+        raises PointingError
+        """
+        mount, camera, solver = self.hardware()
+        self.record("goto", target=list(self.target), calibration=self.calibration._asdict(),
+                    stepper_az=self.stepper_az, stepper_vc=self.stepper_vc)
+        try:
+            ra_img, dec_img, result = pointing.go_to(mount, camera, solver, self.calibration, self.target,
+                                                     self.stepper_az, self.stepper_vc, report)
+        except PointingError as error:
+            self.record("goto_result", result={"error": str(error)})
+            raise
+        self.record("goto_result", result=dict(result, ra_img=ra_img, dec_img=dec_img))
+        self.ra_img = ra_img
+        self.dec_img = dec_img
+        self.result = result
+        self.stepper_az = result["stepper_az"]
+        self.stepper_vc = result["stepper_vc"]
+        return result
+
+    def close(self):
+        """
+        saves the session being recorded
+        """
+        if self.recorder is not None:
+            self.stop_recording()
+        if self.store is not None:
+            self.stop_storing()
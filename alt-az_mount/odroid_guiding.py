@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+
+## about this script
+# autoguiding with a guide camera (refractor on one of the side bearings)
+#   small ROI frames are taken as fast as possible around a guide star
+#   the star centroid is measured with sub-pixel accuracy (background subtracted, numpy)
+#   the error is split in two:
+#       - the part along the direction the equatorial table moves the star => table speed tweak
+#       - the rest => AZ/ALT micro corrections through the arduino Mega ("g" command)
+#   like in calibrate() of odroid_solve_and_goto_gui.py, the axes are found by moving the motors
+#   and measuring how the star moves, giving an angle (angle_av) and a displacement per step
+#
+# each cycle has a latency budget: a centroid that arrives too late describes where the star was,
+# not where it is, so it is not used for a correction
+# all the buffers are allocated once for a given ROI size, nothing is allocated per frame
+#
+# odroid_guiding_sim.py runs the same loop against a synthetic drifting star
+
+## functions:
+
+# rotate                same rotation of axes as convert_coord in odroid_solve_and_goto_gui.py
+# Centroider            background subtracted sub-pixel centroid in preallocated buffers
+# GuideCalibration      angle and pixels per step of AZ, ALT and table, converts an error to steps
+# GuideCamera           ZWO camera used with a small ROI
+# GuideLoop             lock on the star, calibrate, then correct every cycle
+
+
+######################
+## import modules ####
+######################
+
+import numpy as np                      # centroid
+from math import atan2, cos, sin, hypot, copysign
+from time import monotonic, sleep       # latency budget
+import odroid_scheduling as scheduling  # guiding thread on the core of the mount, real time priority
+import odroid_trace as trace            # timed spans of captures, centroids and corrections
+
+
+######################
+####  functions  #####
+######################
+
+def rotate(x, y, angle):
+    """
+    rotation of axes, source: https://doubleroot.in/lessons/coordinate-geometry-basics/rotation-of-axes/
+    x,y given in a frame rotated by angle (rad): returns the coordinates along and across the new axis
+    """
+    along = x*cos(angle) + y*sin(angle)
+    across = y*cos(angle) - x*sin(angle)
+    return along, across
+
+
+class Centroider:
+    """
+    centroid of the brightest star of a frame, all the work arrays are allocated here once
+    measure() returns (x, y, flux, snr) in pixels of the frame, or None if no star is found
+    """
+
+    def __init__(self, shape, radius=6, threshold=3.0, sample_step=4):
+        self.shape = shape
+        self.radius = radius                # half size of the window around the peak
+        self.threshold = threshold          # in background sigma
+        self.sample_step = sample_step
+        self.work = np.empty(shape, dtype=np.float32)
+        self.sample = np.empty((len(range(0, shape[0], sample_step)), len(range(0, shape[1], sample_step))), dtype=np.float32)
+        self.sample_flat = self.sample.reshape(-1)
+        self.k_median = self.sample_flat.size // 2
+        self.k_low = int(self.sample_flat.size * 0.1587)     # median - 1 sigma for gaussian noise
+        size = 2 * radius + 1
+        self.profile_x = np.empty(size, dtype=np.float32)
+        self.profile_y = np.empty(size, dtype=np.float32)
+        self.positions = np.arange(max(shape), dtype=np.float32)
+
+    def measure(self, frame):
+        work = self.work
+        np.copyto(work, frame, casting='unsafe')
+
+        # background and noise from a subsample, partition works in place
+        np.copyto(self.sample, work[::self.sample_step, ::self.sample_step])
+        self.sample_flat.partition((self.k_low, self.k_median))
+        background = float(self.sample_flat[self.k_median])
+        sigma = max(background - float(self.sample_flat[self.k_low]), 1e-3)
+
+        # keep only what is above the threshold
+        work -= background + self.threshold * sigma
+        np.maximum(work, 0, out=work)
+
+        peak = int(work.argmax())
+        py, px = divmod(peak, self.shape[1])
+        if work[py, px] <= 0:
+            return None
+
+        y0, y1 = max(py - self.radius, 0), min(py + self.radius + 1, self.shape[0])
+        x0, x1 = max(px - self.radius, 0), min(px + self.radius + 1, self.shape[1])
+        window = work[y0:y1, x0:x1]
+        profile_x = self.profile_x[:x1 - x0]
+        profile_y = self.profile_y[:y1 - y0]
+        np.sum(window, axis=0, out=profile_x)
+        np.sum(window, axis=1, out=profile_y)
+        flux = float(profile_x.sum())
+        x = float(np.dot(profile_x, self.positions[x0:x1])) / flux
+        y = float(np.dot(profile_y, self.positions[y0:y1])) / flux
+        # rough snr: flux above threshold compared to the noise of the window
+        snr = flux / (sigma * window.size ** 0.5)
+        return x, y, flux, snr
+
+
+class GuideCalibration:
+    """
+    az_angle: direction (rad) in which the star moves on the guide camera when AZ moves by + steps
+    az_px_per_step, alt_px_per_step: displacement of the star per step
+    alt_sign: +1 or -1 depending on the side to which ALT moves the star (camera can be mirrored)
+    table_angle, table_px_per_step: same for the equatorial table (None if the table is not used)
+    """
+
+    def __init__(self, az_angle, az_px_per_step, alt_px_per_step, alt_sign=1, table_angle=None, table_px_per_step=None):
+        self.az_angle = az_angle
+        self.az_px_per_step = az_px_per_step
+        self.alt_px_per_step = alt_px_per_step
+        self.alt_sign = alt_sign
+        self.table_angle = table_angle
+        self.table_px_per_step = table_px_per_step
+
+    @classmethod
+    def from_moves(cls, az_move, az_steps, alt_move, alt_steps, table_move=None, table_steps=None):
+        """
+        moves are the (dx,dy) displacements of the star in pixels after moving by a number of steps
+        """
+        az_angle = atan2(az_move[1], az_move[0])
+        az_px_per_step = hypot(*az_move) / az_steps
+        # alt is taken as perpendicular to az, only its component across az is used
+        alt_across = rotate(alt_move[0], alt_move[1], az_angle)[1]
+        alt_px_per_step = abs(alt_across) / alt_steps
+        alt_sign = int(copysign(1, alt_across))
+        table_angle = table_px_per_step = None
+        if table_move is not None:
+            table_angle = atan2(table_move[1], table_move[0])
+            table_px_per_step = hypot(*table_move) / table_steps
+        return cls(az_angle, az_px_per_step, alt_px_per_step, alt_sign, table_angle, table_px_per_step)
+
+    def to_steps(self, dx, dy):
+        """
+        error (star position - reference, pixels) to the steps that bring the star back:
+        returns az_steps, alt_steps, table_steps (float, table_steps is 0 if the table is not used)
+        """
+        table_steps = 0.0
+        if self.table_angle is not None:
+            along, across = rotate(dx, dy, self.table_angle)
+            table_steps = -along / self.table_px_per_step
+            # what is left is corrected by AZ/ALT
+            dx, dy = -across * sin(self.table_angle), across * cos(self.table_angle)
+        az_px, alt_px = rotate(dx, dy, self.az_angle)
+        az_steps = -az_px / self.az_px_per_step
+        alt_steps = -self.alt_sign * alt_px / self.alt_px_per_step
+        return az_steps, alt_steps, table_steps
+
+
+class GuideCamera:
+    """
+    ZWO camera of the guide refractor, used with a small ROI centred on (x,y) of the full frame
+    credits: https://pypi.org/project/camera-zwo-asi/#description
+    """
+
+    def __init__(self, index=1, exposure_us=500000, gain=200):
+        # imported here so that the guiding can be simulated without the camera library
+        import camera_zwo_asi
+        self.camera = camera_zwo_asi.Camera(index)
+        self.camera.set_control("Exposure", exposure_us)
+        self.camera.set_control("Gain", gain)
+        self.full_roi = self.camera.get_roi()
+
+    def set_roi(self, x, y, size=64):
+        """
+        ROI of size x size pixels around x,y (full frame pixels), returns its shape
+        """
+        roi = self.camera.get_roi()
+        roi.bins = 1
+        roi.width = size
+        roi.height = size
+        roi.start_x = int(min(max(x - size // 2, 0), self.full_roi.width - size))
+        roi.start_y = int(min(max(y - size // 2, 0), self.full_roi.height - size))
+        self.camera.set_roi(roi)
+        return (size, size)
+
+    def capture(self):
+        return self.camera.capture().get_image()
+
+
+class GuideLoop:
+    """
+    camera: capture() returns a 2D frame (same shape every time)
+    mount: guide(az_steps, alt_steps), usually a MountLink
+    table: get_speed() and set_speed(), usually an EqTable, or None
+    """
+
+    def __init__(self, camera, mount, table=None, calibration=None, budget=2.0, aggressiveness=0.7,
+                 min_steps=2, max_steps=200, table_period=10.0, table_integral=0.1, max_table_change=0.02):
+        self.camera = camera
+        self.mount = mount
+        self.table = table
+        self.calibration = calibration
+        self.budget = budget                    # s, max age of a centroid when the correction is sent
+        self.aggressiveness = aggressiveness    # part of the error corrected each cycle
+        self.min_steps = min_steps              # smaller corrections are seeing, not tracking errors
+        self.max_steps = max_steps
+        self.table_period = table_period        # s, time over which the table removes its part of the error
+        self.table_integral = table_integral    # part of each table correction kept as a permanent speed trim
+        self.max_table_change = max_table_change
+        self.centroider = None
+        self.reference = None
+        self.table_speed = None                 # nominal table speed, steps/s
+        self.table_trim = 0.0                   # learnt speed offset (table not exactly at the right speed)
+        self.stats = {"cycles": 0, "lost": 0, "late": 0, "corrections": 0}
+        self.sum_square_error = 0.0             # for the rms of the error since lock, pixels
+        self.measures = 0
+
+    def measure(self):
+        with trace.span("guide.capture"):
+            frame = self.camera.capture()
+        if self.centroider is None or self.centroider.shape != frame.shape:
+            self.centroider = Centroider(frame.shape)
+        with trace.span("guide.centroid"):
+            return self.centroider.measure(frame)
+
+    def lock(self):
+        """
+        the current position of the star becomes the reference
+        """
+        star = self.measure()
+        if star is None:
+            return False
+        self.reference = star[:2]
+        self.sum_square_error = 0.0
+        self.measures = 0
+        if self.table is not None:
+            self.table_speed = self.table.get_speed()
+            self.table_trim = 0.0
+        return True
+
+    def displacement(self, settle=1.0):
+        sleep(settle)
+        star = self.measure()
+        if star is None:
+            return None
+        return star[0] - self.reference[0], star[1] - self.reference[1]
+
+    def calibrate(self, steps=400, table_seconds=20, table_change=0.1, settle=1.0):
+        """
+        move AZ, then ALT, by steps (and back), and run the table faster for table_seconds,
+        measuring how the star moves each time. returns False if the star was lost
+        """
+        if not self.lock():
+            return False
+        self.mount.guide(steps, 0)
+        az_move = self.displacement(settle)
+        self.mount.guide(-steps, 0)
+        self.mount.guide(0, steps)
+        alt_move = self.displacement(settle)
+        self.mount.guide(0, -steps)
+        if az_move is None or alt_move is None:
+            return False
+        table_move = table_steps = None
+        if self.table is not None:
+            self.lock()
+            self.table.set_speed(self.table_speed * (1 + table_change))
+            start = monotonic()
+            sleep(table_seconds)
+            self.table.set_speed(self.table_speed)
+            table_steps = self.table_speed * table_change * (monotonic() - start)
+            table_move = self.displacement(0)
+            if table_move is None:
+                return False
+        self.calibration = GuideCalibration.from_moves(az_move, steps, alt_move, steps, table_move, table_steps)
+        return self.lock()
+
+    def correct(self, dx, dy):
+        az_steps, alt_steps, table_steps = self.calibration.to_steps(dx, dy)
+        az_steps = int(round(max(-self.max_steps, min(self.max_steps, az_steps * self.aggressiveness))))
+        alt_steps = int(round(max(-self.max_steps, min(self.max_steps, alt_steps * self.aggressiveness))))
+        if abs(az_steps) < self.min_steps:
+            az_steps = 0
+        if abs(alt_steps) < self.min_steps:
+            alt_steps = 0
+        if az_steps or alt_steps:
+            self.mount.guide(az_steps, alt_steps)
+            self.stats["corrections"] += 1
+        if self.table is not None and self.calibration.table_angle is not None:
+            # proportional part removes the error, integral part learns the speed offset
+            change = table_steps * self.aggressiveness / self.table_period
+            limit = self.table_speed * self.max_table_change
+            self.table_trim = max(-limit, min(limit, self.table_trim + change * self.table_integral))
+            self.table.set_speed(self.table_speed + max(-limit, min(limit, self.table_trim + change)))
+        return az_steps, alt_steps
+
+    def cycle(self):
+        """
+        one frame: measure the star and correct if the centroid is still fresh
+        returns the error (dx,dy) in pixels, or None if the star was lost
+        """
+        start = monotonic()
+        self.stats["cycles"] += 1
+        star = self.measure()
+        if star is None:
+            self.stats["lost"] += 1
+            return None
+        dx, dy = star[0] - self.reference[0], star[1] - self.reference[1]
+        self.sum_square_error += dx * dx + dy * dy
+        self.measures += 1
+        if monotonic() - start > self.budget:
+            self.stats["late"] += 1
+            return dx, dy
+        with trace.span("guide.correct", dx=round(dx, 2), dy=round(dy, 2)):
+            self.correct(dx, dy)
+        return dx, dy
+
+    def run(self, cycles=None, interval=0.0):
+        """
+        guide for a number of cycles (None = until interrupted), interval = minimum time per cycle
+        the calling thread takes the cores and priority of the guiding role (odroid_scheduling.py)
+        """
+        scheduling.apply("guiding")
+        count = 0
+        while cycles is None or count < cycles:
+            start = monotonic()
+            self.cycle()
+            count += 1
+            sleep(max(0, interval - (monotonic() - start)))
+        return self.stats
+
+    def rms(self):
+        """
+        rms of the error since lock, pixels
+        """
+        if not self.measures:
+            return None
+        return (self.sum_square_error / self.measures) ** 0.5
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+
+## about this script
+# synthetic drifting star to test odroid_guiding.py without camera, arduino or clear sky
+#   the star is a gaussian on a noisy background, rendered in preallocated buffers
+#   it drifts with time (table not at the right speed + polar alignment error)
+#   the simulated mount and table move it in the directions a real guide camera would see
+#
+# usage: python3 odroid_guiding_sim.py          (prints the guiding rms with and without correction)
+
+## functions:
+
+# SyntheticStarCamera   renders the star where it should be at the time of capture
+# SimulatedMount        guide(az,alt) moves the star along the (rotated) AZ/ALT axes
+# SimulatedTable        get/set speed, a wrong speed makes the star drift along the table axis
+# simulate              builds camera, mount and table, calibrates and guides
+
+
+######################
+## import modules ####
+######################
+
+import numpy as np                      # synthetic frames
+from math import cos, sin, radians
+from time import monotonic              # the star drifts in real time
+from odroid_guiding import GuideLoop
+
+
+class SyntheticStarCamera:
+    """
+    size x size frames, star at (x,y) + offset (moves of the mount) + drift * time
+    """
+
+    def __init__(self, size=64, star=(32.0, 32.0), drift=(0.0, 0.0), fwhm=3.0, peak=3000.0,
+                 background=500.0, noise=20.0, seed=1):
+        self.shape = (size, size)
+        self.star = star
+        self.drift = drift                      # px/s, besides the drift due to the table
+        self.sigma = fwhm / 2.3548
+        self.peak = peak
+        self.background = background
+        self.noise = noise
+        self.offset = [0.0, 0.0]                # moved by SimulatedMount and SimulatedTable
+        self.table = None                       # SimulatedTable, its drift is applied at capture time
+        self.start = monotonic()
+        self.rng = np.random.default_rng(seed)
+        self.positions = np.arange(size, dtype=np.float32)
+        self.gauss_x = np.empty(size, dtype=np.float32)
+        self.gauss_y = np.empty(size, dtype=np.float32)
+        self.image = np.empty(self.shape, dtype=np.float32)
+        self.noise_buffer = np.empty(self.shape, dtype=np.float32)
+        self.frame = np.empty(self.shape, dtype=np.uint16)
+
+    def position(self):
+        elapsed = monotonic() - self.start
+        return (self.star[0] + self.offset[0] + self.drift[0] * elapsed,
+                self.star[1] + self.offset[1] + self.drift[1] * elapsed)
+
+    def gaussian(self, center, out):
+        np.subtract(self.positions, center, out=out)
+        np.square(out, out=out)
+        out *= -0.5 / self.sigma ** 2
+        np.exp(out, out=out)
+
+    def capture(self):
+        if self.table is not None:
+            self.table.update()
+        x, y = self.position()
+        self.gaussian(x, self.gauss_x)
+        self.gaussian(y, self.gauss_y)
+        np.multiply(self.gauss_y[:, None], self.gauss_x[None, :], out=self.image)
+        self.image *= self.peak
+        self.image += self.background
+        self.rng.standard_normal(dtype=np.float32, out=self.noise_buffer)
+        self.noise_buffer *= self.noise
+        self.image += self.noise_buffer
+        np.clip(self.image, 0, 65535, out=self.image)
+        np.copyto(self.frame, self.image, casting='unsafe')
+        return self.frame
+
+
+class SimulatedMount:
+    """
+    AZ moves the star along az_angle, ALT across it, px_per_step each
+    """
+
+    def __init__(self, camera, az_angle=radians(30), px_per_step=0.02):
+        self.camera = camera
+        self.az_angle = az_angle
+        self.px_per_step = px_per_step
+        self.moves = 0
+
+    def guide(self, az_steps, alt_steps):
+        c, s = cos(self.az_angle), sin(self.az_angle)
+        self.camera.offset[0] += (az_steps * c - alt_steps * s) * self.px_per_step
+        self.camera.offset[1] += (az_steps * s + alt_steps * c) * self.px_per_step
+        self.moves += 1
+        return True
+
+
+class SimulatedTable:
+    """
+    the star moves along table_angle at (speed - ideal_speed) * px_per_step pixels per second
+    """
+
+    def __init__(self, camera, speed=725.0, ideal_speed=727.0, table_angle=radians(110), px_per_step=0.01):
+        self.camera = camera
+        self.speed = speed
+        self.ideal_speed = ideal_speed
+        self.table_angle = table_angle
+        self.px_per_step = px_per_step
+        self.last = monotonic()
+
+    def update(self):
+        now = monotonic()
+        shift = (self.speed - self.ideal_speed) * self.px_per_step * (now - self.last)
+        self.camera.offset[0] += shift * cos(self.table_angle)
+        self.camera.offset[1] += shift * sin(self.table_angle)
+        self.last = now
+
+    def get_speed(self):
+        self.update()
+        return self.speed
+
+    def set_speed(self, speed):
+        self.update()
+        self.speed = speed
+        return {"speed": speed}
+
+
+def simulate(cycles=300, interval=0.05, guiding=True):
+    """
+    returns the rms of the guiding error (pixels) and the loop statistics
+    """
+    camera = SyntheticStarCamera(drift=(0.0, 0.1))
+    mount = SimulatedMount(camera)
+    table = SimulatedTable(camera)
+    camera.table = table
+
+    loop = GuideLoop(camera, mount, table, min_steps=1)
+    if not loop.calibrate(steps=400, table_seconds=2, table_change=0.5, settle=0):
+        raise SystemExit("star lost during calibration")
+    if not guiding:
+        loop.correct = lambda dx, dy: (0, 0)
+    stats = loop.run(cycles, interval)
+    return loop.rms(), stats
+
+
+######################
+######  main  ########
+######################
+
+if __name__ == "__main__":
+    rms, stats = simulate(guiding=False)
+    print("without guiding: rms {:.2f} px".format(rms), stats)
+    rms, stats = simulate(guiding=True)
+    print("with guiding:    rms {:.2f} px".format(rms), stats)
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+
+## about this script
+# hardware probing in the background, so that the GUIs paint at once instead of waiting for
+#   zwo-asi-print, the serial lines to open and the Uno to reset (2 s)
+# the devices are probed again when they are plugged or unplugged: /dev is watched with inotify
+#   (through libc, no extra module), with a plain polling of the device nodes if inotify is missing
+# the results are put in a queue, the GUI reads it from its own thread (tkinter is not thread safe):
+#       monitor = HardwareMonitor({"arduino": (arduino_present, open_arduino)})
+#       monitor.start()
+#       ... every 200 ms: for name, device in monitor.poll(): ...
+
+## functions:
+
+# usb_devices           device nodes of the usb buses (a camera plugged or unplugged changes it)
+# wait_for_dev_change   block until something is created or removed in /dev, or until timeout
+# HardwareMonitor       probe each device in a thread, probe again when its presence changes
+
+
+######################
+## import modules ####
+######################
+
+import ctypes                           # inotify through libc
+import ctypes.util
+import os
+import queue                            # results of the probes, read by the GUI thread
+import select
+import threading
+from pathlib import Path
+import odroid_trace as trace            # one span per probe
+
+
+DEV_DIR = Path("/dev")
+USB_DIR = Path("/dev/bus/usb")
+
+POLL_INTERVAL = 2           # s, longest wait between two checks of the device nodes
+SETTLE_TIME = 0.5           # s, udev sets the permissions of a new node just after creating it
+
+# inotify flags (sys/inotify.h)
+IN_ATTRIB = 0x00000004
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+
+
+######################
+####  functions  #####
+######################
+
+def usb_devices(usb_dir=USB_DIR):
+    """
+    frozenset of the device nodes under /dev/bus/usb (001/005, ...)
+    """
+    return frozenset(str(path) for path in usb_dir.glob("*/*"))
+
+
+def _inotify(directories):
+    """
+    inotify file descriptor watching creations / removals in the directories, None if not available
+    """
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        fd = libc.inotify_init1(os.O_CLOEXEC)
+    except (OSError, AttributeError):
+        return None
+    if fd < 0:
+        return None
+    for directory in directories:
+        if Path(directory).is_dir():
+            libc.inotify_add_watch(fd, str(directory).encode(), IN_CREATE | IN_DELETE | IN_ATTRIB)
+    return fd
+
+
+def wait_for_dev_change(fd, timeout=POLL_INTERVAL):
+    """
+    block until inotify reports a change or until timeout (always the timeout without inotify)
+    returns True if something changed
+    """
+    if fd is None:
+        threading.Event().wait(timeout)
+        return False
+    ready, _, _ = select.select([fd], [], [], timeout)
+    if not ready:
+        return False
+    threading.Event().wait(SETTLE_TIME)
+    os.read(fd, 65536)          # drop the events of the settle time as well
+    return True
+
+
+class HardwareMonitor:
+    """
+    probes: name -> (present, open)
+        present() is cheap and says if the device node is there (a path, a set of usb nodes...)
+        open() is slow, it returns the device (or True) when it is connected, None (or False) otherwise
+    poll() returns the (name, device) found since the last call
+    """
+
+    def __init__(self, probes, directories=(DEV_DIR, USB_DIR), interval=POLL_INTERVAL):
+        self.probes = probes
+        self.directories = directories
+        self.interval = interval
+        self.events = queue.Queue()
+        self.presence = {}
+        self.stopped = threading.Event()
+        self.watcher = None
+
+    def probe(self, name):
+        """
+        open the device in a thread, the result is read with poll()
+        """
+        thread = threading.Thread(target=self._probe, args=(name,), daemon=True, name="probe-" + name)
+        thread.start()
+        return thread
+
+    def _probe(self, name):
+        with trace.span("hotplug.probe", device=name) as attrs:
+            try:
+                device = self.probes[name][1]()
+            except Exception as error:          # a device unplugged while opening, permissions...
+                print("probe " + name + ": " + str(error))
+                device = None
+            attrs["connected"] = bool(device)
+        self.events.put((name, device))
+
+    def probe_all(self):
+        """
+        what the "HW check" button does: probe every device again
+        """
+        for name, (present, _) in self.probes.items():
+            self.presence[name] = present()
+            self.probe(name)
+
+    def start(self):
+        self.probe_all()
+        self.watcher = threading.Thread(target=self.watch, daemon=True, name="hotplug")
+        self.watcher.start()
+
+    def stop(self):
+        self.stopped.set()
+
+    def watch(self):
+        """
+        probe again the devices whose presence changed, report None at once for those removed
+        """
+        fd = _inotify(self.directories)
+        try:
+            while not self.stopped.is_set():
+                wait_for_dev_change(fd, self.interval)
+                for name, (present, _) in self.probes.items():
+                    now = present()
+                    if now == self.presence.get(name):
+                        continue
+                    self.presence[name] = now
+                    if now:
+                        self.probe(name)
+                    else:
+                        self.events.put((name, None))
+        finally:
+            if fd is not None:
+                os.close(fd)
+
+    def poll(self):
+        """
+        list of (name, device) since the last call, does not block
+        """
+        found = []
+        while True:
+            try:
+                found.append(self.events.get_nowait())
+            except queue.Empty:
+                return found
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+
+## about this script
+# frames of the ZWO cameras as numpy arrays, vectorized (no loop over the pixels)
+#   the ASI294MC gives 4144x2822 frames: a colour frame (h, w, 3) or a raw bayer frame (h, w)
+#   binning 2x2 of a raw bayer frame adds one red, two green and one blue pixel: it is the luma
+#   of a "superpixel" debayer, at half the resolution
+#   prepare_frame makes the small frame given to astap_cli instead of the full png: central part of
+#   the frame (the field of view given to astap is reduced as much), binned 2x2 or 4x4 so that it is
+#   at most SOLVE_SIZE pixels wide, hot pixels removed, written as a 16 bits FITS
+#   (a 4144x2822 png is 23 MB to write and read again, the binned frame is 1.5 MB)
+
+## functions:
+
+# to_luma               one channel frame: mean of the colours, raw frames as they are
+# bin_frame             mean of factor x factor blocks, in a preallocated output if given
+# crop_center           central part of a frame (no copy)
+# neighbour_max         brightest of the 8 neighbours of each pixel
+# background_noise      median and noise of the background
+# reject_hot_pixels     pixels far brighter than all their neighbours replaced by their neighbours
+# solve_binning         binning (1, 2 or 4) that brings a frame down to SOLVE_SIZE
+# prepare_frame         cropped, binned (luma of a bayer frame) and cleaned frame for the solver
+# fits_header           primary header of a frame or of a cube of frames
+# write_fits            saves a frame as a FITS file
+
+
+######################
+## import modules ####
+######################
+
+import numpy as np                      # frames
+
+
+# largest side of the frame given to the solver
+SOLVE_SIZE = 1400
+# a pixel brighter than the brightest of its 8 neighbours by this many noise sigmas is hot
+HOT_SIGMA = 8.0
+
+FITS_BLOCK = 2880
+
+# numpy type of the frames -> BITPIX, BZERO (FITS has no unsigned 16 bits: they are stored shifted)
+FITS_TYPES = {np.dtype(np.uint8): (8, 0, ">u1"), np.dtype(np.uint16): (16, 32768, ">i2"),
+              np.dtype(np.float32): (-32, 0, ">f4")}
+
+
+######################
+####  functions  #####
+######################
+
+def to_luma(frame):
+    """
+    colour frame (h, w, 3) to the mean of its channels (float32), a 2D frame is returned as it is
+    """
+    frame = np.asarray(frame)
+    if frame.ndim == 3:
+        return frame.mean(axis=2, dtype=np.float32)
+    return frame
+
+
+def bin_frame(frame, factor, out=None):
+    """
+    mean of factor x factor blocks (float32), the last rows and columns that do not fill a block are left out
+    out: (h // factor, w // factor) float32 array reused from frame to frame
+    """
+    frame = to_luma(frame)
+    height, width = frame.shape[0] // factor, frame.shape[1] // factor
+    if out is None:
+        out = np.empty((height, width), dtype=np.float32)
+    if factor == 1:
+        np.copyto(out, frame, casting="unsafe")
+        return out
+    blocks = frame[:height * factor, :width * factor].reshape(height, factor, width, factor)
+    np.mean(blocks, axis=(1, 3), dtype=np.float32, out=out)
+    return out
+
+
+def crop_center(frame, fraction, multiple=2):
+    """
+    view of the central fraction of the frame (height and width), its corner on even pixels so that
+    a bayer frame keeps its pattern
+    """
+    if fraction >= 1:
+        return frame
+    height, width = frame.shape[:2]
+    rows = int(height * fraction) // multiple * multiple
+    columns = int(width * fraction) // multiple * multiple
+    top = (height - rows) // 2 // multiple * multiple
+    left = (width - columns) // 2 // multiple * multiple
+    return frame[top:top + rows, left:left + columns]
+
+
+def neighbour_max(image, padded=None):
+    """
+    brightest of the 8 neighbours of each pixel (float32), padded: the image padded by 1 (edge)
+    """
+    height, width = image.shape
+    if padded is None:
+        padded = np.pad(image, 1, mode="edge")
+    neighbours = np.full(image.shape, -np.inf, dtype=np.float32)
+    for dy in range(3):
+        for dx in range(3):
+            if dy != 1 or dx != 1:
+                np.maximum(neighbours, padded[dy:dy + height, dx:dx + width], out=neighbours)
+    return neighbours
+
+
+def background_noise(image, step=4):
+    """
+    median and noise (median absolute deviation as a sigma) of one pixel every step
+    """
+    sample = image[::step, ::step]
+    background = float(np.median(sample))
+    return background, 1.4826 * float(np.median(np.abs(sample - background)))
+
+
+def reject_hot_pixels(image, sigma=HOT_SIGMA):
+    """
+    in place: a pixel brighter than all its 8 neighbours by sigma times the noise is replaced by the mean
+    of its 4 nearest neighbours (a star spreads over several pixels, a hot pixel does not)
+    returns the number of pixels replaced
+    """
+    padded = np.pad(image, 1, mode="edge")
+    _, noise = background_noise(image)
+    ys, xs = np.nonzero(image > neighbour_max(image, padded) + sigma * max(noise, 1.0))
+    image[ys, xs] = (padded[ys, xs + 1] + padded[ys + 2, xs + 1] + padded[ys + 1, xs] + padded[ys + 1, xs + 2]) / 4
+    return len(ys)
+
+
+def solve_binning(shape, size=SOLVE_SIZE):
+    """
+    smallest of 1, 2, 4 that makes the largest side at most size (4 if none does)
+    """
+    for factor in (1, 2, 4):
+        if max(shape[:2]) // factor <= size:
+            return factor
+    return 4
+
+
+def prepare_frame(frame, roi=1.0, binning=None, hot_sigma=HOT_SIGMA, bayer=True):
+    """
+    frame for the solver (uint16): central roi of the frame, binned (binning None: solve_binning),
+    hot pixels removed (hot_sigma None: kept)
+    a raw frame of a colour camera (bayer) is binned at least 2x2, which gives its luma
+    """
+    frame = crop_center(np.asarray(frame), roi)
+    if binning is None:
+        binning = solve_binning(frame.shape)
+    if bayer and frame.ndim == 2:
+        binning = max(binning, 2)
+    image = bin_frame(frame, binning)
+    if hot_sigma is not None:
+        reject_hot_pixels(image, hot_sigma)
+    np.clip(image, 0, 65535, out=image)
+    return np.rint(image).astype(np.uint16)
+
+
+def _card(key, value, comment=""):
+    if isinstance(value, bool):
+        value = "T" if value else "F"
+    elif isinstance(value, str):
+        value = "'{:<8}'".format(value)
+    return "{:<8}= {:>20} / {}".format(key, value, comment)[:80].ljust(80)
+
+
+def fits_header(shape, dtype, capacity=None, creator="odroid_image.py"):
+    """
+    primary header of a frame of the given shape (numpy order), or of a cube of capacity frames,
+    padded to a FITS block
+    """
+    bitpix, bzero, _ = FITS_TYPES[np.dtype(dtype)]
+    axes = tuple(reversed(shape)) + ((capacity,) if capacity is not None else ())
+    cards = [_card("SIMPLE", True, "FITS standard"), _card("BITPIX", bitpix), _card("NAXIS", len(axes))]
+    cards += [_card("NAXIS" + str(n), size) for n, size in enumerate(axes, start=1)]
+    if bzero:
+        cards += [_card("BZERO", bzero, "unsigned 16 bits"), _card("BSCALE", 1)]
+    cards += [_card("CREATOR", creator), "END".ljust(80)]
+    header = "".join(cards)
+    return (header + " " * (-len(header) % FITS_BLOCK)).encode("ascii")
+
+
+def write_fits(path, image):
+    """
+    saves a 2D frame (uint8, uint16 or float32) as a FITS file, returns the path
+    """
+    image = np.asarray(image)
+    _, bzero, fits_type = FITS_TYPES[image.dtype]
+    if bzero:
+        data = np.bitwise_xor(image, 0x8000).astype(">u2")
+    else:
+        data = image.astype(fits_type)
+    with open(path, "wb") as file:
+        file.write(fits_header(image.shape, image.dtype))
+        file.write(data.tobytes())
+        file.write(b"\0" * (-data.nbytes % FITS_BLOCK))
+    return path
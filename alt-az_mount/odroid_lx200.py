@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+
+## about this script
+# LX200 bridge: KStars / EKOS drives the dobson as a telescope, with its own captures and solving
+#   in EKOS (or INDI) choose the "LX200 Basic" driver, connection: network, host localhost, port 4030
+#   the bridge listens on this computer only (127.0.0.1, EKOS runs on the odroid): the LX200 protocol has
+#   no authentication, anyone who reaches the port can slew the mount. --host with a network address
+#   needs --network as well
+#   the mount has no encoders: its position is the one of the last solved image (GotoController
+#   ra_img / dec_img), a slew moves by the steps of the calibration model (odroid_pointing.compare)
+#   and the position is then assumed to be the target. EKOS align takes an image, solves it and
+#   syncs (:CM#), which gives the true position, then slews again to correct
+#   INDI LX200 drivers send and read JNow coordinates: :Sr :Sd :CM are converted to J2000 (the frame
+#   of the images), :GR :GD back to JNow (odroid_epoch.py)
+#   a calibration is needed first: from the solve and goto GUI, the remote control (odroid_remote.py
+#   --lx200 4030) or a json file (--calibration, keys of odroid_pointing.Calibration)
+#
+# LX200 commands (":xx#"), see Meade "Telescope Serial Command Protocol":
+#   :GR# :GD#               position           :Sr HH:MM:SS# :Sd sDD*MM:SS#   target
+#   :MS#                    slew to target     :CM#                           sync on target
+#   :Mn# :Ms# :Me# :Mw#     one preset move    :RG# :RC# :RM# :RS#            size of the preset move
+#   :Q#                     stop (no effect, the arduino stops on its own at the end of a move)
+#   :D#                     slewing or not     :U#                            long / short format
+#
+# usage: python3 odroid_lx200.py --calibration calibration.json [--port 4030] [--host 0.0.0.0 --network]
+
+## functions:
+
+# format_ra             degrees to HH:MM:SS (or HH:MM.T)
+# format_dec            degrees to sDD*MM'SS (or sDD*MM)
+# parse_ra              HH:MM:SS or HH:MM.T to degrees
+# parse_dec             sDD*MM:SS, sDD*MM or sDD:MM:SS to degrees
+# Lx200Bridge           answers the LX200 commands with the GotoController (mount and calibration)
+# serve_lx200           asyncio server of the bridge
+# is_loopback           the host is this computer only
+# main                  open the arduino, load the calibration and serve
+
+
+######################
+## import modules ####
+######################
+
+import argparse                         # command line
+import asyncio                          # server
+import datetime                         # date and time asked by EKOS
+import ipaddress                        # loopback host
+import json                             # calibration file
+import re                               # parse coordinates
+from concurrent.futures import ThreadPoolExecutor   # slews block, the bridge keeps answering meanwhile
+import odroid_pointing as pointing      # calibration model and moves
+from odroid_pointing import Calibration
+from odroid_catalog import make_target
+from odroid_epoch import J2000, JNOW, convert, target_in
+from odroid_arduino import MountLink, open_arduino
+from odroid_goto import GotoController
+import odroid_trace as trace            # one span per slew
+
+
+HOST = "127.0.0.1"
+PORT = 4030
+
+# frame of the coordinates exchanged with the client
+FRAME = JNOW
+
+ACK = b"\x06"
+
+# preset moves of the arduino Mega for :Mn# :Ms# :Me# :Mw#, for each rate (:RG# guide ... :RS# slew)
+# n/s on the altitude axis, e/w on the azimut axis
+MOVES = {"G": {"n": "I", "s": "H", "e": "S", "w": "X"},
+         "C": {"n": "D", "s": "E", "e": "Z", "w": "A"},
+         "M": {"n": "D", "s": "E", "e": "Z", "w": "A"},
+         "S": {"n": "U", "s": "J", "e": "V", "w": "C"}}
+
+
+######################
+####  functions  #####
+######################
+
+def format_ra(ra, long_format=True):
+    """
+    ra in degrees to "HH:MM:SS" (long) or "HH:MM.T" (short)
+    """
+    if long_format:
+        seconds = round(ra % 360 / 15 * 3600) % 86400
+        return "{:02d}:{:02d}:{:02d}".format(seconds // 3600, seconds // 60 % 60, seconds % 60)
+    tenths = round(ra % 360 / 15 * 600) % 14400
+    return "{:02d}:{:02d}.{:d}".format(tenths // 600, tenths // 10 % 60, tenths % 10)
+
+
+def format_dec(dec, long_format=True):
+    """
+    dec in degrees to "sDD*MM'SS" (long) or "sDD*MM" (short)
+    """
+    sign = "-" if dec < 0 else "+"
+    if long_format:
+        seconds = round(abs(dec) * 3600)
+        return "{}{:02d}*{:02d}'{:02d}".format(sign, seconds // 3600, seconds // 60 % 60, seconds % 60)
+    minutes = round(abs(dec) * 60)
+    return "{}{:02d}*{:02d}".format(sign, minutes // 60, minutes % 60)
+
+
+def parse_ra(text):
+    """
+    "HH:MM:SS" or "HH:MM.T" to degrees, ValueError if it is not a time
+    """
+    match = re.fullmatch(r"\s*(\d{1,2}):(\d{1,2})(?:[:](\d{1,2}(?:\.\d*)?)|\.(\d))?\s*", text)
+    if match is None:
+        raise ValueError("bad ra " + repr(text))
+    hours, minutes, seconds, tenths = match.groups()
+    hours = int(hours) + int(minutes) / 60 + float(seconds or 0) / 3600 + int(tenths or 0) / 600
+    return hours * 15
+
+
+def parse_dec(text):
+    """
+    "sDD*MM:SS", "sDD*MM'SS", "sDD*MM" or "sDD:MM:SS" (* may be the degree sign) to degrees
+    """
+    match = re.fullmatch(r"\s*([+-]?)(\d{1,2})[*:\xdf\xb0](\d{1,2})(?:[:'](\d{1,2}(?:\.\d*)?))?\s*", text)
+    if match is None:
+        raise ValueError("bad dec " + repr(text))
+    sign, degrees, minutes, seconds = match.groups()
+    dec = int(degrees) + int(minutes) / 60 + float(seconds or 0) / 3600
+    return -dec if sign == "-" else dec
+
+
+class Lx200Bridge:
+    """
+    goto: GotoController, its mount and calibration are used, its position is updated by slews and syncs
+    submit(function, *args) runs the serial commands out of the thread that answers (a slew takes minutes)
+    command(text) returns the answer to send back, or None
+    frame: frame of the coordinates of the client, the target and position of goto stay J2000
+    """
+
+    def __init__(self, goto, submit=None, frame=FRAME):
+        self.goto = goto
+        self.frame = frame
+        if submit is None:
+            submit = ThreadPoolExecutor(max_workers=1, thread_name_prefix="lx200").submit
+        self.submit = submit
+        self.long_format = True
+        self.rate = "C"
+        self.target_ra = None
+        self.target_dec = None
+        self.slewing = False
+        self.error = None               # last slew error, printed
+
+    def position(self):
+        """
+        ra, dec of the telescope in degrees in the frame of the client (0, 0 until the first image or sync)
+        """
+        if self.goto.ra_img is None:
+            return 0.0, 0.0
+        ra, dec = convert(self.goto.ra_img, self.goto.dec_img, J2000, self.frame)
+        return float(ra), float(dec)
+
+    def command(self, text):
+        if text == ACK.decode():
+            return "A"                  # alt-az
+        cmd = text.strip(":#")
+        code, argument = cmd[:2], cmd[2:]
+
+        if cmd == "GR":
+            return format_ra(self.position()[0], self.long_format) + "#"
+        if cmd == "GD":
+            return format_dec(self.position()[1], self.long_format) + "#"
+        if cmd == "Gr":
+            return format_ra(self.target_ra or 0, self.long_format) + "#"
+        if cmd == "Gd":
+            return format_dec(self.target_dec or 0, self.long_format) + "#"
+        if code == "Sr":
+            return self.set_target(parse_ra, "target_ra", argument)
+        if code == "Sd":
+            return self.set_target(parse_dec, "target_dec", argument)
+        if cmd == "MS":
+            return self.slew()
+        if cmd == "CM":
+            return self.sync()
+        if cmd == "D":
+            return "\x7f#" if self.slewing else "#"
+        if cmd == "U":
+            self.long_format = not self.long_format
+            return None
+        if cmd in ("RG", "RC", "RM", "RS"):
+            self.rate = cmd[1]
+            return None
+        if code in ("Mn", "Ms", "Me", "Mw"):
+            if self.goto.mount is not None and not self.slewing:
+                self.submit(self.goto.mount.move, MOVES[self.rate][code[1]])
+            return None
+        if cmd.startswith("Q"):
+            return None
+
+        # site, date and time: EKOS sets them, the dobson does not need them
+        if code in ("St", "Sg", "SG", "SL", "SC", "Sw", "SS"):
+            return "1"
+        if cmd == "GVP":
+            return "Dobson#"
+        if cmd == "GVN":
+            return "1.0#"
+        if cmd == "GC":
+            return datetime.datetime.now().strftime("%m/%d/%y") + "#"
+        if cmd == "GL":
+            return datetime.datetime.now().strftime("%H:%M:%S") + "#"
+        if cmd == "GG":
+            offset = datetime.datetime.now().astimezone().utcoffset().total_seconds() / 3600
+            return "{:+03.0f}#".format(0.0 - offset)    # LX200 gives the hours to add to local time to get UTC
+        if cmd in ("Gt", "Gg"):
+            return "+00*00#"
+        print("lx200: unknown command " + repr(text))
+        return None
+
+    def set_target(self, parse, field, argument):
+        try:
+            setattr(self, field, parse(argument))
+        except ValueError:
+            return "0"
+        return "1"
+
+    def slew(self):
+        """
+        "0" if the slew starts, "1<reason>#" otherwise
+        """
+        if self.target_ra is None or self.target_dec is None:
+            return "1no target#"
+        if self.goto.mount is None:
+            return "1arduino not connected#"
+        if self.goto.calibration is None:
+            return "1not calibrated#"
+        if self.goto.ra_img is None:
+            return "1position unknown, sync first#"
+        if self.slewing:
+            return "1already slewing#"
+        self.goto.target = target_in(make_target(self.target_ra, self.target_dec, self.frame), J2000)
+        self.slewing = True
+        self.submit(self.run_slew)
+        return "0"
+
+    def run_slew(self):
+        """
+        steps of the calibration model, then the telescope is assumed to be on the target
+        """
+        try:
+            with trace.span("lx200.slew", ra=self.goto.target.ra, dec=self.goto.target.dec):
+                result = self.goto.compare()
+                pointing.move_axes(self.goto.mount, result["stepper_az"], result["stepper_vc"])
+            self.goto.ra_img = self.goto.target.ra
+            self.goto.dec_img = self.goto.target.dec
+            self.error = None
+        except Exception as error:      # serial line lost: EKOS sees the position did not change
+            self.error = str(error)
+            print("lx200: slew failed: " + self.error)
+        finally:
+            self.slewing = False
+
+    def sync(self):
+        """
+        the telescope is on the target given by :Sr :Sd (EKOS solved its own image)
+        """
+        if self.target_ra is None or self.target_dec is None:
+            return "no target#"
+        ra, dec = convert(self.target_ra, self.target_dec, self.frame, J2000)
+        self.goto.ra_img = float(ra)
+        self.goto.dec_img = float(dec)
+        return "Coordinates matched#"
+
+
+async def serve_lx200(bridge, host=HOST, port=PORT):
+    """
+    one or more clients, commands may come several in one packet or split across packets
+    """
+    async def handle(reader, writer):
+        buffer = b""
+        try:
+            while True:
+                data = await reader.read(256)
+                if not data:
+                    break
+                buffer += data
+                while buffer:
+                    if buffer[:1] == ACK:
+                        text, buffer = ACK.decode(), buffer[1:]
+                    elif b"#" in buffer:
+                        text, _, buffer = buffer.partition(b"#")
+                        text = text.decode("latin-1")
+                    else:
+                        break
+                    if not text.strip(":"):
+                        continue
+                    answer = bridge.command(text)
+                    if answer is not None:
+                        writer.write(answer.encode("latin-1"))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, host, port)
+    print("lx200 on {}:{}".format(host, port))
+    async with server:
+        await server.serve_forever()
+
+
+def is_loopback(host):
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return host == "localhost"
+
+
+def load_calibration(path):
+    """
+    json object with the fields of Calibration (step_az, step_vc, angle_av, ra_img, dec_img, optional matrix and residual)
+    """
+    with open(path) as file:
+        return Calibration(**json.load(file))
+
+
+######################
+######  main  ########
+######################
+
+def main():
+    parser = argparse.ArgumentParser(description="LX200 bridge for KStars / EKOS")
+    parser.add_argument("--host", default=HOST, help="a network address needs --network")
+    parser.add_argument("--network", action="store_true",
+                        help="serve a network address: anyone who reaches the port can slew the mount")
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--calibration", required=True, help="json file with the fields of odroid_pointing.Calibration")
+    parser.add_argument("--j2000", action="store_true", help="the client sends J2000 instead of JNow")
+    args = parser.parse_args()
+    if not is_loopback(args.host) and not args.network:
+        raise SystemExit("--host {}: the LX200 protocol has no authentication, add --network to serve it anyway".format(args.host))
+
+    trace.start_from_environment()
+    ser = open_arduino(timeout=None)
+    if ser is None:
+        print("arduino not connected, slews will be refused")
+    goto = GotoController(MountLink(ser) if ser is not None else None, None, None, None)
+    goto.calibration = load_calibration(args.calibration)
+    # position at the end of the calibration until EKOS syncs
+    goto.ra_img = goto.calibration.ra_img
+    goto.dec_img = goto.calibration.dec_img
+    asyncio.run(serve_lx200(Lx200Bridge(goto, frame=J2000 if args.j2000 else JNOW), args.host, args.port))
+
+
+if __name__ == "__main__":
+    main()
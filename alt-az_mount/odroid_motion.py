@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+
+## about this script
+# motion profiles of the slews, planned on the odroid instead of the presets of the arduino
+#   the custom moves (O P K L) move one axis after the other with the speed and acceleration of
+#   arduino custom(): steps / 2.6 and steps / 2, at most 1538 steps/s and 2000 steps/s², whatever the
+#   load of the axis: a short move crawls, a long one may be too fast for the azimut ("except when
+#   azimut struggles to move", v11 notes of odroid_solve_and_goto_gui.py)
+#   here each axis has its own limits (speed, acceleration) in motion_limits.json, measured on the
+#   telescope (measure_limits: round trips at growing limits, each one checked by a solved image, the
+#   last one that came back where it started, less a margin)
+#   a slew moves both axes at once along a straight line of the motor steps: one trapezoid (accelerate,
+#   cruise, decelerate) in the fraction of the path, scaled on each axis by its number of steps, with the
+#   largest speed and acceleration that keep both axes within their limits: both arrive together and
+#   the axis that has further to go runs at its limit (time optimal for a straight line)
+#   the arduino gets the compact profile in one line (m command: steps, speed, acceleration of each
+#   axis) and runs it with AccelStepper, which only ramps at a constant acceleration: trapezoids, no
+#   S-curves
+#
+# usage: python3 odroid_motion.py --plan 12000 -3000          profile and duration of a slew
+#        python3 odroid_motion.py --defaults                  limits of arduino fast() in motion_limits.json
+#        python3 odroid_motion.py --measure az --target Messier 42    measure the limits of an axis
+#   without motion_limits.json the gotos keep the custom moves (arduino without the m command)
+
+## functions:
+
+# AxisLimits            speed (steps/s) and acceleration (steps/s²) of an axis
+# Profile               signed steps, speed and acceleration of both axes and duration of a slew
+# trapezoid_time        duration of a move of a distance with a speed and an acceleration
+# custom_move_time      duration of a custom move (speed and acceleration of arduino custom())
+# plan_slew             synchronized trapezoidal profile of both axes
+# load_limits           limits of motion_limits.json, None if there is no file
+# save_limits           writes the limits to motion_limits.json
+# separation            angle between two positions (degrees)
+# measure_limits        largest limits of an axis that come back to the same place, less a margin
+# main                  plan, write the default limits, measure
+
+
+######################
+## import modules ####
+######################
+
+import argparse                         # command line
+import datetime                         # date of the measure
+import json                             # limits file
+from collections import namedtuple      # limits and profiles
+from math import cos, hypot, radians, sqrt
+from pathlib import Path                # limits file
+
+
+MOTION_LIMITS = Path("/home/dlg/Documents/python") / "motion_limits.json"
+
+AXES = ("az", "alt")
+
+AxisLimits = namedtuple("AxisLimits", ["speed", "acceleration"])
+
+# arduino fast(), the presets of the buttons that move both axes without losing steps (1/8 step)
+DEFAULT_LIMITS = {"az": AxisLimits(1200.0, 1500.0), "alt": AxisLimits(1200.0, 1500.0)}
+
+# steps/s AccelStepper can give on one axis while the Mega runs both
+MAX_STEP_RATE = 4000
+
+# measure: steps of each round trip, limits tried (times the default ones), error allowed on top of the
+# error of a round trip at the default limits (backlash), part of the last good limits that is kept
+MEASURE_STEPS = 6400
+MEASURE_SCALES = (1.25, 1.5, 1.75, 2.0, 2.5, 3.0)
+MEASURE_TOLERANCE = 0.003               # degrees: about 30 steps (a step is about 0.0001°), well above astap
+MEASURE_MARGIN = 0.8
+SETTLE_TIME = 2                         # s before the image of a round trip
+
+
+######################
+####  functions  #####
+######################
+
+class Profile(namedtuple("Profile", ["az_steps", "alt_steps", "az_speed", "alt_speed", "az_acceleration",
+                                     "alt_acceleration", "duration"])):
+    """
+    signed motor steps, speeds (steps/s) and accelerations (steps/s²) sent to the arduino, duration in s
+    """
+
+    def command(self):
+        """
+        the arguments of MountLink.slew, in whole numbers
+        """
+        return (int(self.az_steps), int(self.alt_steps),
+                *(max(1, int(round(value))) for value in (self.az_speed, self.alt_speed,
+                                                          self.az_acceleration, self.alt_acceleration)))
+
+
+def trapezoid_time(distance, speed, acceleration):
+    """
+    accelerate, cruise at speed, decelerate; a triangle if the distance is too short to reach the speed
+    """
+    distance = abs(distance)
+    if distance == 0:
+        return 0.0
+    if speed * speed / acceleration >= distance:
+        return 2 * sqrt(distance / acceleration)
+    return distance / speed + speed / acceleration
+
+
+def custom_move_time(steps):
+    """
+    trapezoidal move with the speed and acceleration set by arduino custom()
+    """
+    steps = abs(steps)
+    if steps == 0:
+        return 0.0
+    maxi = min(steps, 4000)
+    speed = int(maxi / 2.6)
+    acceleration = int(maxi / 2)
+    if speed == 0 or acceleration == 0:
+        return 0.0
+    return trapezoid_time(steps, speed, acceleration)
+
+
+def plan_slew(az_steps, alt_steps, limits=DEFAULT_LIMITS):
+    """
+    profile of a slew of signed motor steps on both axes: the path goes from 0 to 1 with one speed and
+    one acceleration, each axis moves its steps times the path, so they start and stop together
+    """
+    steps = {"az": abs(az_steps), "alt": abs(alt_steps)}
+    moving = [axis for axis in AXES if steps[axis]]
+    if not moving:
+        return Profile(0, 0, 1, 1, 1, 1, 0.0)
+    # fraction of the path per second (and per second²) that keeps every axis within its limits
+    speed = min(min(limits[axis].speed, MAX_STEP_RATE) / steps[axis] for axis in moving)
+    acceleration = min(limits[axis].acceleration / steps[axis] for axis in moving)
+    return Profile(az_steps, alt_steps, steps["az"] * speed, steps["alt"] * speed,
+                   steps["az"] * acceleration, steps["alt"] * acceleration, trapezoid_time(1.0, speed, acceleration))
+
+
+def load_limits(path=MOTION_LIMITS):
+    """
+    {"az": AxisLimits, "alt": AxisLimits}, an axis missing from the file has the default limits
+    None if there is no file
+    """
+    if not Path(path).is_file():
+        return None
+    with open(path) as file:
+        data = json.load(file)
+    return {axis: AxisLimits(**data[axis]) if axis in data else DEFAULT_LIMITS[axis] for axis in AXES}
+
+
+def save_limits(limits, path=MOTION_LIMITS, **info):
+    """
+    info (date, measure) is written with the limits
+    """
+    data = {axis: limits[axis]._asdict() for axis in AXES}
+    data.update(info)
+    with open(path, "w") as file:
+        json.dump(data, file, indent=2)
+
+
+def separation(position, other):
+    """
+    angle in degrees between two (ra, dec) in degrees, small angles
+    """
+    d_ra = (position[0] - other[0] + 180) % 360 - 180
+    return hypot(d_ra * cos(radians(position[1])), position[1] - other[1])
+
+
+def measure_limits(mount, locate, axis, limits=DEFAULT_LIMITS, steps=MEASURE_STEPS, scales=MEASURE_SCALES,
+                   tolerance=MEASURE_TOLERANCE, margin=MEASURE_MARGIN, report=print):
+    """
+    round trips of steps on the axis (mount.slew there and back) at the limits times each scale;
+    locate() returns (ra, dec) of a solved image. A round trip that does not come back within tolerance
+    of the error of a round trip at the given limits has lost steps: the limits of the previous one,
+    times margin, are returned (the given limits if the first scale already loses steps)
+    """
+    def round_trip(axis_limits):
+        trial = dict(limits, **{axis: axis_limits})
+        there = plan_slew(steps if axis == "az" else 0, steps if axis == "alt" else 0, trial)
+        back = plan_slew(-there.az_steps, -there.alt_steps, trial)
+        start = locate()
+        mount.slew(*there.command())
+        mount.slew(*back.command())
+        mount.settle(SETTLE_TIME)
+        return separation(start, locate())
+
+    baseline = round_trip(limits[axis])
+    report("{}: round trip at {} -> {:.4f}°".format(axis, tuple(limits[axis]), baseline))
+    good = None
+    for scale in scales:
+        trial = AxisLimits(min(limits[axis].speed * scale, MAX_STEP_RATE), limits[axis].acceleration * scale)
+        error = round_trip(trial)
+        report("{}: round trip at {} -> {:.4f}°".format(axis, tuple(trial), error))
+        if error > baseline + tolerance:
+            break
+        good = trial
+    if good is None:
+        return limits[axis]
+    return AxisLimits(good.speed * margin, good.acceleration * margin)
+
+
+######################
+######  main  ########
+######################
+
+def main():
+    parser = argparse.ArgumentParser(description="motion profiles of the slews")
+    parser.add_argument("--plan", nargs=2, type=int, metavar=("AZ", "ALT"),
+                        help="profile of a slew of these motor steps, compared with the custom moves")
+    parser.add_argument("--defaults", action="store_true", help="write the default limits (arduino fast())")
+    parser.add_argument("--measure", choices=AXES, help="measure the limits of an axis (telescope on a target)")
+    parser.add_argument("--target", nargs=2, default=["Messier", "42"], metavar=("CATALOG", "REF"),
+                        help="target the telescope points at, hint of the solver")
+    parser.add_argument("--steps", type=int, default=MEASURE_STEPS, help="steps of each round trip")
+    parser.add_argument("--file", default=MOTION_LIMITS, help="limits file")
+    args = parser.parse_args()
+
+    limits = load_limits(args.file) or DEFAULT_LIMITS
+    if args.defaults:
+        save_limits(DEFAULT_LIMITS, args.file, source="arduino fast()")
+        print("default limits written to {}".format(args.file))
+    if args.plan:
+        profile = plan_slew(args.plan[0], args.plan[1], limits)
+        print("profile: {} -> {:.2f} s".format(profile.command(), profile.duration))
+        print("custom moves, one axis after the other: {:.2f} s".format(
+            custom_move_time(args.plan[0]) + custom_move_time(args.plan[1])))
+    if args.measure:
+        # the hardware is only needed to measure
+        from odroid_arduino import MountLink, open_arduino
+        from odroid_catalog import find_object
+        from odroid_pointing import take_and_solve
+        from odroid_solver import AstapSolver, ZwoCamera
+        ser = open_arduino(timeout=None)
+        if ser is None:
+            raise SystemExit("arduino not connected")
+        target = find_object(*args.target)
+        if target is None:
+            raise SystemExit("target not found: {} {}".format(*args.target))
+        camera, solver = ZwoCamera(), AstapSolver()
+        camera.listeners.append(solver.listener)
+        camera.start_listeners.append(solver.forget)
+        measured = measure_limits(MountLink(ser), lambda: take_and_solve(camera, solver, target), args.measure,
+                                  limits, args.steps)
+        limits = dict(limits, **{args.measure: measured})
+        save_limits(limits, args.file, measured=datetime.datetime.now().isoformat(timespec="seconds"))
+        print("{} limits: {:.0f} steps/s, {:.0f} steps/s² written to {}".format(args.measure, *measured, args.file))
+
+
+if __name__ == "__main__":
+    main()
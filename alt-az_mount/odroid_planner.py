@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+
+## about this script
+# observing plan for the night: a list of targets instead of one target per calibrate / goto
+#   the altitude of every candidate is computed at once on a time grid (numpy, targets x times,
+#   see odroid_ephemeris.py), from the catalog precessed to the date (J2000 -> JNow, odroid_epoch.py), which gives for each target the window above the minimum altitude and
+#   away from the moon, and the transit time. by default the night is the dark part of the next night
+#   the targets are then ordered greedily: the next one is the one that costs the least slew and
+#   waiting time from the current one, then the order is improved by swapping segments (2-opt)
+#   while every target still fits in its window
+#   run_plan goes through the plan: goto, verify that the solved image is on the target (goto again
+#   if not), then hands the telescope over to the capture (EKOS, or the frames taken here)
+#
+# usage:
+#   python3 odroid_planner.py --targets tonight.txt             (lines like "Messier 42" or "NGC 7000")
+#   python3 odroid_planner.py --brighter 9 --min-alt 35         (every catalog object brighter than mag 9)
+#   python3 odroid_planner.py --targets tonight.txt --run       (calibrates on the first target, then goes)
+
+## functions:
+
+# visibility            window above the minimum altitude (and away from the moon), transit time of each target
+# PlanEntry             one target of the plan: name, target, start, end, slew, wait
+# plan_night            greedy order of the visible targets, then 2-opt
+# run_plan              goto, verify, capture for each entry of the plan
+
+
+######################
+## import modules ####
+######################
+
+import argparse                         # command line
+import datetime                         # start of the night
+from collections import namedtuple
+from time import sleep, time
+import numpy as np                      # targets x times arrays
+from odroid_catalog import CATALOG_FILE, CATALOG_NAMES, Catalog, make_target
+from odroid_epoch import j2000_to_jnow
+from odroid_ephemeris import LATITUDE, LONGITUDE, MIN_MOON_SEPARATION, alt_az, dark_window, moon_separation, separation
+from odroid_pointing import PointingError, nothing
+import odroid_trace as trace            # spans of the plan and of each target
+
+
+MIN_ALTITUDE = 30           # degrees, below it the tube and the table are in the way / too much air
+TIME_STEP = 300             # s between two points of the altitude grid
+NIGHT_HOURS = 8
+
+TARGET_MINUTES = 20         # time spent capturing each target
+SLEW_SECONDS_PER_DEGREE = 6 # custom moves of the arduino, both axes one after the other
+VERIFY_SECONDS = 60         # capture and solve after a goto
+
+GOTO_TOLERANCE = 0.1        # degrees, on ra and dec, for the target to be verified
+GOTO_ITERATIONS = 3
+
+
+######################
+####  functions  #####
+######################
+
+def visibility(ra, dec, start, hours=NIGHT_HOURS, min_altitude=MIN_ALTITUDE,
+               latitude=LATITUDE, longitude=LONGITUDE, step=TIME_STEP, min_moon=MIN_MOON_SEPARATION):
+    """
+    for each target: first and last timestamp above min_altitude and min_moon away from the moon
+    (nan if never), transit (highest point)
+    returns rise, set, transit, max altitude (arrays)
+    """
+    times = start + np.arange(0, hours * 3600 + step, step)
+    alt, _ = alt_az(ra, dec, times, latitude, longitude)
+    above = alt >= min_altitude
+    if min_moon:
+        distance, moon_alt = moon_separation(ra, dec, times, latitude, longitude)
+        above &= (distance >= min_moon) | (moon_alt[None, :] < 0)
+    seen = above.any(axis=1)
+    first = np.argmax(above, axis=1)
+    last = above.shape[1] - 1 - np.argmax(above[:, ::-1], axis=1)
+    rise = np.where(seen, times[first], np.nan)
+    set_ = np.where(seen, times[last], np.nan)
+    highest = np.argmax(alt, axis=1)
+    return rise, set_, times[highest], alt[np.arange(len(alt)), highest]
+
+
+class PlanEntry(namedtuple("PlanEntry", ["name", "target", "start", "end", "slew", "wait"])):
+    """
+    start, end: timestamps of the capture, slew: degrees from the previous target, wait: s before start
+    """
+    __slots__ = ()
+
+
+def _schedule(order, rise, set_, distance, start, duration):
+    """
+    start time of each target in this order, None if one of them does not fit in its window
+    distance[i][j]: slew in degrees from i to j, row -1 is the position at start
+    returns the starts, the slews and the waits
+    """
+    now, previous = start, -1
+    starts, slews, waits = [], [], []
+    for i in order:
+        slew = distance[previous][i]
+        ready = now + slew * SLEW_SECONDS_PER_DEGREE + VERIFY_SECONDS
+        begin = max(ready, rise[i])
+        if begin + duration > set_[i]:
+            return None
+        starts.append(begin)
+        slews.append(slew)
+        waits.append(begin - ready)
+        now, previous = begin + duration, i
+    return starts, slews, waits
+
+
+def _cost(order, rise, set_, distance, start, duration):
+    schedule = _schedule(order, rise, set_, distance, start, duration)
+    if schedule is None:
+        return None
+    starts, slews, _ = schedule
+    # end of the last capture: waits and slews make it later, plus the slews themselves (wear, vibrations)
+    return starts[-1] + duration + sum(slews) * SLEW_SECONDS_PER_DEGREE
+
+
+def _distances(ra, dec, position):
+    """
+    slews between the targets of the plan, last row: from the position at start (0 if unknown)
+    """
+    distance = np.zeros((len(ra) + 1, len(ra)))
+    for i in range(len(ra)):
+        distance[i] = separation(ra[i], dec[i], ra, dec)
+    if position is not None:
+        distance[-1] = separation(position[0], position[1], ra, dec)
+    return distance.tolist()
+
+
+def plan_night(names, ra, dec, start, hours=NIGHT_HOURS, minutes=TARGET_MINUTES, min_altitude=MIN_ALTITUDE,
+               latitude=LATITUDE, longitude=LONGITUDE, position=None, improve=True, min_moon=MIN_MOON_SEPARATION,
+               apparent=None):
+    """
+    names, ra, dec: candidates (arrays, J2000), start: timestamp of the beginning of the night
+    apparent: ra, dec of the candidates of date (Catalog.apparent), precessed here if not given
+    position: ra, dec where the telescope points at start (None: the first slew is free)
+    greedy: the next target is the one that can start the soonest (slew + wait) among those that still fit
+    returns the list of PlanEntry, the candidates that do not fit are left out
+    """
+    ra = np.asarray(ra, dtype=float)
+    dec = np.asarray(dec, dtype=float)
+    duration = minutes * 60
+    end_of_night = start + hours * 3600
+    if apparent is None:
+        apparent = j2000_to_jnow(ra, dec, start)
+    with trace.span("planner.plan", candidates=len(ra)) as attrs:
+        rise, set_, _, _ = visibility(apparent[0], apparent[1], start, hours, min_altitude, latitude, longitude,
+                                      min_moon=min_moon)
+        set_ = np.fmin(set_, end_of_night)
+        remaining = np.isfinite(rise) & (set_ - rise >= duration)
+
+        order = []
+        now, current = start, position
+        while remaining.any():
+            slew = np.zeros(len(ra)) if current is None else separation(current[0], current[1], ra, dec)
+            ready = now + slew * SLEW_SECONDS_PER_DEGREE + VERIFY_SECONDS
+            begin = np.fmax(ready, rise)
+            fits = remaining & (begin + duration <= set_)
+            if not fits.any():
+                break
+            # soonest start, then the one that sets first (it will not wait for us)
+            cost = np.where(fits, begin - now + slew * SLEW_SECONDS_PER_DEGREE, np.inf)
+            best = np.flatnonzero(cost == cost.min())
+            i = int(best[np.argmin(set_[best])])
+            order.append(i)
+            remaining[i] = False
+            now, current = begin[i] + duration, (ra[i], dec[i])
+
+        # from here only the planned targets, as plain lists
+        ra, dec, rise, set_ = ra[order], dec[order], rise[order].tolist(), set_[order].tolist()
+        names = [names[i] for i in order]
+        distance = _distances(ra, dec, position)
+        order = list(range(len(order)))
+        if improve and len(order) > 3:
+            order = _two_opt(order, rise, set_, distance, start, duration)
+        attrs["planned"] = len(order)
+
+    starts, slews, waits = _schedule(order, rise, set_, distance, start, duration)
+    return [PlanEntry(names[i], make_target(float(ra[i]), float(dec[i])), begin, begin + duration, slew, wait)
+            for i, begin, slew, wait in zip(order, starts, slews, waits)]
+
+
+def _two_opt(order, rise, set_, distance, start, duration):
+    """
+    reverse segments of the order as long as it ends earlier and every target still fits
+    """
+    best = _cost(order, rise, set_, distance, start, duration)
+    improved = True
+    while improved:
+        improved = False
+        for i in range(len(order) - 2):
+            for j in range(i + 2, len(order) + 1):
+                candidate = order[:i] + order[i:j][::-1] + order[j:]
+                cost = _cost(candidate, rise, set_, distance, start, duration)
+                if cost is not None and cost < best - 1:
+                    order, best, improved = candidate, cost, True
+    return order
+
+
+def verify(result, tolerance=GOTO_TOLERANCE):
+    return abs(result["diff_ra"]) <= tolerance and abs(result["diff_dec"]) <= tolerance
+
+
+def wait_for_end(entry):
+    """
+    default capture: the equatorial table tracks while EKOS (or the user) captures, until the end of the slot
+    """
+    sleep(max(0, entry.end - time()))
+
+
+def run_plan(plan, goto, capture=wait_for_end, report=nothing, wait=True,
+             tolerance=GOTO_TOLERANCE, iterations=GOTO_ITERATIONS):
+    """
+    goto: calibrated GotoController, with the position of the last image
+    for each entry: goto (again until the image is within tolerance of the target), then capture(entry)
+    a target that cannot be solved or verified is skipped
+    returns a list of (entry, status), status: "captured", "not verified" or the error
+    """
+    done = []
+    for entry in plan:
+        with trace.span("planner.target", target=entry.name) as attrs:
+            if wait and entry.start - VERIFY_SECONDS > time():
+                report(entry.name + ": waiting until " + datetime.datetime.fromtimestamp(entry.start).strftime("%X"))
+                sleep(entry.start - VERIFY_SECONDS - time())
+            report(entry.name + ": goto")
+            goto.target = entry.target
+            try:
+                result = goto.compare()
+                for _ in range(iterations):
+                    result = goto.go_to(report)
+                    if verify(result, tolerance):
+                        break
+            except PointingError as error:
+                status = str(error)
+            else:
+                if verify(result, tolerance):
+                    report(entry.name + ": on target, capturing")
+                    capture(entry)
+                    status = "captured"
+                else:
+                    status = "not verified"
+            attrs["status"] = status
+        report(entry.name + ": " + status)
+        done.append((entry, status))
+    return done
+
+
+def read_targets(path, table):
+    """
+    lines "Messier 42", "NGC 7000" (# for comments), returns the rows of the table
+    a line that is not a catalog and a reference is reported and skipped
+    """
+    rows = []
+    with open(path) as file:
+        for line in file:
+            line = line.split("#")[0].strip()
+            if not line:
+                continue
+            words = line.split()
+            if len(words) != 2:
+                print("expected 'catalog reference': " + line)
+                continue
+            cat, ref = words
+            row = table.row(cat, ref)
+            if row is None:
+                print("not in the catalog: " + line)
+            else:
+                rows.append(row)
+    return rows
+
+
+def print_plan(plan):
+    print("{:<10} {:>8} {:>8} {:>8} {:>8} {:>7}".format("target", "ra", "dec", "start", "slew", "wait"))
+    for entry in plan:
+        print("{:<10} {:>8.2f} {:>8.2f} {:>8} {:>7.1f}° {:>6.0f}s".format(
+            entry.name, entry.target.ra, entry.target.dec,
+            datetime.datetime.fromtimestamp(entry.start).strftime("%H:%M"), entry.slew, entry.wait))
+
+
+######################
+######  main  ########
+######################
+
+def main():
+    parser = argparse.ArgumentParser(description="observing plan: order the targets of the night and go through them")
+    parser.add_argument("--targets", help="file with one target per line, like 'Messier 42' (" + ", ".join(CATALOG_NAMES) + ")")
+    parser.add_argument("--brighter", type=float, help="every catalog object brighter than this magnitude")
+    parser.add_argument("--catalog-file", default=CATALOG_FILE)
+    parser.add_argument("--start", help="'YYYY-MM-DD HH:MM' local time, end of the astronomical twilight by default")
+    parser.add_argument("--hours", type=float, help="length of the night, until the dawn by default")
+    parser.add_argument("--minutes", type=float, default=TARGET_MINUTES, help="capture time per target")
+    parser.add_argument("--min-alt", type=float, default=MIN_ALTITUDE)
+    parser.add_argument("--min-moon", type=float, default=MIN_MOON_SEPARATION, help="degrees from the moon when it is up")
+    parser.add_argument("--lat", type=float, default=LATITUDE)
+    parser.add_argument("--lon", type=float, default=LONGITUDE, help="east positive")
+    parser.add_argument("--run", action="store_true", help="calibrate on the first target, then goto and capture each one")
+    args = parser.parse_args()
+
+    trace.start_from_environment()
+    catalog = Catalog(args.catalog_file)
+    table = catalog.table()
+    if args.targets:
+        rows = read_targets(args.targets, table)
+    elif args.brighter is not None:
+        rows = np.flatnonzero(table.magnitude <= args.brighter)
+    else:
+        parser.error("give --targets or --brighter")
+    if args.start:
+        start = datetime.datetime.strptime(args.start, "%Y-%m-%d %H:%M").timestamp()
+        hours = args.hours or NIGHT_HOURS
+    else:
+        night = dark_window(time(), args.lat, args.lon)
+        if night is None:
+            parser.error("no astronomical night in the next 24 h, give --start and --hours")
+        start, hours = night[0], args.hours or (night[1] - night[0]) / 3600
+
+    names = [table.names[row] for row in rows]
+    apparent_ra, apparent_dec = catalog.apparent(start)
+    plan = plan_night(names, table.ra[rows], table.dec[rows], start, hours, args.minutes, args.min_alt,
+                      args.lat, args.lon, min_moon=args.min_moon, apparent=(apparent_ra[rows], apparent_dec[rows]))
+    print_plan(plan)
+    if not args.run or not plan:
+        return
+
+    # hardware only needed to run the plan
+    from odroid_arduino import MountLink, open_arduino
+    from odroid_goto import GotoController
+    from odroid_solver import AstapSolver, ZwoCamera
+    ser = open_arduino()
+    if ser is None:
+        raise SystemExit("arduino not connected")
+    goto = GotoController(MountLink(ser), ZwoCamera(), AstapSolver(), catalog)
+    goto.target = plan[0].target
+    input("point the telescope at " + plan[0].name + " and press enter to calibrate")
+    goto.calibrate(report=print)
+    for entry, status in run_plan(plan, goto, report=print):
+        print(entry.name, status)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+
+## about this script
+# pointing pipeline of odroid_solve_and_goto_gui.py without any GUI: calibrate, compare, go to
+# the hardware is given as objects so that the same code runs with the telescope or with a
+# recorded session (odroid_session.py):
+#       mount:  move(command)               fast preset move ('V' 'C' 'U' 'J'), returns when done
+#               move_steps(command, steps)  custom move ('O' 'P' 'K' 'L'), returns when done
+#               slew(az, alt, speeds, accelerations)   both axes at once (odroid_motion.py), True when done
+#               settle(seconds)             wait for the tube to stop vibrating
+#       camera: capture()                   takes an image, returns its path
+#       solver: solve(path, ra_hrs, spd)    returns ra,dec in degrees or None, J2000 (astap)
+# a target may be J2000 or JNow (odroid_epoch.py), compare brings it to the frame of the images
+# progress is given through report(message) and progress(percent) callbacks
+# captures, solves, moves, calibrate and goto are timed spans (odroid_trace.py)
+
+## functions:
+
+# Calibration           calibration model: angle between the axes and degrees per fast move, sky matrix
+# convert_coord         convert astronomical ra/dec to dobson az/alt
+# wrap_ra               difference of ra across 0h
+# take_and_solve        capture an image and solve it around the target
+# fit_matrix            robust least squares fit of the sky shift of one fast move on each axis
+# matrix_to_axes        angle and degrees per fast move of a fitted matrix
+# calibrate             moves the motors, solves images, fits the model, unsolved images are skipped
+# compare               difference between image and target, number of steps to go to target
+# move_axes             slew or custom moves on both axes (signed number of steps)
+# go_to                 sends the steps to the arduino, takes and solves a new image, compares again
+
+
+######################
+## import modules ####
+######################
+
+from collections import namedtuple      # target and calibration results
+from math import atan2,cos,sin,degrees  # calculate image coordinates in Dobson reference
+import numpy as np                      # calibration fit
+import odroid_motion as motion          # slews planned from the limits of the axes
+import odroid_trace as trace            # timed spans of each step
+from odroid_epoch import J2000, target_in   # frames of the targets
+
+
+# ra, dec in degrees (as used in compare), ra_hrs and spd (dec + 90) as hints for astap
+# frame of ra, dec: J2000 (catalog) by default, so that sessions recorded without it still load
+Target = namedtuple("Target", ["ra", "dec", "ra_hrs", "spd", "frame"], defaults=(J2000,))
+
+# frame of the solutions of the solver (astap)
+IMAGE_FRAME = J2000
+
+
+class Calibration(namedtuple("Calibration", ["step_az", "step_vc", "angle_av", "ra_img", "dec_img", "matrix", "residual"],
+                             defaults=(None, None))):
+    """
+    calibration model of the dobson:
+    step_az, step_vc: degrees on dobson axis for one fast move (3200 steps), angle_av in rad
+    ra_img, dec_img: position of the telescope at the end of the calibration
+    matrix: ((ra per az move, ra per alt move), (dec per az move, dec per alt move)) in degrees, compare
+        uses it when present (axes need not be square), residual: rms of the fit in degrees
+    """
+    __slots__ = ()
+
+    def compare(self, target, ra_img, dec_img):
+        return compare(self, target, ra_img, dec_img)
+
+    def angle_degrees(self):
+        return angle_degrees(self)
+
+
+# number of steps of a fast move (arduino fast())
+FAST_STEPS = 3200
+
+# fast moves used by the calibration: letter sent to the arduino
+AZ_MINUS = 'C'
+AZ_PLUS = 'V'
+ALT_MINUS = 'J'
+ALT_PLUS = 'U'
+
+# calibration: the four series of moves, and the fast moves each one makes on (az, alt) with the signs
+# of the custom moves of compare / move_axes: in the arduino 'V' and 'O' turn Azimut(-1),
+# 'J' and 'K' turn Alt(-1)
+CALIBRATION_MOVES = ((AZ_MINUS, (-1, 0)), (ALT_MINUS, (0, 1)), (ALT_PLUS, (0, -1)), (AZ_PLUS, (1, 0)))
+
+# an image pair further than this from the model is an outlier (degrees, a fast move is about 0.3°)
+OUTLIER_DEGREES = 0.05
+# then pairs beyond CLIP_SIGMA robust sigmas (but at least CLIP_FLOOR degrees) are left out
+CLIP_SIGMA = 3
+CLIP_FLOOR = 0.002
+CLIP_ITERATIONS = 10                     # fits at most (the masks can go round in a cycle)
+# fewest image pairs on each axis
+MIN_PAIRS = 2
+
+
+class PointingError(Exception):
+    """
+    an image could not be solved, the calibration or goto cannot go on
+    """
+
+
+######################
+####  functions  #####
+######################
+
+def convert_coord(ra,dec,angle_av):
+    """
+    convert coordinates from astronomical ra/dec to dobson azimut/vertical (az/vc)
+    source: https://doubleroot.in/lessons/coordinate-geometry-basics/rotation-of-axes/
+    """
+    #calculate references with respect to motor instead of astro (angle in rad)
+    az = ra*cos(angle_av) + dec*sin(angle_av)
+    vc = dec*cos(angle_av) - ra*sin(angle_av)
+    return az,vc
+
+
+def nothing(*args):
+    pass
+
+
+def take_and_solve(camera, solver, target, report=nothing):
+    """
+    returns ra,dec of a new image in degrees, as solved (formatted only for display)
+    """
+    report("image requested")
+    with trace.span("pointing.capture"):
+        path = camera.capture()
+    report("coordinates requested")
+    with trace.span("pointing.solve") as s:
+        solution = solver.solve(path, target.ra_hrs, target.spd)
+        s["solved"] = solution is not None
+    if solution is None:
+        # a frame that was not worth solving says why (odroid_quality.CheckingSolver)
+        raise PointingError(getattr(solver, "skipped", None) or "could not solve image")
+    ra_img, dec_img = solution
+    report("coordinates found")
+    return float(ra_img), float(dec_img)
+
+
+def wrap_ra(difference):
+    """
+    difference of ra in degrees between -180 and 180 (across 0h)
+    """
+    return (difference + 180) % 360 - 180
+
+
+def calibration_series(mount, camera, solver, target, command, report, progress):
+    """
+    one move for backlash, then 4 moves each followed by an image
+    returns the ra, dec of the 4 images, None for an image that could not be solved
+    """
+    report("one move " + command + " for backlash")
+    with trace.span("pointing.move", command=command, backlash=True):
+        mount.move(command)       # make sure catch up backlash
+    positions = []
+    for move in range(0,4):
+        report("moving " + command)
+        with trace.span("pointing.move", command=command):
+            mount.move(command)
+        try:
+            positions.append(take_and_solve(camera, solver, target, report))
+        except PointingError:
+            report("image not solved, calibration goes on")
+            positions.append(None)
+        progress(6.66667)
+    return positions
+
+
+def series_pairs(positions, direction):
+    """
+    consecutive solved images of a series: fast moves between them (az, alt) and sky shift (ra, dec)
+    an unsolved image in between gives a pair two moves apart
+    """
+    solved = [(index, position) for index, position in enumerate(positions) if position is not None]
+    moves, shifts = [], []
+    for (i, (ra_i, dec_i)), (j, (ra_j, dec_j)) in zip(solved, solved[1:]):
+        moves.append((direction[0] * (j - i), direction[1] * (j - i)))
+        shifts.append((wrap_ra(ra_j - ra_i), dec_j - dec_i))
+    return moves, shifts
+
+
+def _weighted_fit(moves, shifts, weights):
+    root = np.sqrt(weights)[:, None]
+    return np.linalg.lstsq(moves * root, shifts * root, rcond=None)[0]
+
+
+def fit_matrix(moves, shifts):
+    """
+    moves: n x 2 fast moves (az, alt) between image pairs, shifts: n x 2 sky shifts (ra, dec) in degrees
+    consensus first: each couple of one az pair and one alt pair gives a matrix, the one that most pairs
+    agree with (within OUTLIER_DEGREES) is kept, then weighted least squares on its inliers (a pair two
+    moves apart weighs half: missed steps add up) with sigma clipping of the residuals
+    returns the 2x2 matrix (sky shift of one fast move on each axis in columns), the inlier mask and the
+    residual of each pair in degrees; raises PointingError if an axis has fewer than MIN_PAIRS pairs
+    """
+    moves = np.asarray(moves, dtype=float).reshape(-1, 2)
+    shifts = np.asarray(shifts, dtype=float).reshape(-1, 2)
+    az_rows = np.flatnonzero(moves[:, 0] != 0)
+    alt_rows = np.flatnonzero(moves[:, 1] != 0)
+    if len(az_rows) < MIN_PAIRS or len(alt_rows) < MIN_PAIRS:
+        raise PointingError("not enough solved images to calibrate")
+    weights = 1 / np.abs(moves).sum(axis=1)
+
+    best = None
+    for i in az_rows:
+        for j in alt_rows:
+            candidate = np.linalg.solve(moves[[i, j]], shifts[[i, j]])
+            errors = np.linalg.norm(moves @ candidate - shifts, axis=1)
+            inliers = errors <= OUTLIER_DEGREES
+            score = (inliers.sum(), -errors[inliers].sum())
+            if best is None or score > best[0]:
+                best = (score, inliers)
+    inliers = best[1]
+
+    # a clipping can bring back a pair the previous one removed: the masks may go round in a cycle,
+    # so the loop stops at a mask already fitted, and after CLIP_ITERATIONS fits at most
+    seen = set()
+    for iteration in range(CLIP_ITERATIONS):
+        seen.add(inliers.tobytes())
+        fit = _weighted_fit(moves[inliers], shifts[inliers], weights[inliers])
+        residuals = np.linalg.norm(moves @ fit - shifts, axis=1)
+        sigma = 1.4826 * np.median(residuals[inliers])
+        kept = residuals <= max(CLIP_SIGMA * sigma, CLIP_FLOOR)
+        # never clip an axis below MIN_PAIRS
+        if (kept[az_rows].sum() < MIN_PAIRS or kept[alt_rows].sum() < MIN_PAIRS
+                or kept.tobytes() in seen or iteration == CLIP_ITERATIONS - 1):
+            # the mask returned is the one of the last fit
+            break
+        inliers = kept
+    return fit.T, inliers, residuals
+
+
+def matrix_to_axes(matrix):
+    """
+    angle_av (rad), step_az, step_vc of the model of convert_coord closest to the matrix
+    the angle is the mean of the angles of both axes, step_vc is negative if the axes are mirrored
+    """
+    (ra_az, ra_alt), (dec_az, dec_alt) = matrix
+    angle_az = atan2(dec_az, ra_az)
+    mirrored = ra_az * dec_alt - dec_az * ra_alt < 0
+    angle_alt = atan2(ra_alt, -dec_alt) if mirrored else atan2(-ra_alt, dec_alt)
+    angle_av = atan2(sin(angle_az) + sin(angle_alt), cos(angle_az) + cos(angle_alt))
+    step_az = convert_coord(ra_az, dec_az, angle_av)[0]
+    step_vc = convert_coord(ra_alt, dec_alt, angle_av)[1]
+    return angle_av, step_az, step_vc
+
+
+@trace.traced("pointing.calibrate")
+def calibrate(mount, camera, solver, target, report=nothing, progress=nothing):
+    """
+    move 4 times in each direction (after one move for backlash), each time take and solve an image
+    fits the sky shift of a fast move on each axis (fit_matrix), an image that cannot be solved is skipped
+    raises PointingError if too few images are solved
+    """
+    report("calibration started")
+    # az-, then alt-, then alt+, then az+
+    moves, shifts = [], []
+    for command, direction in CALIBRATION_MOVES:
+        if command == ALT_PLUS:
+            mount.settle(2)
+        positions = calibration_series(mount, camera, solver, target, command, report, progress)
+        series_moves, series_shifts = series_pairs(positions, direction)
+        moves += series_moves
+        shifts += series_shifts
+
+    matrix, inliers, residuals = fit_matrix(moves, shifts)
+    angle_av, step_az, step_vc = matrix_to_axes(matrix)
+    residual = float(np.sqrt(np.mean(residuals[inliers] ** 2)))
+    report("calibration done, residual {:.3f}°, {} of {} pairs left out".format(
+        residual, int((~inliers).sum()), len(inliers)))
+
+    # position: the last solved image, moved by the model if the last images were not solved
+    solved = [index for index, position in enumerate(positions) if position is not None]
+    if not solved:
+        ra_img, dec_img = take_and_solve(camera, solver, target, report)
+    else:
+        ra_img, dec_img = positions[solved[-1]]
+        shift = matrix @ np.multiply(direction, len(positions) - 1 - solved[-1])
+        ra_img, dec_img = (ra_img + shift[0]) % 360, dec_img + shift[1]
+    return Calibration(float(step_az), float(step_vc), float(angle_av), float(ra_img), float(dec_img),
+                       [[float(value) for value in row] for row in matrix], residual)
+
+
+def compare(calibration, target, ra_img, dec_img):
+    """
+    difference between image and target, on astro and dobson axis
+    returns a dictionary, stepper_az and stepper_vc are the number of steps to go to target
+    """
+    target = target_in(target, IMAGE_FRAME)
+    angle_av = calibration.angle_av
+    az_target_d,vc_target_d = convert_coord(target.ra,target.dec,angle_av)
+    az_img_d,vc_img_d = convert_coord(ra_img,dec_img,angle_av)
+
+    AZ_diff_image_target = az_img_d - az_target_d
+    ALT_diff_image_target = vc_img_d - vc_target_d
+
+    # and this is by how much steppers should move to go to target (nearest step)
+    if calibration.matrix is None:
+        stepper_az = round(( AZ_diff_image_target / calibration.step_az ) * FAST_STEPS * -1)
+        stepper_vc = round(( ALT_diff_image_target / calibration.step_vc ) * FAST_STEPS * -1)
+    else:
+        # fast moves whose sky shift is the one from image to target: inverse of the 2x2 matrix
+        (a, b), (c, d) = calibration.matrix
+        diff_ra = wrap_ra(target.ra - ra_img)
+        diff_dec = target.dec - dec_img
+        determinant = a * d - b * c
+        stepper_az = round((d * diff_ra - b * diff_dec) / determinant * FAST_STEPS)
+        stepper_vc = round((a * diff_dec - c * diff_ra) / determinant * FAST_STEPS)
+
+    return {"az_img": az_img_d, "vc_img": vc_img_d, "az_target": az_target_d, "vc_target": vc_target_d,
+            "diff_az": AZ_diff_image_target, "diff_vc": ALT_diff_image_target,
+            "diff_ra": wrap_ra(ra_img - target.ra), "diff_dec": dec_img - target.dec,
+            "stepper_az": stepper_az, "stepper_vc": stepper_vc}
+
+
+def move_axes(mount, stepper_az, stepper_vc, limits=None):
+    """
+    stepper_az and stepper_vc steps (signed, as computed by compare)
+    with limits of the axes (None: those of motion_limits.json) and a mount that has slew: both axes at
+    once with the profile of odroid_motion.plan_slew, otherwise custom moves, azimut first
+    """
+    if limits is None:
+        limits = motion.load_limits()
+    if limits and hasattr(mount, "slew"):
+        # the motor turns the other way than the custom moves count (see CALIBRATION_MOVES)
+        profile = motion.plan_slew(-int(stepper_az), -int(stepper_vc), limits)
+        with trace.span("pointing.slew", az=stepper_az, alt=stepper_vc, duration=round(profile.duration, 2)):
+            if not mount.slew(*profile.command()):
+                raise PointingError("the arduino did not accept the slew {}".format(profile.command()))
+        return
+    with trace.span("pointing.move", axis="az", steps=stepper_az):
+        if (stepper_az < 0):
+            mount.move_steps('P', stepper_az)
+        if (stepper_az > 0):
+            mount.move_steps('O', stepper_az)
+    with trace.span("pointing.move", axis="alt", steps=stepper_vc):
+        if (stepper_vc < 0):
+            mount.move_steps('L', stepper_vc)
+        if (stepper_vc > 0):
+            mount.move_steps('K', stepper_vc)
+
+
+def go_to(mount, camera, solver, calibration, target, stepper_az, stepper_vc, report=nothing, limits=None):
+    """
+    send stepper_az and stepper_vc to arduino (limits: see move_axes, {} for custom moves)
+    at the end of goto, it takes a new image and solves it, then compares again
+    returns the new ra_img, dec_img and the result of compare
+    """
+    report("goto requested")
+    with trace.span("pointing.goto", stepper_az=stepper_az, stepper_vc=stepper_vc):
+        move_axes(mount, stepper_az, stepper_vc, limits)
+
+        ## take new image, solve it and update diff and steps
+        ra_img, dec_img = take_and_solve(camera, solver, target, report)
+    report("goto finished, check results")
+    return ra_img, dec_img, compare(calibration, target, ra_img, dec_img)
+
+
+def angle_degrees(calibration):
+    """
+    angle between astro and dobson axis for display
+    """
+    return "{:.1f}".format(degrees(calibration.angle_av))
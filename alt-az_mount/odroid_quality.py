@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+
+## about this script
+# frame health: each frame of the camera is measured before it is solved
+#   background level and noise, number of stars, median half flux radius (HFR) of the stars and
+#   fraction of saturated pixels, on the frame binned to at most ANALYSIS_SIZE pixels (well under 0.1 s)
+#   a frame with too few stars (clouds, dew on the optics, lens cap), stars too large (dew, out of
+#   focus) or too many saturated pixels (moon, dawn) is not solved: astap would fail after seconds
+#   the measures go to frame_health.csv with the humidity and temperatures of the last sensor
+#   reading, so a failed night can be read against the dew, and to the telemetry store as frame.<measure>
+#
+# usage: camera.listeners.append(monitor.listener); solver = CheckingSolver(solver, monitor)
+#   (GotoController does both, see odroid_goto.py)
+
+## functions:
+
+# frame_health          background, noise, stars, median HFR and saturated fraction of a frame
+# verdict               why a frame cannot be solved, None if it can
+# log_health            append the measures and the sensors to frame_health.csv
+# FrameMonitor          camera listener: measures every frame, logs and reports it
+# CheckingSolver        wraps the solver, does not solve a frame that the monitor found hopeless
+
+
+######################
+## import modules ####
+######################
+
+import csv                              # health log file
+import datetime                         # timestamp of the log entries
+from pathlib import Path                # health log file
+import numpy as np                      # frames
+from odroid_image import background_noise, bin_frame, neighbour_max, solve_binning
+import odroid_trace as trace            # timed spans of each frame measured
+
+
+HEALTH_LOG = Path("/home/dlg/Documents/python") / "frame_health.csv"
+SENSOR_FIELDS = ["temp", "t_intake", "h_intake", "t_eq_table", "h_eq_table"]
+HEALTH_LOG_FIELDS = ["time", "path", "background", "noise", "stars", "hfr", "saturated", "skipped"] + SENSOR_FIELDS
+
+# largest side of the frame that is measured
+ANALYSIS_SIZE = 1000
+# a star is a local maximum this many noise sigmas above the background
+DETECT_SIGMA = 5.0
+# stars kept for the HFR (the brightest), radius of the box around each one
+HFR_STARS = 100
+HFR_RADIUS = 8
+# fraction of the largest value of the frame type above which a pixel is saturated
+SATURATION = 0.98
+
+# below / above these a frame is not solved
+MIN_STARS = 8
+MAX_HFR = 3.0               # binned pixels (HFR_RADIUS is far larger)
+MAX_SATURATED = 0.2
+
+
+######################
+####  functions  #####
+######################
+
+def frame_health(frame, size=ANALYSIS_SIZE):
+    """
+    background (median) and noise of the binned frame, number of stars, median HFR in binned pixels
+    (None without stars), fraction of saturated pixels in the raw frame, binning used
+    """
+    frame = np.asarray(frame)
+    # at least 2x2: a raw bayer frame becomes its luma
+    binning = max(solve_binning(frame.shape, size), 2)
+    image = bin_frame(frame, binning)
+    background, noise = background_noise(image)
+    noise = max(noise, 1.0)
+
+    padded = np.pad(image, HFR_RADIUS, mode="edge")
+    inner = padded[HFR_RADIUS - 1:HFR_RADIUS + image.shape[0] + 1, HFR_RADIUS - 1:HFR_RADIUS + image.shape[1] + 1]
+    peaks = (image > background + DETECT_SIGMA * noise) & (image >= neighbour_max(image, inner))
+    ys, xs = np.nonzero(peaks)
+
+    hfr = None
+    if len(ys):
+        brightest = np.argsort(image[ys, xs])[::-1][:HFR_STARS]
+        ys, xs = ys[brightest], xs[brightest]
+        offsets = np.arange(-HFR_RADIUS, HFR_RADIUS + 1)
+        dy, dx = np.meshgrid(offsets, offsets, indexing="ij")
+        radius = np.hypot(dy, dx).ravel()
+        # (stars, box pixels) flux above the background
+        flux = padded[ys[:, None] + HFR_RADIUS + dy.ravel(), xs[:, None] + HFR_RADIUS + dx.ravel()] - background
+        np.clip(flux, 0, None, out=flux)
+        total = flux.sum(axis=1)
+        hfr = float(np.median((flux * radius).sum(axis=1) / np.maximum(total, 1e-6)))
+
+    if frame.dtype.kind in "ui":
+        limit = SATURATION * np.iinfo(frame.dtype).max
+        saturated = float(np.count_nonzero(frame[::2, ::2] >= limit)) / frame[::2, ::2].size
+    else:
+        saturated = 0.0
+    return {"background": background, "noise": noise, "stars": int(peaks.sum()), "hfr": hfr,
+            "saturated": saturated, "binning": binning}
+
+
+def verdict(health):
+    """
+    reason why the frame would not be solved, None if it looks good enough
+    """
+    if health["saturated"] > MAX_SATURATED:
+        return "frame saturated ({:.0%} of the pixels)".format(health["saturated"])
+    if health["stars"] < MIN_STARS:
+        return "only {} stars (clouds or dew?)".format(health["stars"])
+    if health["hfr"] is not None and health["hfr"] > MAX_HFR:
+        return "stars too large, HFR {:.1f} (dew or focus?)".format(health["hfr"])
+    return None
+
+
+def log_health(path, health, reason, sensors=None, log=HEALTH_LOG):
+    """
+    append a line to the health log (creates the file and its header if needed)
+    """
+    sensors = sensors or {}
+    new_file = not Path(log).exists()
+    with open(log, "a", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=HEALTH_LOG_FIELDS)
+        if new_file:
+            writer.writeheader()
+        row = {"time": datetime.datetime.now().isoformat(timespec="seconds"), "path": str(path),
+               "background": round(health["background"], 1), "noise": round(health["noise"], 2),
+               "stars": health["stars"], "hfr": None if health["hfr"] is None else round(health["hfr"], 2),
+               "saturated": round(health["saturated"], 4), "skipped": reason or ""}
+        row.update({key: sensors.get(key) for key in SENSOR_FIELDS})
+        writer.writerow(row)
+
+
+class FrameMonitor:
+    """
+    listener(frame, path) measures each frame of the camera: health, reason (None if it can be solved)
+    sensors: callable returning the last sensor reading (dict) or None, written in the log with the measures
+    report(health) is called with the measures and the reason of each frame
+    telemetry: odroid_telemetry.TelemetryStore that keeps the measures, or None
+    """
+
+    def __init__(self, log=HEALTH_LOG, sensors=None, report=None, telemetry=None):
+        self.log = log
+        self.sensors = sensors
+        self.report = report
+        self.telemetry = telemetry
+        self.health = None
+        self.reason = None
+        self.path = None
+
+    def listener(self, frame, path):
+        with trace.span("quality.frame_health") as s:
+            self.health = frame_health(frame)
+            self.reason = verdict(self.health)
+            self.path = str(path)
+            s["stars"] = self.health["stars"]
+            s["skipped"] = self.reason is not None
+        if self.log is not None:
+            try:
+                log_health(path, self.health, self.reason, self.sensors() if self.sensors else None, self.log)
+            except OSError:
+                pass
+        if self.telemetry is not None:
+            self.telemetry.record_many(dict(self.health, skipped=int(self.reason is not None)), prefix="frame.")
+        if self.report is not None:
+            self.report(dict(self.health, path=self.path, skipped=self.reason))
+
+    def forget(self):
+        """
+        start listener of the camera: a capture without frame is not judged on the previous one
+        """
+        self.health = None
+        self.reason = None
+        self.path = None
+
+    def hopeless(self, path):
+        """
+        reason why the frame of this path should not be solved, None if it should (or was not measured)
+        """
+        return self.reason if self.path == str(path) else None
+
+
+class CheckingSolver:
+    """
+    solver wrapper: a frame that the monitor found hopeless is not solved, solve returns None
+    skipped is the reason of the last frame that was not solved
+    """
+
+    def __init__(self, solver, monitor):
+        self.solver = solver
+        self.monitor = monitor
+        self.skipped = None
+
+    def solve(self, path, ra_hrs, spd):
+        self.skipped = self.monitor.hopeless(path)
+        if self.skipped is not None:
+            return None
+        return self.solver.solve(path, ra_hrs, spd)
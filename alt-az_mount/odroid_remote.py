@@ -0,0 +1,530 @@
+#!/usr/bin/env python3
+
+## about this script
+# remote control of the dobson over the network, instead of the Tk windows through VNC
+#   one small asyncio server (standard library only): HTTP for single commands, WebSocket for commands
+#   and the events pushed by the telescope (progress of calibrate / goto, sensors, health of each frame,
+#   hardware plugged...)
+#   it drives RockerController (moves, focus, sensors, table) and GotoController (target, solve,
+#   calibrate, compare, go to), so the GUIs must not run at the same time (one serial line each)
+#
+# HTTP: GET /status, GET /sensors, POST /<operation> with the parameters as a json object
+#       curl -X POST -d '{"command": "S"}' http://odroid:8765/move
+# WebSocket on /ws: send {"op": "move", "command": "S", "id": 1}, the answer comes back with the same id
+#       {"id": 1, "result": ...} or {"id": 1, "error": "..."}, events look like {"event": "progress", ...}
+# see odroid_remote_client.py for a client and a latency measurement
+#
+# the server listens on this computer only (127.0.0.1): to serve the network give a shared token as well,
+#   every request must then carry it (header "Authorization: Bearer <token>", or ?token=<token> for a
+#   websocket opened by a browser), anyone on the observing WiFi could drive the mount otherwise
+#
+# with --lx200 4030, KStars / EKOS can drive the mount at the same time (see odroid_lx200.py): the LX200
+#   protocol has no token, the bridge listens on 127.0.0.1 whatever --host (EKOS runs on the odroid),
+#   --lx200-host with --lx200-network serves it to the network
+#
+# with --workers, the camera, astap and the serial line of the arduino run in their own processes and a
+#   worker that crashes is started again (see odroid_workers.py), the operation that was running fails with 503
+#
+# usage: python3 odroid_remote.py [--host 0.0.0.0 --token <secret>] [--port 8765] [--telemetry 60] [--lx200 4030] [--workers]
+#   the token can be given in DOBSON_REMOTE_TOKEN instead
+
+## functions:
+
+# ConnectionLost        raised when the arduino or the camera needed by an operation is missing
+# RemoteControl         operations on the controllers, run one at a time in a worker thread
+# read_frame            read one websocket frame (used by the client as well)
+# write_frame           send one websocket frame
+# RemoteServer          asyncio HTTP and WebSocket server, pushes the events to every websocket
+# main                  open the hardware in the background and serve
+
+
+######################
+## import modules ####
+######################
+
+import argparse                         # command line
+import asyncio                          # server
+import base64                           # websocket handshake
+import hashlib                          # websocket handshake
+import hmac                             # token comparison
+import json                             # requests and answers
+import os                               # websocket mask of the client
+import struct                           # websocket frame length
+from concurrent.futures import ThreadPoolExecutor   # serial lines and astap block, they run in one thread
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit   # token of a websocket
+from odroid_arduino import ARDUINO_PORT, as_link, open_arduino
+from odroid_catalog import Catalog
+import odroid_eq_table
+from odroid_goto import GotoController
+from odroid_hotplug import HardwareMonitor, usb_devices
+from odroid_lx200 import HOST as LX200_HOST, Lx200Bridge, is_loopback, serve_lx200
+from odroid_pointing import PointingError
+from odroid_rocker import RockerController
+from odroid_solver import AstapSolver, ZwoCamera, camera_connected
+from odroid_telemetry import open_store     # sensors, frames and spans kept on disk
+import odroid_scheduling as scheduling  # core and priority of the thread of the serial lines
+import odroid_trace as trace            # one span per remote operation
+from odroid_workers import Supervisor, WorkerCrashed    # camera, solver and arduino in their own processes
+
+
+HOST = "127.0.0.1"
+PORT = 8765
+TOKEN_VARIABLE = "DOBSON_REMOTE_TOKEN"
+
+TELEMETRY_INTERVAL = 60     # s between two sensor events pushed to the websockets, 0 for none
+HARDWARE_INTERVAL = 0.2     # s between two reads of the hotplug queue
+
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC11B85"
+
+# websocket opcodes
+OP_TEXT = 0x1
+OP_CLOSE = 0x8
+OP_PING = 0x9
+OP_PONG = 0xA
+
+HTTP_REASONS = {200: "OK", 400: "Bad Request", 401: "Unauthorized", 404: "Not Found", 500: "Internal Server Error",
+                503: "Service Unavailable"}
+
+
+######################
+####  functions  #####
+######################
+
+class ConnectionLost(Exception):
+    pass
+
+
+class RemoteControl:
+    """
+    every operation takes keyword parameters and returns something json can encode
+    report(event) is called with the progress of the long operations, from the worker thread
+    """
+
+    def __init__(self, rocker, goto, report=print):
+        self.rocker = rocker
+        self.goto = goto
+        self.report = report
+        self.camera_ok = False
+        self.operations = {"status": self.status, "ping": self.ping,
+                           "move": self.move, "focus": self.focus, "sensors": self.sensors,
+                           "table": self.table, "table_speed": self.table_speed, "table_reset": self.table_reset,
+                           "target": self.target, "capture": self.capture, "solve": self.solve,
+                           "calibrate": self.calibrate, "compare": self.compare, "goto": self.go_to}
+
+    def run(self, op, params):
+        """
+        raises KeyError for an unknown operation, ConnectionLost, PointingError, ValueError, TypeError,
+        OSError when a serial line or the camera fails during the operation
+        """
+        operation = self.operations[op]
+        with trace.span("remote." + op):
+            return operation(**params)
+
+    def need_arduino(self):
+        if self.rocker.link is None:
+            raise ConnectionLost("arduino not connected")
+
+    def need_camera(self):
+        if not self.camera_ok:
+            raise ConnectionLost("camera not connected")
+
+    def need_table(self):
+        if self.rocker.table is None:
+            raise ConnectionLost("table not connected")
+
+    def need_target(self):
+        if self.goto.target is None:
+            raise ValueError("no target, send target first")
+
+    def set_arduino(self, ser):
+        if self.rocker.link is not None:
+            self.rocker.link.ser.close()
+        link = as_link(ser)
+        self.rocker.link = link
+        self.goto.mount = link
+        if link is None:
+            self.rocker.stop_compensation()
+
+    def set_table(self, table):
+        if self.rocker.table is not None:
+            self.rocker.table.ser.close()
+        self.rocker.table = table
+
+    def progress(self, message):
+        self.report({"event": "progress", "message": message})
+
+    # operations
+
+    def status(self):
+        goto = self.goto
+        return {"arduino": self.rocker.link is not None, "camera": self.camera_ok,
+                "table": self.rocker.table is not None,
+                "focus_position": self.rocker.focus_position,
+                "compensation": self.rocker.compensator is not None,
+                "target": goto.target._asdict() if goto.target is not None else None,
+                "calibration": goto.calibration._asdict() if goto.calibration is not None else None,
+                "ra_img": goto.ra_img, "dec_img": goto.dec_img,
+                "stepper_az": goto.stepper_az, "stepper_vc": goto.stepper_vc,
+                "recording": goto.recorder is not None}
+
+    def ping(self):
+        return "pong"
+
+    def move(self, command):
+        self.need_arduino()
+        self.rocker.move(command)
+        return command
+
+    def focus(self, command):
+        self.need_arduino()
+        self.rocker.focus(command)
+        return self.rocker.focus_position
+
+    def sensors(self):
+        self.need_arduino()
+        return self.rocker.sensors()
+
+    def table(self):
+        self.need_table()
+        return self.rocker.table_status()
+
+    def table_speed(self, speed):
+        self.need_table()
+        return self.rocker.set_table_speed(float(speed))
+
+    def table_reset(self):
+        self.need_table()
+        return self.rocker.reset_table()
+
+    def target(self, catalog, ref):
+        target = self.goto.find_target(catalog, str(ref))
+        if target is None:
+            raise ValueError("target not found")
+        return target._asdict()
+
+    def capture(self):
+        self.need_camera()
+        return str(self.goto.take_image())
+
+    def solve(self):
+        """
+        solve a new image around the target (a path sent by a client is never given to astap)
+        """
+        self.need_target()
+        ra_img, dec_img = self.goto.solve(self.capture())
+        return {"ra_img": ra_img, "dec_img": dec_img}
+
+    def calibrate(self):
+        self.need_target()
+        self.need_arduino()
+        self.need_camera()
+        calibration = self.goto.calibrate(report=self.progress,
+                                          progress=lambda value: self.report({"event": "calibrate", "progress": value}))
+        return dict(calibration._asdict(), angle=calibration.angle_degrees())
+
+    def compare(self):
+        if self.goto.calibration is None:
+            raise ValueError("not calibrated, send calibrate first")
+        return self.goto.compare()
+
+    def go_to(self):
+        self.need_arduino()
+        self.need_camera()
+        if self.goto.stepper_az is None:
+            raise ValueError("no steps to the target, send compare first")
+        result = self.goto.go_to(report=self.progress)
+        return dict(result, ra_img=self.goto.ra_img, dec_img=self.goto.dec_img)
+
+
+async def read_frame(reader):
+    """
+    returns (opcode, payload bytes) of one websocket frame, unmasked (fragments are not used here)
+    """
+    first, second = await reader.readexactly(2)
+    opcode = first & 0x0F
+    length = second & 0x7F
+    if length == 126:
+        length, = struct.unpack("!H", await reader.readexactly(2))
+    elif length == 127:
+        length, = struct.unpack("!Q", await reader.readexactly(8))
+    mask = await reader.readexactly(4) if second & 0x80 else None
+    payload = await reader.readexactly(length)
+    if mask is not None:
+        payload = bytes(byte ^ mask[i % 4] for i, byte in enumerate(payload))
+    return opcode, payload
+
+
+def write_frame(writer, payload, opcode=OP_TEXT, masked=False):
+    """
+    a client must mask its frames, a server must not
+    """
+    if isinstance(payload, str):
+        payload = payload.encode()
+    header = bytes([0x80 | opcode])
+    mask_bit = 0x80 if masked else 0
+    if len(payload) < 126:
+        header += bytes([mask_bit | len(payload)])
+    elif len(payload) < 65536:
+        header += bytes([mask_bit | 126]) + struct.pack("!H", len(payload))
+    else:
+        header += bytes([mask_bit | 127]) + struct.pack("!Q", len(payload))
+    if masked:
+        mask = os.urandom(4)
+        header += mask
+        payload = bytes(byte ^ mask[i % 4] for i, byte in enumerate(payload))
+    writer.write(header + payload)
+
+
+def websocket_accept(key):
+    return base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode()).digest()).decode()
+
+
+class RemoteServer:
+    """
+    the operations run one after the other in a single worker thread (one serial line, one camera),
+    while the event loop keeps answering pings and pushing events
+    """
+
+    def __init__(self, control, monitor=None, telemetry=TELEMETRY_INTERVAL, token=None):
+        self.control = control
+        self.token = token          # None: no token asked (server on the loopback only)
+        self.monitor = monitor
+        self.telemetry = telemetry
+        # the thread of the serial lines has the core and priority of the mount (odroid_scheduling.py),
+        # the captures and the solves it asks for run in the threads of the camera and solver (main)
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="remote",
+                                           initializer=scheduling.apply, initargs=("mount",))
+        self.websockets = set()
+        self.loop = None
+
+    async def execute(self, op, params):
+        """
+        returns (http status, answer)
+        """
+        if op not in self.control.operations:
+            return 404, {"error": "unknown operation " + op}
+        try:
+            result = await self.loop.run_in_executor(self.executor, lambda: self.control.run(op, params))
+        except (ConnectionLost, WorkerCrashed) as error:
+            return 503, {"error": str(error)}
+        except (PointingError, ValueError, TypeError, KeyError) as error:
+            return 400, {"error": str(error)}
+        except OSError as error:
+            # serial line unplugged during the operation (serial.SerialException), table not answering...
+            return 503, {"error": str(error)}
+        except Exception as error:
+            # whatever else: the client gets an answer and the websocket keeps going
+            return 500, {"error": "{}: {}".format(type(error).__name__, error)}
+        if op not in ("status", "ping"):
+            self.broadcast({"event": op, "result": result})
+        return 200, {"result": result}
+
+    def broadcast(self, event):
+        message = json.dumps(event)
+        for writer in list(self.websockets):
+            write_frame(writer, message)
+
+    def authorized(self, headers, target):
+        """
+        the token in the Authorization header or in the query of the target
+        """
+        if self.token is None:
+            return True
+        scheme, _, given = headers.get("authorization", "").partition(" ")
+        if scheme.lower() != "bearer":
+            given = parse_qs(urlsplit(target).query).get("token", [""])[0]
+        return hmac.compare_digest(given.encode(), self.token.encode())
+
+    def respond(self, writer, status, answer):
+        data = json.dumps(answer).encode()
+        writer.write(("HTTP/1.1 {} {}\r\nContent-Type: application/json\r\nContent-Length: {}\r\n"
+                      "Access-Control-Allow-Origin: *\r\n\r\n").format(status, HTTP_REASONS[status], len(data)).encode()
+                     + data)
+
+    def report(self, event):
+        """
+        called from the worker thread
+        """
+        self.loop.call_soon_threadsafe(self.broadcast, event)
+
+    async def handle(self, reader, writer):
+        """
+        one connection: HTTP requests (keep-alive) until it is closed or upgraded to a websocket
+        """
+        try:
+            while True:
+                request = await reader.readline()
+                if not request:
+                    break
+                method, target, _ = request.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = (await reader.readline()).decode("latin-1").strip()
+                    if not line:
+                        break
+                    name, _, value = line.partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+
+                path = urlsplit(target).path
+                if not self.authorized(headers, target):
+                    self.respond(writer, 401, {"error": "missing or wrong token"})
+                    await writer.drain()
+                    break
+
+                if path == "/ws" and headers.get("upgrade", "").lower() == "websocket":
+                    if not headers.get("sec-websocket-key"):
+                        self.respond(writer, 400, {"error": "websocket upgrade without Sec-WebSocket-Key"})
+                        await writer.drain()
+                        break
+                    await self.websocket(reader, writer, headers["sec-websocket-key"])
+                    break
+
+                op = path.strip("/") or "status"
+                try:
+                    params = json.loads(body) if body else {}
+                except ValueError:
+                    status, answer = 400, {"error": "body must be a json object"}
+                else:
+                    if isinstance(params, dict):
+                        status, answer = await self.execute(op, params)
+                    else:
+                        status, answer = 400, {"error": "body must be a json object"}
+                self.respond(writer, status, answer)
+                await writer.drain()
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def websocket(self, reader, writer, key):
+        writer.write(("HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                      "Sec-WebSocket-Accept: {}\r\n\r\n").format(websocket_accept(key)).encode())
+        self.websockets.add(writer)
+        try:
+            while True:
+                opcode, payload = await read_frame(reader)
+                if opcode == OP_CLOSE:
+                    write_frame(writer, payload, OP_CLOSE)
+                    break
+                if opcode == OP_PING:
+                    write_frame(writer, payload, OP_PONG)
+                    continue
+                if opcode != OP_TEXT:
+                    continue
+                # each request in its own task: a ping is answered while a goto is running
+                asyncio.ensure_future(self.answer(writer, payload))
+        finally:
+            self.websockets.discard(writer)
+
+    async def answer(self, writer, payload):
+        try:
+            params = json.loads(payload)
+            op = params.pop("op")
+        except (ValueError, KeyError, AttributeError):
+            write_frame(writer, json.dumps({"error": "send a json object with op"}))
+            return
+        request_id = params.pop("id", None)
+        if op == "ping":
+            # answered by the event loop, measures the network and not the worker
+            status, answer = 200, {"result": "pong"}
+        else:
+            status, answer = await self.execute(op, params)
+        answer["id"] = request_id
+        if writer in self.websockets:
+            write_frame(writer, json.dumps(answer))
+
+    async def watch_hardware(self):
+        while True:
+            for name, device in self.monitor.poll():
+                if name == "arduino":
+                    self.control.set_arduino(device)
+                elif name == "table":
+                    self.control.set_table(device)
+                elif name == "camera":
+                    self.control.camera_ok = bool(device)
+                self.broadcast({"event": "hardware", "device": name, "connected": bool(device)})
+            await asyncio.sleep(HARDWARE_INTERVAL)
+
+    async def push_telemetry(self):
+        while True:
+            await asyncio.sleep(self.telemetry)
+            if self.websockets and self.control.rocker.link is not None:
+                await self.execute("sensors", {})
+
+    async def serve(self, host=HOST, port=PORT, lx200_port=None, lx200_host=LX200_HOST):
+        self.loop = asyncio.get_running_loop()
+        self.control.report = self.report
+        server = await asyncio.start_server(self.handle, host, port)
+        tasks = []
+        if self.monitor is not None:
+            self.monitor.start()
+            tasks.append(asyncio.ensure_future(self.watch_hardware()))
+        if self.telemetry:
+            tasks.append(asyncio.ensure_future(self.push_telemetry()))
+        if lx200_port:
+            # same worker thread: the slews of EKOS and the remote commands never overlap on the serial line
+            bridge = Lx200Bridge(self.control.goto, self.executor.submit)
+            tasks.append(asyncio.ensure_future(serve_lx200(bridge, lx200_host, lx200_port)))
+        print("listening on {}:{}".format(host, port))
+        async with server:
+            await server.serve_forever()
+
+
+######################
+######  main  ########
+######################
+
+def main():
+    parser = argparse.ArgumentParser(description="remote control of the dobson (HTTP and WebSocket)")
+    parser.add_argument("--host", default=HOST, help="0.0.0.0 to serve the network, with --token")
+    parser.add_argument("--token", default=os.environ.get(TOKEN_VARIABLE),
+                        help="shared secret every request must carry (default: " + TOKEN_VARIABLE + ")")
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--telemetry", type=float, default=TELEMETRY_INTERVAL,
+                        help="seconds between two sensor events pushed to the websockets (0: none)")
+    parser.add_argument("--lx200", type=int, metavar="PORT", help="serve the LX200 bridge for KStars / EKOS as well")
+    parser.add_argument("--lx200-host", default=LX200_HOST, help="host of the LX200 bridge, a network address needs --lx200-network")
+    parser.add_argument("--lx200-network", action="store_true",
+                        help="serve the LX200 bridge to the network: it has no token, anyone who reaches it can slew the mount")
+    parser.add_argument("--workers", action="store_true",
+                        help="camera, solver and arduino in worker processes, started again if they crash")
+    args = parser.parse_args()
+    if not args.token and not is_loopback(args.host):
+        raise SystemExit("--host {} serves the mount to the network: give --token (or {})".format(args.host, TOKEN_VARIABLE))
+    if args.lx200 and not is_loopback(args.lx200_host) and not args.lx200_network:
+        raise SystemExit("--lx200-host {}: the LX200 protocol has no token, add --lx200-network to serve it anyway".format(args.lx200_host))
+
+    trace.start_from_environment()
+    store = open_store()
+    rocker = RockerController(None, telemetry=store)
+    if args.workers:
+        supervisor = Supervisor()
+        camera, solver = supervisor.camera(), supervisor.solver()
+        open_mount = lambda: supervisor.mount(timeout=None)
+    else:
+        camera, solver = ZwoCamera(), AstapSolver()
+        open_mount = lambda: open_arduino(timeout=None)
+    # a capture (USB transfer, png, listeners measuring and storing the frame) and the preparation of a
+    # frame to solve take seconds of cpu: out of the real time thread of the mount, in their own threads
+    goto = GotoController(None, scheduling.RoleThread(camera, "camera"), scheduling.RoleThread(solver, "solver"),
+                          Catalog())
+    goto.health.telemetry = store
+    monitor = HardwareMonitor({"camera": (usb_devices, camera_connected),
+                               "arduino": (Path(ARDUINO_PORT).exists, open_mount),
+                               "table": (Path(odroid_eq_table.TABLE_PORT).exists, odroid_eq_table.open_eq_table)})
+    server = RemoteServer(RemoteControl(rocker, goto), monitor, args.telemetry, args.token or None)
+    # the health of each frame is logged with the last sensors and pushed like them
+    goto.health.sensors = lambda: rocker.last_sensors
+    goto.health.report = lambda health: server.report({"event": "frame", "result": health})
+    try:
+        asyncio.run(server.serve(args.host, args.port, args.lx200, args.lx200_host))
+    except KeyboardInterrupt:
+        goto.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+
+## about this script
+# command line client of odroid_remote.py (WebSocket), to test the server or drive the dobson from a laptop
+#
+# usage:
+#   python3 odroid_remote_client.py --host odroid --token <secret> status    (token of the server, or DOBSON_REMOTE_TOKEN)
+#   python3 odroid_remote_client.py move S                    (one letter command of the Mega)
+#   python3 odroid_remote_client.py target catalog=Messier ref=42
+#   python3 odroid_remote_client.py calibrate                 (prints the progress events as they come)
+#   python3 odroid_remote_client.py watch                     (prints every event pushed by the server)
+#   python3 odroid_remote_client.py latency --count 200       (round trip of a ping, percentiles in ms)
+
+## functions:
+
+# RemoteClient          websocket connection, request() waits for the answer with the same id
+# parse_params          command line key=value parameters (a single value goes to "command")
+# latency               round trip percentiles of a ping
+
+
+######################
+## import modules ####
+######################
+
+import argparse                         # command line
+import asyncio
+import base64                           # websocket handshake
+import json
+import os
+from time import perf_counter
+import numpy as np                      # percentiles
+from odroid_remote import OP_CLOSE, OP_PING, OP_PONG, OP_TEXT, PORT, TOKEN_VARIABLE, read_frame, websocket_accept, write_frame
+
+
+######################
+####  functions  #####
+######################
+
+class RemoteClient:
+    """
+    events (answers without id) go to on_event
+    """
+
+    def __init__(self, on_event=print):
+        self.on_event = on_event
+        self.reader = None
+        self.writer = None
+        self.pending = {}
+        self.next_id = 0
+        self.receiver = None
+
+    async def connect(self, host="localhost", port=PORT, token=None):
+        self.reader, self.writer = await asyncio.open_connection(host, port)
+        key = base64.b64encode(os.urandom(16)).decode()
+        authorization = "Authorization: Bearer {}\r\n".format(token) if token else ""
+        self.writer.write(("GET /ws HTTP/1.1\r\nHost: {}:{}\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                           "Sec-WebSocket-Key: {}\r\nSec-WebSocket-Version: 13\r\n{}\r\n").format(host, port, key, authorization).encode())
+        status = await self.reader.readline()
+        headers = {}
+        while True:
+            line = (await self.reader.readline()).decode("latin-1").strip()
+            if not line:
+                break
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        if b" 101 " not in status or headers.get("sec-websocket-accept") != websocket_accept(key):
+            raise ConnectionError("websocket refused: " + status.decode("latin-1").strip())
+        self.receiver = asyncio.ensure_future(self.receive())
+
+    async def receive(self):
+        try:
+            while True:
+                opcode, payload = await read_frame(self.reader)
+                if opcode == OP_CLOSE:
+                    break
+                if opcode == OP_PING:
+                    write_frame(self.writer, payload, OP_PONG, masked=True)
+                if opcode != OP_TEXT:
+                    continue
+                message = json.loads(payload)
+                future = self.pending.pop(message.get("id"), None)
+                if future is not None:
+                    future.set_result(message)
+                else:
+                    self.on_event(message)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        for future in self.pending.values():
+            future.set_exception(ConnectionError("connection closed"))
+
+    async def request(self, op, **params):
+        """
+        returns the answer: {"result": ...} or {"error": ...}
+        """
+        self.next_id += 1
+        future = asyncio.get_running_loop().create_future()
+        self.pending[self.next_id] = future
+        write_frame(self.writer, json.dumps(dict(params, op=op, id=self.next_id)), masked=True)
+        return await future
+
+    async def close(self):
+        write_frame(self.writer, b"", OP_CLOSE, masked=True)
+        await asyncio.sleep(0)
+        self.receiver.cancel()
+        self.writer.close()
+
+
+def parse_params(values):
+    """
+    ["catalog=Messier", "ref=42"] -> {"catalog": "Messier", "ref": "42"}, ["S"] -> {"command": "S"}
+    numbers are converted (speed=725.5)
+    """
+    params = {}
+    for value in values:
+        key, equal, value = value.partition("=")
+        if not equal:
+            key, value = "command", key
+        try:
+            value = float(value) if "." in value else int(value)
+        except ValueError:
+            pass
+        params[key] = value
+    return params
+
+
+async def latency(client, count):
+    """
+    round trip of count pings in ms: min, p50, p90, p99, max
+    """
+    times = []
+    for _ in range(count):
+        start = perf_counter()
+        await client.request("ping")
+        times.append((perf_counter() - start) * 1000)
+    return dict(zip(["min", "p50", "p90", "p99", "max"], np.percentile(times, [0, 50, 90, 99, 100]).round(3).tolist()))
+
+
+async def run(args):
+    client = RemoteClient(on_event=lambda event: print("event:", json.dumps(event)))
+    await client.connect(args.host, args.port, args.token)
+    try:
+        if args.op == "watch":
+            await client.receiver
+        elif args.op == "latency":
+            print(json.dumps(await latency(client, args.count)))
+        else:
+            start = perf_counter()
+            answer = await client.request(args.op, **parse_params(args.params))
+            answer.pop("id")
+            print(json.dumps(answer, indent=2))
+            print("{:.1f} ms".format((perf_counter() - start) * 1000))
+    finally:
+        await client.close()
+
+
+######################
+######  main  ########
+######################
+
+def main():
+    parser = argparse.ArgumentParser(description="client of odroid_remote.py")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--token", default=os.environ.get(TOKEN_VARIABLE), help="token of the server")
+    parser.add_argument("--count", type=int, default=100, help="number of pings with latency")
+    parser.add_argument("op", help="status, move, focus, sensors, table, table_speed, table_reset, target, capture, "
+                                   "solve, calibrate, compare, goto, or watch / latency")
+    parser.add_argument("params", nargs="*", help="key=value, or the command letter of move / focus")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+
+## about this script
+# rocker controller: what odroid_sensors_motors_gui.py does, without any GUI
+#   manual moves and focus of the arduino Mega, sensors (arduino and odroid), focus position and its
+#   temperature compensation, equatorial table (arduino Uno), dew control (fans and heater)
+#   the GUI only calls these methods and displays what they return
+
+## functions:
+
+# odroid_temperature    temperature of the odroid (soc = system on chip), from "sensors -j"
+# RockerController      moves, focus, sensors, temperature compensation, equatorial table and dew control
+
+
+######################
+## import modules ####
+######################
+
+import datetime                                     # name of the session in the focus log
+import json                                         # output of sensors -j
+import subprocess                                   # sensors -j
+import odroid_focus_compensation as focus_comp      # temperature compensation of the focus
+import odroid_dew as dew                            # fans and heater from the dew point
+
+
+# one letter commands of the arduino Mega (see arduino_altaz_stepper_bigeasydriver.ino)
+MOVE_COMMANDS = "SXZAVCIHDEUJ"
+
+
+######################
+####  functions  #####
+######################
+
+def odroid_temperature():
+    """
+    get odroid own temperature value (soc=system on chip, skip ddr)
+    returns None if lm-sensors is not there (e.g. not on the odroid)
+    """
+    try:
+        odroid_sensors_json = json.loads(subprocess.getoutput("sensors -j"))
+        return odroid_sensors_json['soc_thermal-virtual-0']['temp1']['temp1_input']
+    except (ValueError, KeyError):
+        return None
+
+
+class RockerController:
+    """
+    link: odroid_arduino.MountLink (None if the arduino is not connected)
+    table: odroid_eq_table.EqTable (None if the table is not connected)
+    telemetry: odroid_telemetry.TelemetryStore that keeps the sensors, the table and the dew duties, or None
+    the focus position is counted in half steps since launch
+    """
+
+    def __init__(self, link, table=None, focus_log=focus_comp.FOCUS_LOG, telemetry=None):
+        self.link = link
+        self.table = table
+        self.telemetry = telemetry
+        self.focus_log = focus_log
+        self.focus_position = 0
+        self.focus_session = datetime.datetime.now().strftime("%Y%m%d-%H%M")
+        self.compensator = None
+        self.dew = None                 # DewController while the dew control runs
+        self.last_sensors = None
+
+    def move(self, command):
+        """
+        preset move, the arduino does it on its own
+        """
+        if command not in MOVE_COMMANDS:
+            raise ValueError("unknown move " + repr(command))
+        self.link.send(command)
+
+    def focus(self, command):
+        """
+        focus command (F G R T N B)
+        """
+        steps = focus_comp.FOCUS_STEPS[command]
+        self.link.send(command)
+        self.focus_position += steps
+        # a manual adjustment moves the compensation reference with it
+        if self.compensator is not None and self.compensator.reference_position is not None:
+            self.compensator.reference_position += steps
+            self.compensator.position += steps
+
+    def sensors(self):
+        """
+        arduino sensors (see MountLink.request_sensors) and "odroid" for the odroid temperature
+        """
+        self.last_sensors = dict(self.link.request_sensors(), odroid=odroid_temperature())
+        self.keep(self.last_sensors)
+        return self.last_sensors
+
+    def keep(self, values, prefix=""):
+        if self.telemetry is not None:
+            self.telemetry.record_many(values, prefix=prefix)
+
+    def coefficient(self):
+        """
+        steps per °C fitted from the focus log, None if not enough data
+        """
+        return focus_comp.fit_steps_per_degree(focus_comp.load_focus_log(self.focus_log))
+
+    def log_focus(self):
+        """
+        to be called once the telescope is well focused: logs position and temperatures,
+        refits the coefficient and restarts the compensation from here
+        returns the coefficient (None if not enough data), raises ValueError if the temperature cannot be read
+        """
+        self.sensors()
+        if not focus_comp.log_focus(self.focus_session, self.focus_position, self.last_sensors, self.focus_log):
+            raise ValueError("could not read temperature")
+        coefficient = self.coefficient()
+        if coefficient is not None and self.compensator is not None:
+            self.compensator.steps_per_degree = coefficient
+            self.compensator.start(self.focus_position, self.last_sensors)
+        return coefficient
+
+    def start_compensation(self):
+        self.compensator = focus_comp.FocusCompensator(self.link, self.coefficient())
+        self.sensors()
+        self.compensator.start(self.focus_position, self.last_sensors)
+
+    def stop_compensation(self):
+        self.compensator = None
+
+    def compensate(self):
+        """
+        refresh the sensors and send a focus correction if the temperature has drifted
+        returns the number of steps sent (0 if none)
+        """
+        if self.compensator is None:
+            return 0
+        self.sensors()
+        steps = self.compensator.update(self.last_sensors)
+        if steps:
+            self.focus_position += steps
+        return steps or 0
+
+    def start_dew(self):
+        self.dew = dew.DewController(self.link, self.table)
+
+    def stop_dew(self):
+        """
+        fans and heater off
+        """
+        if self.dew is not None:
+            # the arduinos may have been plugged or unplugged since the start
+            self.dew.link, self.dew.table = self.link, self.table
+            self.dew.stop()
+        self.dew = None
+
+    def dew_control(self):
+        """
+        refresh the sensors (and the table telemetry for its driver temperature) and set the fans and
+        the heater, returns the duties and margins (see odroid_dew.DewController.update), None if the dew
+        control is stopped or the arduino is not connected
+        """
+        if self.dew is None or self.link is None:
+            return None
+        self.sensors()
+        self.dew.link, self.dew.table = self.link, self.table
+        duties = self.dew.update(self.last_sensors, self.table_status() if self.table is not None else None)
+        self.keep(duties, "dew.")
+        return duties
+
+    def table_status(self):
+        status = self.table.status()
+        self.keep(status, "table.")
+        return status
+
+    def set_table_speed(self, speed):
+        return self.table.set_speed(speed)
+
+    def reset_table(self):
+        return self.table.reset()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+
+## about this script
+# cores and priorities of the parts of the dobson software on the Odroid N2+
+#   the N2+ has two A53 cores (0, 1) and four A73 cores (2 to 5): with no policy the serial line of the
+#   mount, the guiding loop, astap_cli (one thread per core), the live stack and KStars all share them
+#   and the answer of the arduino to a move waits until the scheduler gets back to the thread that reads it
+#   each role gets cores and a priority:
+#       mount       serial line of the Mega (thread of the GUI or remote server, or mount worker): one A73
+#                   core, real time priority (SCHED_FIFO), nothing else of ours runs there
+#       guiding     guiding loop (odroid_guiding.py): same core, real time just below the mount
+#       camera      camera worker (odroid_workers.py): another A73 core
+#       solver      solver worker and every astap_cli: the remaining cores, lower priority (nice 10)
+#   a real time priority or a negative nice needs CAP_SYS_NICE (sudo setcap cap_sys_nice+ep on python3
+#   or a limits.conf rtprio entry): without it the cores are still set and the priority stays as it is
+#   a role without realtime goes back to the normal policy (SCHED_OTHER): a thread or a process started
+#   from a real time thread inherits SCHED_FIFO, under which nice does nothing
+#   the policy is read from scheduling.json next to zwo_asi.toml, a role missing from the file keeps the
+#   default below, a role set to {} is left to the kernel
+#
+# usage: apply("mount") in the thread to place (the calling thread only on Linux), never in the main
+#   thread of a GUI (every thread and process started afterwards would inherit it)
+#   proc = subprocess.Popen(...); apply("solver", pid=proc.pid) for a process started with subprocess
+#   (no preexec_fn: it is not safe in a process with threads)
+#   RoleThread(camera, "camera"): the methods of an object run in a thread of their own with the role
+#   python3 odroid_scheduling.py        prints the policy and the cores of this computer
+#   python3 odroid_benchmark.py --acks 500 --load 6    latency of the move acknowledgements with / without it
+
+## functions:
+
+# load_policy           policy of scheduling.json merged with the default one
+# policy                policy of the process (read once)
+# apply                 cores and priority of a role given to the calling thread (or to a pid)
+# RoleThread            an object whose methods run in a thread that has the cores and priority of a role
+# main                  prints the policy
+
+
+######################
+## import modules ####
+######################
+
+import json                             # policy file
+import os                               # affinity and priority
+from concurrent.futures import ThreadPoolExecutor   # thread of a role
+from pathlib import Path                # policy file
+
+
+SCHEDULING_CONF = Path("/home/dlg/Documents/python") / "scheduling.json"
+
+# cores: allowed cores (those the computer does not have are left out), nice: -20 to 19,
+# realtime: SCHED_FIFO priority 1 to 99 (replaces nice when it can be set)
+DEFAULT_POLICY = {
+    "mount": {"cores": [2], "realtime": 20, "nice": -10},
+    "guiding": {"cores": [2], "realtime": 10, "nice": -10},
+    "camera": {"cores": [3], "nice": 0},
+    "solver": {"cores": [0, 1, 3, 4, 5], "nice": 10},
+}
+
+_policy = None
+
+
+######################
+####  functions  #####
+######################
+
+def load_policy(path=SCHEDULING_CONF):
+    """
+    {role: {"cores": [...], "nice": n, "realtime": p}}, the default policy if there is no file
+    raises ValueError if the file is not a json object of objects
+    """
+    merged = {role: dict(settings) for role, settings in DEFAULT_POLICY.items()}
+    if not Path(path).is_file():
+        return merged
+    with open(path) as file:
+        roles = json.load(file)
+    if not isinstance(roles, dict) or not all(isinstance(settings, dict) for settings in roles.values()):
+        raise ValueError("{}: expected {{role: {{cores, nice, realtime}}}}".format(path))
+    for role, settings in roles.items():
+        # an empty role is left to the kernel, otherwise it overrides the default keys it gives
+        merged[role] = dict(merged.get(role, {}), **settings) if settings else {}
+    return merged
+
+
+def policy():
+    global _policy
+    if _policy is None:
+        _policy = load_policy()
+    return _policy
+
+
+def apply(role, roles=None, pid=0):
+    """
+    cores and priority of the role given to pid (0: the calling thread), returns what could be set
+    {"cores": [...], "realtime": p or "nice": n}, a part that needs a permission this process lacks is left out
+    """
+    settings = (roles if roles is not None else policy()).get(role) or {}
+    applied = {}
+    if settings.get("cores") and hasattr(os, "sched_setaffinity"):
+        cores = set(settings["cores"]) & set(range(os.cpu_count() or 1))
+        if cores:
+            os.sched_setaffinity(pid, cores)
+            applied["cores"] = sorted(cores)
+    if settings.get("realtime") and hasattr(os, "sched_setscheduler"):
+        try:
+            os.sched_setscheduler(pid, os.SCHED_FIFO, os.sched_param(settings["realtime"]))
+            applied["realtime"] = settings["realtime"]
+        except PermissionError:
+            pass
+    elif settings and hasattr(os, "sched_setscheduler") and os.sched_getscheduler(pid) in (os.SCHED_FIFO, os.SCHED_RR):
+        # inherited from a real time thread: back to the normal policy so that nice applies (lowering
+        # the priority needs no permission)
+        os.sched_setscheduler(pid, os.SCHED_OTHER, os.sched_param(0))
+    if "realtime" not in applied and settings.get("nice") is not None:
+        try:
+            # on Linux the nice value of pid 0 is the one of the calling thread
+            os.setpriority(os.PRIO_PROCESS, pid, settings["nice"])
+            applied["nice"] = settings["nice"]
+        except PermissionError:
+            pass
+    return applied
+
+
+class RoleThread:
+    """
+    the object seen by the caller: its methods run one at a time in a thread that has the cores and
+    priority of the role and the caller waits for their result, its attributes are read and set directly
+    a thread does not give up a role it has taken (a raised nice needs CAP_SYS_NICE to come back): each
+    role gets its own thread instead
+    """
+
+    def __init__(self, target, role, roles=None):
+        object.__setattr__(self, "target", target)
+        object.__setattr__(self, "executor", ThreadPoolExecutor(max_workers=1, thread_name_prefix=role,
+                                                                initializer=apply, initargs=(role, roles)))
+
+    def __getattr__(self, name):
+        attribute = getattr(self.target, name)
+        if not callable(attribute):
+            return attribute
+        return lambda *args, **kwargs: self.executor.submit(attribute, *args, **kwargs).result()
+
+    def __setattr__(self, name, value):
+        setattr(self.target, name, value)
+
+
+######################
+######  main  ########
+######################
+
+def main():
+    print("policy file: {}{}".format(SCHEDULING_CONF, "" if SCHEDULING_CONF.is_file() else " (missing, default)"))
+    print("cores of this computer: {}".format(list(range(os.cpu_count() or 1))))
+    for role, settings in policy().items():
+        print("{:10s} {}".format(role, json.dumps(settings)))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,404 +1,515 @@
 #!/usr/bin/env python3
 
 ## about this script
-# manual control of the Dobson : 
-#       focus, 
+# manual control of the Dobson :
+#       focus,
 #       steppers Az and Alt
 #       sensors
+#       temperature compensation of the focus (see odroid_focus_compensation.py)
+#       dew control: dew point, fans and heater (see odroid_dew.py)
+#       equatorial table: speed, limit switch, tracking time and time left (see odroid_eq_table.py)
+# this is only the view: the commands are sent by odroid_rocker.py (RockerController), which can be
+# used without the GUI. nothing is opened or displayed at import, main() builds the window
+# the window is displayed at once, the arduinos are opened in the background and again when they are
+# plugged (odroid_hotplug.py), HW check probes them again instead of relaunching the script
 
 ## functions:
-# hw_check                 verify if arduino is connected
-# get_sensors              send command to arduino and collect measurements
-# azimut and alt         send commands to arduino for stepper action           
+# humidity_color           green / orange / red font for a humidity value
+# DobsonControlGUI         window: focus, alt-az, sensors and equatorial table frames
+#   connect                enable or disable the buttons depending on the arduino and the table
+#   watch                  read the results of the background probes (odroid_hotplug.py)
+#   hw_check               probe the arduinos again
+#   get_sensors            request measurements (RockerController.sensors) and display them
+#   show_sensors           display sensor measurements
+#   move                   send commands to arduino for stepper action
+#   move_focus             send focus command (the controller keeps track of the focus position)
+#   log_focus_position     log focus position and temperatures, refit the steps per °C coefficient
+#   toggle_compensation    start / stop the temperature compensation of the focus
+#   compensate             periodic check of the temperature, sends focus corrections
+#   toggle_dew             start / stop the dew control (fans off and heater off when stopped)
+#   control_dew            periodic dew control, displays the dew point and the duties
+#   get_eq_table           request and display equatorial table telemetry
+#   set_eq_table_speed     send the speed typed in the entry field to the equatorial table
+#   reset_eq_table         to be pressed when the table has been rewound
+# main                     builds the window, then opens the serial lines in the background
 
 ######################
 ### import modules ###
 ######################
-import serial               # arduino communication
-import subprocess           # run bash command from python
-import json                 # handle ardiuno data
-#import time                 # look it's not used ??? check
 import tkinter as tk        # GUI
 from tkinter import ttk     # GUI
-from pathlib import Path    # check if file exist
+import datetime             # time of the focus corrections
+from pathlib import Path    # device nodes of the arduinos
+from odroid_arduino import ARDUINO_PORT, MountLink, open_arduino  # arduino Mega of the rocker
+from odroid_hotplug import HardwareMonitor          # open the arduinos in the background
+from odroid_rocker import RockerController          # moves, focus, sensors, compensation, table
+import odroid_eq_table                              # equatorial table arduino Uno
+from odroid_dew import DUTY_MAX, dew_point          # dew point of the intake air
+import odroid_scheduling as scheduling              # core and priority of the serial lines
+import odroid_trace as trace                        # timed spans of the serial commands (DOBSON_TRACE=file)
+from odroid_telemetry import open_store             # sensors, duties and spans kept on disk
 
 
 ######################
 ### GUI parameters ###
 ######################
-root = tk.Tk()
-root.title('DOBSON CONTROL')
 tk_bkgd='#cbc9cc'
-
-# . means default style all root elements
-s = ttk.Style()
-s.configure('.', background=tk_bkgd) 
-
-# background main window
-root['bg']=tk_bkgd
-
-# dimension and position
 window_width = 400
-window_height = 1000
 
-screen_width = root.winfo_screenwidth()
-screen_height = root.winfo_screenheight()
+compensation_interval = 120000    # ms between two temperature checks
+dew_interval = 60000              # ms between two updates of the fans and heater
 
-position_x = int(screen_width - window_width)
-position_y = 0
-
-root.geometry(f'{window_width}x{window_height}+{position_x}+{position_y}')
 
 ######################
 ### functions      ###
 ######################
 
-def hw_check():
-    """
-    kill and relaunch window
+def humidity_color(humidity):
     """
-    root.destroy()
-    subprocess.run(['python3','odroid_sensors_motors_gui.py'])
-    
-
-def get_sensors():
+    green below 80 %, orange up to 90 %, red above, black if the DHT22 could not be read (nan)
     """
-    request and receive arduino sensor measurements
-    update GUI with values when button 'refresh' is pressed
-    """
-    ser.write(bytes('Y','UTF-8'))
-    # check buffer, if 0 wait (pass = do nothing)
-    while (ser.inWaiting() == 0):
-      pass
-    # read line of data
-    serial = ser.readline()
-    # decode (removes \r\n )
-    output_string=serial.decode('utf-8')
-    # removes extra characters like line return
-    output_string=output_string.strip()
-    # append curly brackets so we can use the ouput as a dictionary
-    output_string="{" + output_string + "}"
-    # convert string to dictionary
-    output_dic=json.loads(output_string)
-
-    # color for h_intake according to value
-    if output_dic["h_intake"] < 80:
-      colorfont = "#20A904"
-    if output_dic["h_intake"] > 80 and output_dic["h_intake"] < 90:
-      colorfont = "#D78000"
-    if output_dic["h_intake"] > 90:
-      colorfont = "#C21200"
- 
-    if output_dic["h_eq_table"] < 80:
-      colorfont = "#20A904"
-    if output_dic["h_eq_table"] > 80 and output_dic["h_eq_table"] < 90:
-      colorfont = "#D78000"
-    if output_dic["h_eq_table"] > 90:
-      colorfont = "#C21200"
-
-    # parse data into tkinter grid
-    LM35_sensor.config(text=str(output_dic["temp"]) + " °C",background=tk_bkgd)
-    in_temp_sensor.config(text=str(output_dic["t_intake"]) + " °C",background=tk_bkgd)
-    out_temp_sensor.config(text=str(output_dic["t_outflow"]) + " °C",background=tk_bkgd)
-    in_humi_sensor.config(text=str(output_dic["h_intake"]) + " %",background=tk_bkgd, font='helvetica 15 bold', foreground=colorfont)
-    out_humi_sensor.config(text=str(output_dic["h_outflow"]) + " %",background=tk_bkgd)
-    
-    eq_table_temp_sensor.config(text=str(output_dic["t_eq_table"]) + " °C",background=tk_bkgd)
-    eq_table_humi_sensor.config(text=str(output_dic["h_eq_table"]) + " %",background=tk_bkgd, font='helvetica 15 bold', foreground=colorfont)
-
-    # get odroid own temperature value (soc=system on chip, skip ddr)
-    odroid_sensors = subprocess.getoutput("sensors -j")
-    odroid_sensors_json = json.loads(odroid_sensors)
-    odroid_soc_temp = odroid_sensors_json['soc_thermal-virtual-0']['temp1']['temp1_input']
-    odroid_temp_sensor.config(text=str(odroid_soc_temp) + " °C",background=tk_bkgd)
-
-
-# stepper action
-
-def azimut_plus_1():
-    ser.write(bytes('S','UTF-8'))
-
-def azimut_moins_1():
-    ser.write(bytes('X','UTF-8'))
-
-def azimut_plus_2():
-    ser.write(bytes('Z','UTF-8'))
-
-def azimut_moins_2():
-    ser.write(bytes('A','UTF-8'))
-
-def azimut_plus_3():
-    ser.write(bytes('V','UTF-8'))
-
-def azimut_moins_3():
-    ser.write(bytes('C','UTF-8'))
-
-
-# alt
-
-def alt_plus_1():
-    ser.write(bytes('I','UTF-8'))
-
-def alt_moins_1():
-    ser.write(bytes('H','UTF-8'))
+    if not humidity <= 100:
+        return "#000000"
+    if humidity < 80:
+        return "#20A904"
+    if humidity < 90:
+        return "#D78000"
+    return "#C21200"
+
+
+class DobsonControlGUI:
+
+    def __init__(self, root, rocker):
+        self.root = root
+        self.rocker = rocker
+        self.probed = set()         # arduinos whose first probe has answered
+        self.monitor = None         # HardwareMonitor
+        self.compensation_job = None    # pending root.after of the compensation
+        self.dew_job = None             # pending root.after of the dew control
+
+        root.title('DOBSON CONTROL')
+
+        # . means default style all root elements
+        s = ttk.Style()
+        s.configure('.', background=tk_bkgd)
+
+        # background main window
+        root['bg']=tk_bkgd
+
+        # dimension and position
+        screen_width = root.winfo_screenwidth()
+        screen_height = root.winfo_screenheight()
+
+        window_height = screen_height   # was 1000, the equatorial table frame needs a bit more
+
+        position_x = int(screen_width - window_width)
+        position_y = 0
+
+        root.geometry(f'{window_width}x{window_height}+{position_x}+{position_y}')
+
+        self.build_focus()
+        self.build_steppers()
+        self.build_sensors()
+        self.build_eq_table()
+
+        # GUI 7 columns
+        for column in range(7):
+            root.columnconfigure(column, weight=1)
+
+        self.info_label = ttk.Label(root, text="", anchor="n")
+        self.info_label.grid(column=0, row=19, columnspan=7, sticky=tk.N, padx=5, pady=5, ipadx=5,ipady=5)
+        self.info_label.configure(background=tk_bkgd)
+
+        self.hw_check_button = ttk.Button(root,text="HW check",command=self.hw_check)
+        self.hw_check_button.grid(column=0, row=20, columnspan=2, sticky=tk.E, padx=5, pady=5, ipadx=5,ipady=10)
+
+        self.quit_button = ttk.Button(root, text="QUIT",command=exit)
+        self.quit_button.grid(column=5, row=20, columnspan=2, sticky=tk.W, padx=5, pady=5, ipadx=5,ipady=10)
+
+    ######################
+    ###  widgets       ###
+    ######################
+
+    def build_focus(self):
+        # define frame for focus
+        frame_focus = ttk.LabelFrame(self.root,width=360, height=300, borderwidth=1, relief="groove", labelanchor='n', text=" FOCUS ")
+        frame_focus.grid(column=0, row=0, padx=20, pady=20, columnspan=7)
+
+        # 5 columns
+        for column in range(6):
+            frame_focus.columnconfigure(column, weight=1)
+
+        # widgets: <<< << < > >> >>> (T G B N F R)
+        self.focus_buttons = []
+        for column, (text, command) in enumerate([("<<<", 'T'), ("<<", 'G'), ("<", 'B'), (">", 'N'), (">>", 'F'), (">>>", 'R')]):
+            button = ttk.Button(frame_focus, text=text, command=lambda command=command: self.move_focus(command))
+            button.grid(column=column, row=0, sticky=tk.N, padx=8, pady=15, ipadx=5,ipady=5)
+            self.focus_buttons.append(button)
+
+        self.focus_log_button = ttk.Button(frame_focus, text="log focus",command=self.log_focus_position)
+        self.focus_log_button.grid(column=0, row=1, columnspan=2, sticky=tk.W, padx=8, pady=5, ipadx=5,ipady=5)
+
+        self.compensation_on = tk.BooleanVar(value=False)
+        self.compensation_check = ttk.Checkbutton(frame_focus, text="temp. comp.", variable=self.compensation_on, command=self.toggle_compensation)
+        self.compensation_check.grid(column=2, row=1, columnspan=2, sticky=tk.W, padx=8, pady=5)
+
+        self.coefficient_label = ttk.Label(frame_focus, text="coef: -", anchor="w")
+        self.coefficient_label.grid(column=4, row=1, columnspan=2, sticky=tk.W, padx=8, pady=5)
+
+    def build_steppers(self):
+        # define frame for steppers azimut and alt
+        frame_steppers = ttk.LabelFrame(self.root,width=360, height=300, borderwidth=1, relief="groove", labelanchor='n', text=" ALT - AZ CONTROL ")
+        frame_steppers.grid(column=0, row=1, padx=20, pady=20, columnspan=7)
+
+        # 7 columns
+        for column in range(7):
+            frame_steppers.columnconfigure(column, weight=1)
+
+        # widgets: text, arduino command, column, row
+        # alt +++ ++ + (U D I) in column 3 above, az --- -- - (C A X) and + ++ +++ (S Z V) on row 3,
+        # alt - -- --- (H E J) below
+        buttons = [("+++", 'U', 3, 0), ("++", 'D', 3, 1), ("+", 'I', 3, 2),
+                   ("---", 'C', 0, 3), ("--", 'A', 1, 3), ("-", 'X', 2, 3),
+                   ("+", 'S', 4, 3), ("++", 'Z', 5, 3), ("+++", 'V', 6, 3),
+                   ("-", 'H', 3, 4), ("--", 'E', 3, 5), ("---", 'J', 3, 6)]
+        self.move_buttons = []
+        for text, command, column, row in buttons:
+            button = ttk.Button(frame_steppers, text=text, command=lambda command=command: self.move(command))
+            button.grid(column=column, row=row, sticky=tk.W, padx=5, pady=5, ipadx=5,ipady=5)
+            self.move_buttons.append(button)
+
+    def build_sensors(self):
+        # define frame for sensors
+        frame_sensors = ttk.LabelFrame(self.root,width=360, height=400, borderwidth=1, relief="groove", labelanchor='n', text=" SENSORS ")
+        frame_sensors.grid(column=0, row=2, padx=20, pady=20, columnspan=7)
+        frame_sensors.grid_propagate(0) # forces width, which is ignored otherwise
+
+        # GUI 7 columns
+        for column in range(7):
+            frame_sensors.columnconfigure(column, weight=1)
+
+        # widgets (labels on column span 4, sensor values column span 3)
+
+        empty_label = ttk.Label(frame_sensors, text=" ", anchor="e")   # one line spacing
+        empty_label.grid(column=0, row=10, columnspan=4, sticky=tk.E, padx=0, pady=0)
+
+        self.sensor_values = {}
+        for row, (key, text) in enumerate([("temp", "Stepper driver temp (LM35): "),
+                                           ("t_eq_table", "Eq. table temp (DHT22): "),
+                                           ("t_intake", "Intake temp (DHT22): "),
+                                           ("t_outflow", "Outflow temp (DHT22): "),
+                                           ("h_eq_table", "Eq. table humidity (DHT22): "),
+                                           ("h_intake", "Intake humidity (DHT22): "),
+                                           ("h_outflow", "Outflow humidity (DHT22): "),
+                                           ("odroid", "Odroid temp (SOC): "),
+                                           ("dew_point", "Dew point (intake): "),
+                                           ("dew", "Fans / heater: ")], start=11):
+            label = ttk.Label(frame_sensors, text=text, anchor="e")
+            label.grid(column=0, row=row, columnspan=4, sticky=tk.E, padx=5, pady=5)
+            label.configure(background=tk_bkgd)
+            value = ttk.Label(frame_sensors, text="", anchor="w")
+            value.grid(column=5, row=row, columnspan=2, sticky=tk.W, padx=5, pady=5)
+            self.sensor_values[key] = value
+
+        self.dew_on = tk.BooleanVar(value=False)
+        self.dew_check = ttk.Checkbutton(frame_sensors, text="dew control", variable=self.dew_on, command=self.toggle_dew)
+        self.dew_check.grid(column=0, row=21, columnspan=4, sticky=tk.W, padx=8, pady=5)
+
+        self.refresh_button = ttk.Button(frame_sensors, text="refresh", command=self.get_sensors)
+        self.refresh_button.grid(column=5, row=21, columnspan=2, sticky=tk.W, padx=5, pady=5, ipadx=5,ipady=5)
+
+    def build_eq_table(self):
+        # define frame for equatorial table
+        frame_eq_table = ttk.LabelFrame(self.root,width=360, height=230, borderwidth=1, relief="groove", labelanchor='n', text=" EQ. TABLE ")
+        frame_eq_table.grid(column=0, row=3, padx=20, pady=10, columnspan=7)
+        frame_eq_table.grid_propagate(0) # forces width, which is ignored otherwise
+
+        frame_eq_table.columnconfigure(0, weight=1)
+        frame_eq_table.columnconfigure(1, weight=1)
+
+        self.eq_speed = tk.StringVar()
+
+        self.eq_values = {}
+        for row, (key, text) in enumerate([("state", "State: "), ("speed", "Speed: "), ("elapsed", "Tracking time: "),
+                                           ("left", "Time to end switch: "), ("temp", "Stepper driver temp (LM35): ")]):
+            label = ttk.Label(frame_eq_table, text=text, anchor="e")
+            label.grid(column=0, row=row, sticky=tk.E, padx=5, pady=3)
+            value = ttk.Label(frame_eq_table, text="", anchor="w")
+            value.grid(column=1, row=row, sticky=tk.W, padx=5, pady=3)
+            self.eq_values[key] = value
+
+        eq_speed_entry = ttk.Entry(frame_eq_table, textvariable=self.eq_speed, width=8)
+        eq_speed_entry.grid(column=0, row=5, sticky=tk.E, padx=5, pady=5)
+
+        self.eq_speed_button = ttk.Button(frame_eq_table, text="set speed", command=self.set_eq_table_speed)
+        self.eq_speed_button.grid(column=1, row=5, sticky=tk.W, padx=5, pady=5)
+
+        self.eq_reset_button = ttk.Button(frame_eq_table, text="rewound", command=self.reset_eq_table)
+        self.eq_reset_button.grid(column=1, row=5, sticky=tk.E, padx=5, pady=5)
+
+    def connect(self):
+        """
+        enable the buttons of what is connected, disable the others and display a message
+        """
+        if self.rocker.link is not None:
+            state = 'enabled'
+            self.info_label.config(text="", background=tk_bkgd)
+        else:
+            state = 'disabled'
+            text = "arduino not connected" if "arduino" in self.probed else "looking for arduino"
+            self.info_label.config(text=text, background=tk_bkgd, foreground='#FF0000', font='Helvetica 14 bold')
+        for button in [self.refresh_button, self.focus_log_button, self.compensation_check, self.dew_check] + self.move_buttons + self.focus_buttons:
+            button.configure(state=state)
+
+        # compensation only possible once a coefficient has been fitted from the focus log
+        if self.rocker.link is not None:
+            coefficient = self.rocker.coefficient()
+            if coefficient is None:
+                self.compensation_check.configure(state='disabled')
+            else:
+                self.coefficient_label.config(text="coef: {:.0f} steps/°C".format(coefficient), background=tk_bkgd)
+
+        # equatorial table (arduino Uno), independent from the rocker arduino
+        if self.rocker.table is None:
+            text = "table not connected" if "table" in self.probed else "looking for table"
+            self.eq_values["state"].config(text=text, background=tk_bkgd, foreground='#FF0000')
+            self.eq_speed_button.configure(state='disabled')
+            self.eq_reset_button.configure(state='disabled')
+        else:
+            self.eq_speed_button.configure(state='enabled')
+            self.eq_reset_button.configure(state='enabled')
+            self.eq_speed.set("{:.2f}".format(self.get_eq_table()["speed"]))
+
+    def watch(self, monitor, interval=200):
+        """
+        start the probes and read their results every interval ms (tkinter only from this thread)
+        """
+        self.monitor = monitor
+        monitor.start()
+        self.connect()
+        self.read_probes(interval)
+
+    def read_probes(self, interval):
+        found = self.monitor.poll()
+        for name, device in found:
+            self.probed.add(name)
+            if name == "arduino":
+                if self.rocker.link is not None:
+                    self.rocker.link.ser.close()
+                self.rocker.link = MountLink(device) if device is not None else None
+                if device is None:
+                    # the compensator holds the old serial line
+                    self.compensation_on.set(False)
+                    self.rocker.stop_compensation()
+                    # the dew control reads the sensors of the Mega: stopped as well (table fan off)
+                    self.dew_on.set(False)
+                    if self.dew_job is not None:
+                        self.root.after_cancel(self.dew_job)
+                        self.dew_job = None
+                    self.rocker.stop_dew()
+            elif name == "table":
+                if self.rocker.table is not None:
+                    self.rocker.table.ser.close()
+                self.rocker.table = device
+        if found:
+            self.connect()
+        self.root.after(interval, self.read_probes, interval)
+
+    def hw_check(self):
+        """
+        open the arduinos again (they are also opened when plugged)
+        """
+        self.info_label.config(text="checking hardware", background=tk_bkgd, foreground='#000000', font='Helvetica 11')
+        self.monitor.probe_all()
+
+    ######################
+    ###  callbacks     ###
+    ######################
+
+    def get_sensors(self):
+        """
+        request and receive arduino sensor measurements
+        update GUI with values when button 'refresh' is pressed
+        """
+        self.show_sensors(self.rocker.sensors())
+
+    def show_sensors(self, output_dic):
+
+        # parse data into tkinter grid
+        values = self.sensor_values
+        values["temp"].config(text=str(output_dic["temp"]) + " °C",background=tk_bkgd)
+        values["t_intake"].config(text=str(output_dic["t_intake"]) + " °C",background=tk_bkgd)
+        values["t_outflow"].config(text=str(output_dic["t_outflow"]) + " °C",background=tk_bkgd)
+        values["h_intake"].config(text=str(output_dic["h_intake"]) + " %",background=tk_bkgd, font='helvetica 15 bold', foreground=humidity_color(output_dic["h_intake"]))
+        values["h_outflow"].config(text=str(output_dic["h_outflow"]) + " %",background=tk_bkgd)
+
+        values["t_eq_table"].config(text=str(output_dic["t_eq_table"]) + " °C",background=tk_bkgd)
+        values["h_eq_table"].config(text=str(output_dic["h_eq_table"]) + " %",background=tk_bkgd, font='helvetica 15 bold', foreground=humidity_color(output_dic["h_eq_table"]))
+
+        values["odroid"].config(text=str(output_dic["odroid"]) + " °C",background=tk_bkgd)
+
+        dew = dew_point(output_dic["t_intake"], output_dic["h_intake"])
+        values["dew_point"].config(text="-" if dew is None else "{:.1f} °C".format(dew), background=tk_bkgd)
+        if "fan" in output_dic:
+            values["dew"].config(text="{:.0%} / {:.0%}".format(output_dic["fan"] / DUTY_MAX, output_dic["heater"] / DUTY_MAX), background=tk_bkgd)
+
+        if self.rocker.table is not None:
+            self.get_eq_table()
+
+    # equatorial table
+
+    def show_eq_table(self, status):
+        """
+        update GUI with the telemetry of the equatorial table
+        """
+        if status["stop_switch"]:
+            state = "stopped (end switch)"
+            colorfont = "#C21200"
+        elif status["running"]:
+            state = "tracking"
+            colorfont = "#20A904"
+        else:
+            state = "stopped"
+            colorfont = "#D78000"
+        self.eq_values["state"].config(text=state, background=tk_bkgd, foreground=colorfont)
+        self.eq_values["speed"].config(text="{:.2f} steps/s".format(status["speed"]), background=tk_bkgd)
+        self.eq_values["elapsed"].config(text=odroid_eq_table.format_duration(status["elapsed"]), background=tk_bkgd)
+        time_left = odroid_eq_table.time_to_end(status)
+        # orange when less than 10 min of tracking left
+        colorfont = "#D78000" if time_left < 600 else "#000000"
+        self.eq_values["left"].config(text=odroid_eq_table.format_duration(time_left), background=tk_bkgd, foreground=colorfont)
+        self.eq_values["temp"].config(text=str(status["temp"]) + " °C", background=tk_bkgd)
+        return status
+
+    def get_eq_table(self):
+        return self.show_eq_table(self.rocker.table_status())
+
+    def set_eq_table_speed(self):
+        try:
+            speed = float(self.eq_speed.get())
+        except ValueError:
+            self.info_label.config(text="speed must be a number", background=tk_bkgd, foreground='#FF0000', font='Helvetica 14 bold')
+            return
+        self.show_eq_table(self.rocker.set_table_speed(speed))
+
+    def reset_eq_table(self):
+        self.show_eq_table(self.rocker.reset_table())
+
+    # stepper action
+
+    def move(self, command):
+        self.rocker.move(command)
+
+    # focus
+
+    def move_focus(self, command):
+        self.rocker.focus(command)
+
+    # temperature compensation of the focus
+
+    def log_focus_position(self):
+        """
+        to be pressed once the telescope is well focused:
+        logs position and temperatures, refits the coefficient and restarts the compensation from here
+        """
+        try:
+            coefficient = self.rocker.log_focus()
+        except ValueError as error:
+            self.info_label.config(text=str(error), background=tk_bkgd, foreground='#FF0000', font='Helvetica 14 bold')
+            return
+        self.show_sensors(self.rocker.last_sensors)
+        if coefficient is None:
+            self.coefficient_label.config(text="coef: not enough data", background=tk_bkgd)
+            self.compensation_check.configure(state='disabled')
+            return
+        self.coefficient_label.config(text="coef: {:.0f} steps/°C".format(coefficient), background=tk_bkgd)
+        self.compensation_check.configure(state='enabled')
+
+    def toggle_compensation(self):
+        """
+        start or stop the periodic temperature check
+        """
+        # a check still pending from before is cancelled, otherwise unchecking and checking again within an
+        # interval would run two chains of checks
+        if self.compensation_job is not None:
+            self.root.after_cancel(self.compensation_job)
+            self.compensation_job = None
+        if self.compensation_on.get():
+            self.rocker.start_compensation()
+            self.show_sensors(self.rocker.last_sensors)
+            self.compensation_job = self.root.after(compensation_interval, self.compensate)
+        else:
+            self.rocker.stop_compensation()
+
+    def compensate(self):
+        """
+        refresh the sensors and send a focus correction if the temperature has drifted
+        """
+        self.compensation_job = None
+        if self.rocker.compensator is None:
+            return
+        steps = self.rocker.compensate()
+        self.show_sensors(self.rocker.last_sensors)
+        if steps:
+            self.info_label.config(text=datetime.datetime.now().strftime("%X") + " focus corrected by " + str(steps), background=tk_bkgd, foreground='#000000', font='Helvetica 11')
+        self.compensation_job = self.root.after(compensation_interval, self.compensate)
+
+    # dew control
+
+    def toggle_dew(self):
+        """
+        start or stop the periodic update of the fans and heater
+        """
+        # same as the compensation: one chain of updates at a time
+        if self.dew_job is not None:
+            self.root.after_cancel(self.dew_job)
+            self.dew_job = None
+        if self.dew_on.get():
+            self.rocker.start_dew()
+            self.control_dew()
+        else:
+            self.rocker.stop_dew()
+
+    def control_dew(self):
+        """
+        refresh the sensors, set the fans and heater from the dew point, display the margin
+        """
+        self.dew_job = None
+        if self.rocker.dew is None:
+            return
+        duties = self.rocker.dew_control()
+        if duties is None:
+            return
+        self.show_sensors(self.rocker.last_sensors)
+        if duties["margin"] is not None:
+            # the margin in red once the heater is needed
+            colorfont = "#C21200" if duties["heater"] else "#000000"
+            self.info_label.config(text="dew margin {:.1f} °C, heater {:.0%} (mean {:.0%})".format(
+                duties["margin"], duties["heater"] / DUTY_MAX, duties["heater_mean"] / DUTY_MAX),
+                background=tk_bkgd, foreground=colorfont, font='Helvetica 11')
+        self.dew_job = self.root.after(dew_interval, self.control_dew)
 
-def alt_plus_2():
-    ser.write(bytes('D','UTF-8'))
 
-def alt_moins_2():
-    ser.write(bytes('E','UTF-8'))
-
-def alt_plus_3():
-    ser.write(bytes('U','UTF-8'))
-
-def alt_moins_3():
-    ser.write(bytes('J','UTF-8'))
-
-
-# focus
-
-def focusplus():
-    ser.write(bytes('F','UTF-8'))
-
-def focusplusplus():
-    ser.write(bytes('R','UTF-8'))
-
-def focusmoins():
-    ser.write(bytes('G','UTF-8'))
-
-def focusmoinsmoins():
-    ser.write(bytes('T','UTF-8'))
-    
-def focusmoinsfine():
-    ser.write(bytes('B','UTF-8'))
-    
-def focusplusfine():
-    ser.write(bytes('N','UTF-8'))        
-
-
-    
 ######################
 ######  main  ########
 ######################
 
-# define frame for focus
-frame_focus = ttk.LabelFrame(root,width=360, height=300, borderwidth=1, relief="groove", labelanchor='n', text=" FOCUS ")
-frame_focus.grid(column=0, row=0, padx=20, pady=20, columnspan=7)
-
-# 5 columns
-frame_focus.columnconfigure(0, weight=1)
-frame_focus.columnconfigure(1, weight=1)
-frame_focus.columnconfigure(2, weight=1)
-frame_focus.columnconfigure(3, weight=1)
-frame_focus.columnconfigure(4, weight=1)
-frame_focus.columnconfigure(5, weight=1)
-
-# widgets
-focus_moinsmoins_button = ttk.Button(frame_focus, text="<<<",command=focusmoinsmoins)
-focus_moinsmoins_button.grid(column=0, row=0, sticky=tk.N, padx=8, pady=15, ipadx=5,ipady=5)
-
-focus_moins_button = ttk.Button(frame_focus, text="<<",command=focusmoins)
-focus_moins_button.grid(column=1, row=0, sticky=tk.N, padx=8, pady=15, ipadx=5,ipady=5)
-
-focus_moins_fine_button = ttk.Button(frame_focus, text="<",command=focusmoinsfine)
-focus_moins_fine_button.grid(column=2, row=0, sticky=tk.N, padx=8, pady=15, ipadx=5,ipady=5)
-
-
-focus_plus_fine_button = ttk.Button(frame_focus, text=">",command=focusplusfine)
-focus_plus_fine_button.grid(column=3, row=0, sticky=tk.N, padx=8, pady=15, ipadx=5,ipady=5)
-
-focus_plus_button = ttk.Button(frame_focus, text=">>",command=focusplus)
-focus_plus_button.grid(column=4, row=0, sticky=tk.N, padx=8, pady=15, ipadx=5,ipady=5)
-
-focus_plusplus_button = ttk.Button(frame_focus, text=">>>",command=focusplusplus)
-focus_plusplus_button.grid(column=5, row=0, sticky=tk.N, padx=8, pady=15, ipadx=5,ipady=5)
-
-
-# define frame for steppers azimut and alt 
-frame_steppers = ttk.LabelFrame(root,width=360, height=300, borderwidth=1, relief="groove", labelanchor='n', text=" ALT - AZ CONTROL ")
-frame_steppers.grid(column=0, row=1, padx=20, pady=20, columnspan=7)
-
-# 7 columns
-frame_steppers.columnconfigure(0, weight=1)
-frame_steppers.columnconfigure(1, weight=1)
-frame_steppers.columnconfigure(2, weight=1)
-frame_steppers.columnconfigure(3, weight=1)
-frame_steppers.columnconfigure(4, weight=1)
-frame_steppers.columnconfigure(5, weight=1)
-frame_steppers.columnconfigure(6, weight=1)
-
-# widgets
-
-alt_plus_3_button = ttk.Button(frame_steppers, text="+++",command=alt_plus_3)
-alt_plus_3_button.grid(column=3, row=0, sticky=tk.W, padx=5, pady=5, ipadx=5,ipady=5)
-
-alt_plus_2_button = ttk.Button(frame_steppers, text="++",command=alt_plus_2)
-alt_plus_2_button.grid(column=3, row=1, sticky=tk.W, padx=5, pady=5, ipadx=5,ipady=5)
-
-alt_plus_1_button = ttk.Button(frame_steppers, text="+",command=alt_plus_1)
-alt_plus_1_button.grid(column=3, row=2, sticky=tk.W, padx=5, pady=5, ipadx=5,ipady=5)
-
-azimut_moins_3_button = ttk.Button(frame_steppers, text="---",command=azimut_moins_3)
-azimut_moins_3_button.grid(column=0, row=3, sticky=tk.W, padx=5, pady=5, ipadx=5,ipady=5)
-
-azimut_moins_2_button = ttk.Button(frame_steppers, text="--",command=azimut_moins_2)
-azimut_moins_2_button.grid(column=1, row=3, sticky=tk.W, padx=5, pady=5, ipadx=5,ipady=5)
-
-azimut_moins_1_button = ttk.Button(frame_steppers, text="-",command=azimut_moins_1)
-azimut_moins_1_button.grid(column=2, row=3, sticky=tk.W, padx=5, pady=5, ipadx=5,ipady=5)
-
-
-azimut_plus_1_button = ttk.Button(frame_steppers, text="+",command=azimut_plus_1)
-azimut_plus_1_button.grid(column=4, row=3, sticky=tk.W, padx=5, pady=5, ipadx=5,ipady=5)
-
-azimut_plus_2_button = ttk.Button(frame_steppers, text="++",command=azimut_plus_2)
-azimut_plus_2_button.grid(column=5, row=3, sticky=tk.W, padx=5, pady=5, ipadx=5,ipady=5)
-
-azimut_plus_3_button = ttk.Button(frame_steppers, text="+++",command=azimut_plus_3)
-azimut_plus_3_button.grid(column=6, row=3, sticky=tk.W, padx=5, pady=5, ipadx=5,ipady=5)
-
-
-alt_moins_1_button = ttk.Button(frame_steppers, text="-",command=alt_moins_1)
-alt_moins_1_button.grid(column=3, row=4, sticky=tk.W, padx=5, pady=5, ipadx=5,ipady=5)
-
-alt_moins_2_button = ttk.Button(frame_steppers, text="--",command=alt_moins_2)
-alt_moins_2_button.grid(column=3, row=5, sticky=tk.W, padx=5, pady=5, ipadx=5,ipady=5)
-
-alt_moins_3_button = ttk.Button(frame_steppers, text="---",command=alt_moins_3)
-alt_moins_3_button.grid(column=3, row=6, sticky=tk.W, padx=5, pady=5, ipadx=5,ipady=5)
-
-
-# define frame for sensors
-frame_sensors = ttk.LabelFrame(root,width=360, height=330, borderwidth=1, relief="groove", labelanchor='n', text=" SENSORS ")
-frame_sensors.grid(column=0, row=2, padx=20, pady=20, columnspan=7)
-frame_sensors.grid_propagate(0) # forces width, which is ignored otherwise
-
-
-# GUI 7 columns
-frame_sensors.columnconfigure(0, weight=1)
-frame_sensors.columnconfigure(1, weight=1)
-frame_sensors.columnconfigure(2, weight=1)
-frame_sensors.columnconfigure(3, weight=1)
-frame_sensors.columnconfigure(4, weight=1)
-frame_sensors.columnconfigure(5, weight=1)
-frame_sensors.columnconfigure(6, weight=1)
-
-# widgets (labels on column span 4, sensor values column span 3)
-
-empty_label = ttk.Label(frame_sensors, text=" ", anchor="e")   # one line spacing
-empty_label.grid(column=0, row=10, columnspan=4, sticky=tk.E, padx=0, pady=0)
-
-LM35_label = ttk.Label(frame_sensors, text="Stepper driver temp (LM35): ", anchor="e")
-LM35_label.grid(column=0, row=11, columnspan=4, sticky=tk.E, padx=5, pady=5)
-LM35_label.configure(background=tk_bkgd)
-LM35_sensor = ttk.Label(frame_sensors, text="", anchor="w")
-LM35_sensor.grid(column=5, row=11, columnspan=2, sticky=tk.W, padx=5, pady=5)
-
-eq_table_temp_label = ttk.Label(frame_sensors, text="Eq. table temp (DHT22): ", anchor="e")
-eq_table_temp_label.grid(column=0, row=12, columnspan=4, sticky=tk.E, padx=5, pady=5)
-eq_table_temp_label.configure(background=tk_bkgd)
-eq_table_temp_sensor = ttk.Label(frame_sensors, text="", anchor="w")
-eq_table_temp_sensor.grid(column=5, row=12, columnspan=2, sticky=tk.W, padx=5, pady=5)
-
-in_temp_label = ttk.Label(frame_sensors, text="Intake temp (DHT22): ", anchor="e")
-in_temp_label.grid(column=0, row=13, columnspan=4, sticky=tk.E, padx=5, pady=5)
-in_temp_label.configure(background=tk_bkgd)
-in_temp_sensor = ttk.Label(frame_sensors, text="", anchor="w")
-in_temp_sensor.grid(column=5, row=13, columnspan=2, sticky=tk.W, padx=5, pady=5)
-
-out_temp_label = ttk.Label(frame_sensors, text="Outflow temp (DHT22): ", anchor="e")
-out_temp_label.grid(column=0, row=14, columnspan=4, sticky=tk.E, padx=5, pady=5)
-out_temp_label.configure(background=tk_bkgd)
-out_temp_sensor = ttk.Label(frame_sensors, text="", anchor="w")
-out_temp_sensor.grid(column=5, row=14, columnspan=2, sticky=tk.W, padx=5, pady=5)
-
-eq_table_humi_label = ttk.Label(frame_sensors, text="Eq. table humidity (DHT22): ", anchor="e")
-eq_table_humi_label.grid(column=0, row=15, columnspan=4, sticky=tk.E, padx=5, pady=5)
-eq_table_humi_label.configure(background=tk_bkgd)
-eq_table_humi_sensor = ttk.Label(frame_sensors, text="", anchor="w")
-eq_table_humi_sensor.grid(column=5, row=15, columnspan=2, sticky=tk.W, padx=5, pady=5)
-
-in_humi_label = ttk.Label(frame_sensors, text="Intake humidity (DHT22): ", anchor="e")
-in_humi_label.grid(column=0, row=16, columnspan=4, sticky=tk.E, padx=5, pady=5)
-in_humi_label.configure(background=tk_bkgd)
-in_humi_sensor = ttk.Label(frame_sensors, text="", anchor="w")
-in_humi_sensor.grid(column=5, row=16, columnspan=2, sticky=tk.W, padx=5, pady=5)
-
-out_humi_label = ttk.Label(frame_sensors, text="Outflow humidity (DHT22): ",anchor="e")
-out_humi_label.grid(column=0, row=17, columnspan=4, sticky=tk.E, padx=5, pady=5)
-out_humi_label.configure(background=tk_bkgd)
-out_humi_sensor = ttk.Label(frame_sensors, text="", anchor="w")
-out_humi_sensor.grid(column=5, row=17, columnspan=2, sticky=tk.W, padx=5, pady=5)
-
-
-odroid_temp_label = ttk.Label(frame_sensors, text="Odroid temp (SOC): ",anchor="e")
-odroid_temp_label.grid(column=0, row=18, columnspan=4, sticky=tk.E, padx=5, pady=5)
-odroid_temp_label.configure(background=tk_bkgd)
-
-odroid_temp_sensor = ttk.Label(frame_sensors, text="", anchor="w")
-odroid_temp_sensor.grid(column=5, row=18, columnspan=2, sticky=tk.W, padx=5, pady=5)
-
-
-
-refresh_button = ttk.Button(frame_sensors, text="refresh", command=get_sensors)
-refresh_button.grid(column=5, row=19, columnspan=2, sticky=tk.W, padx=5, pady=5, ipadx=5,ipady=5)
-
-
-
-
-# GUI 7 columns
-root.columnconfigure(0, weight=1)
-root.columnconfigure(1, weight=1)
-root.columnconfigure(2, weight=1)
-root.columnconfigure(3, weight=1)
-root.columnconfigure(4, weight=1)
-root.columnconfigure(5, weight=1)
-root.columnconfigure(6, weight=1)
-
-info_label = ttk.Label(root, text="", anchor="n")
-info_label.grid(column=0, row=19, columnspan=7, sticky=tk.N, padx=5, pady=5, ipadx=5,ipady=5)
-info_label.configure(background=tk_bkgd)
-
-
-
-hw_check = ttk.Button(root,text="HW check",command=hw_check)
-hw_check.grid(column=0, row=20, columnspan=2, sticky=tk.E, padx=5, pady=5, ipadx=5,ipady=10)
+def main():
+    trace.start_from_environment()
+    root = tk.Tk()
 
-quit_button = ttk.Button(root, text="QUIT",command=exit)
-quit_button.grid(column=5, row=20, columnspan=2, sticky=tk.W, padx=5, pady=5, ipadx=5,ipady=10)
+    # the commands of the buttons go to the serial lines from their own thread, with the core and priority
+    # of the mount: this thread (and what it starts) stays out of the real time policy
+    rocker = scheduling.RoleThread(RockerController(None, telemetry=open_store()), "mount")
+    gui = DobsonControlGUI(root, rocker)
 
-arduino_is_here = subprocess.getoutput('ls /dev/ttyACM0')  #not very pythonian but path is_file returned false
-
-
-if arduino_is_here == "/dev/ttyACM0":
-    # initialise serial connection (device, baud rate)
-    ser = serial.Serial('/dev/ttyACM0', 9600)
-    # clear the serial line (optional)
-    ser.flushInput()
-else:
-    info_label.config(text="arduino not connected", background=tk_bkgd, foreground='#FF0000', font='Helvetica 14 bold')
-    refresh_button.configure(state='disabled')
-    alt_moins_3_button.configure(state='disabled')
-    alt_moins_2_button.configure(state='disabled')
-    alt_moins_1_button.configure(state='disabled')
-    alt_plus_3_button.configure(state='disabled')
-    alt_plus_2_button.configure(state='disabled')
-    alt_plus_1_button.configure(state='disabled')
-    azimut_moins_3_button.configure(state='disabled')
-    azimut_moins_2_button.configure(state='disabled')
-    azimut_moins_1_button.configure(state='disabled')
-    azimut_plus_3_button.configure(state='disabled')
-    azimut_plus_2_button.configure(state='disabled')
-    azimut_plus_1_button.configure(state='disabled')
-    focus_moinsmoins_button.configure(state='disabled')
-    focus_moins_button.configure(state='disabled')
-    focus_plusplus_button.configure(state='disabled')
-    focus_plus_button.configure(state='disabled')
-    focus_plus_fine_button.configure(state='disabled')
-    focus_moins_fine_button.configure(state='disabled')
-   
+    # the window is displayed at once, the arduinos are opened in the background (the Uno takes 2 s)
+    gui.watch(HardwareMonitor({"arduino": (Path(ARDUINO_PORT).exists, lambda: open_arduino(timeout=None)),
+                               "table": (Path(odroid_eq_table.TABLE_PORT).exists, odroid_eq_table.open_eq_table)}))
 
-# the main loop keeps the window open
-root.mainloop()
+    # the main loop keeps the window open
+    root.mainloop()
 
 
+if __name__ == "__main__":
+    main()
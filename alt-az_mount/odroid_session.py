@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+
+## about this script
+# record and replay sessions of the pointing pipeline (odroid_pointing.py)
+#   recording: the mount, camera and solver objects are wrapped so that every command, frame
+#   and solver output is saved with its timestamp and duration, together with the calibrate and
+#   goto requests and their results. at the end the session is packed in one zip archive:
+#       events.jsonl        one json line per event
+#       frames/0001.png     frames in the order they were taken
+#   replay: calibrate() and go_to() run again with a simulated mount (no waiting), a camera that
+#   gives back the recorded frames and a solver that gives back the recorded solutions (or runs
+#   astap_cli again on the recorded frames with --resolve). results are compared with the recording
+#   so that a change of the pipeline that changes the pointing shows up on a laptop.
+#
+# usage: python3 odroid_session.py /home/dlg/Documents/python/sessions/20240301-213000.zip [--resolve]
+#
+# this replaces use_set_of_image() which copied /home/dlg/ekos/M45png/M45-<n>.png over calibration_image.png
+
+## functions:
+
+# SessionRecorder       writes events and frames of a session, packs them in a zip archive
+# RecordingMount        wraps the mount, records each command
+# RecordingCamera       wraps the camera, records each frame
+# RecordingSolver       wraps the solver, records each solution
+# load_session          reads the events of an archive
+# SimulatedMount        accepts commands at full speed, checks them against the recording
+# ReplayCamera          returns the recorded frames in order
+# ReplaySolver          returns the recorded solutions in order (or solves the frames again)
+# recorded_slew         a recorded goto moved with a slew (m command) rather than custom moves
+# replay                runs all recorded calibrate / goto requests again, returns results and differences
+
+
+######################
+## import modules ####
+######################
+
+import argparse                         # command line
+import datetime                         # name of the session
+import json                             # events
+import shutil                           # copy frames, pack archive
+import sys                              # exit code of the replay
+import tempfile                         # frames extracted for the replay
+import zipfile                          # session archive
+from pathlib import Path                # session directory
+from time import monotonic              # timestamps and durations
+import odroid_motion as motion          # limits of a recorded slew
+import odroid_pointing as pointing      # calibrate and go_to
+from odroid_solver import IMAGE_DIR, AstapSolver
+
+
+SESSION_DIR = IMAGE_DIR / "sessions"
+
+
+class ReplayError(Exception):
+    """
+    the pipeline asked for more frames, solutions or moves than recorded
+    """
+
+
+######################
+####  recording  #####
+######################
+
+class SessionRecorder:
+    """
+    record(kind, **data) appends an event, add_frame(path) keeps a copy of a frame
+    close() packs everything in <session>.zip and returns its path
+    """
+
+    def __init__(self, directory=SESSION_DIR, name=None):
+        name = name or datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+        self.path = Path(directory) / name
+        (self.path / "frames").mkdir(parents=True, exist_ok=True)
+        self.events = open(self.path / "events.jsonl", "a")
+        self.start = monotonic()
+        self.frames = 0
+
+    def record(self, kind, **data):
+        event = {"kind": kind, "t": round(monotonic() - self.start, 4),
+                 "time": datetime.datetime.now().isoformat(timespec="milliseconds")}
+        event.update(data)
+        self.events.write(json.dumps(event) + "\n")
+        self.events.flush()
+
+    def add_frame(self, path, **data):
+        self.frames += 1
+        name = "frames/{:04d}{}".format(self.frames, Path(path).suffix)
+        shutil.copyfile(path, self.path / name)
+        self.record("frame", file=name, **data)
+        return name
+
+    def close(self):
+        self.events.close()
+        archive = self.path.with_suffix(".zip")
+        # png frames are already compressed
+        with zipfile.ZipFile(archive, "w", zipfile.ZIP_STORED) as z:
+            for file in sorted(self.path.rglob("*")):
+                if file.is_file():
+                    z.write(file, file.relative_to(self.path))
+        shutil.rmtree(self.path)
+        return archive
+
+
+class RecordingMount:
+
+    def __init__(self, mount, recorder):
+        self.mount = mount
+        self.recorder = recorder
+
+    def move(self, command):
+        start = monotonic()
+        answer = self.mount.move(command)
+        self.recorder.record("command", command=command, duration=monotonic() - start, answer=answer)
+        return answer
+
+    def move_steps(self, command, steps):
+        start = monotonic()
+        answer = self.mount.move_steps(command, steps)
+        self.recorder.record("command", command=command, steps=int(steps), duration=monotonic() - start, answer=answer)
+        return answer
+
+    def slew(self, *profile):
+        start = monotonic()
+        answer = self.mount.slew(*profile)
+        self.recorder.record("command", command="m", steps=[int(profile[0]), int(profile[1])],
+                             profile=[int(value) for value in profile[2:]], duration=monotonic() - start,
+                             answer=answer)
+        return answer
+
+    def settle(self, seconds):
+        self.mount.settle(seconds)
+        self.recorder.record("settle", seconds=seconds)
+
+
+class RecordingCamera:
+
+    def __init__(self, camera, recorder):
+        self.camera = camera
+        self.recorder = recorder
+
+    def capture(self):
+        start = monotonic()
+        path = self.camera.capture()
+        self.recorder.add_frame(path, duration=monotonic() - start)
+        return path
+
+
+class RecordingSolver:
+
+    def __init__(self, solver, recorder):
+        self.solver = solver
+        self.recorder = recorder
+
+    def solve(self, path, ra_hrs, spd):
+        start = monotonic()
+        solution = self.solver.solve(path, ra_hrs, spd)
+        self.recorder.record("solve", ra_hrs=ra_hrs, spd=spd, solution=solution, duration=monotonic() - start)
+        return solution
+
+
+######################
+####  replay  ########
+######################
+
+def load_session(archive):
+    """
+    returns the list of events of a session archive
+    """
+    with zipfile.ZipFile(archive) as z:
+        return [json.loads(line) for line in z.read("events.jsonl").decode("utf8").splitlines() if line]
+
+
+class SimulatedMount:
+    """
+    no waiting, each command is compared with the recorded one
+    """
+
+    def __init__(self, events):
+        self.recorded = [e for e in events if e["kind"] == "command"]
+        self.index = 0
+        self.mismatches = []
+
+    def check(self, command, steps=None):
+        if self.index >= len(self.recorded):
+            raise ReplayError("more moves than recorded")
+        expected = self.recorded[self.index]
+        self.index += 1
+        if expected["command"] != command or expected.get("steps") != steps:
+            self.mismatches.append({"expected": [expected["command"], expected.get("steps")], "got": [command, steps]})
+        return expected.get("answer")
+
+    def move(self, command):
+        return self.check(command)
+
+    def move_steps(self, command, steps):
+        return self.check(command, int(steps))
+
+    def slew(self, *profile):
+        # the steps are compared, the speeds depend on the limits of the computer that replays
+        return self.check("m", [int(profile[0]), int(profile[1])])
+
+    def settle(self, seconds):
+        pass
+
+
+class ReplayCamera:
+    """
+    frames are extracted from the archive when they are captured
+    """
+
+    def __init__(self, archive, events):
+        self.archive = zipfile.ZipFile(archive)
+        self.frames = [e["file"] for e in events if e["kind"] == "frame"]
+        self.index = 0
+        self.directory = tempfile.mkdtemp(prefix="dobson-replay-")
+
+    def capture(self):
+        if self.index >= len(self.frames):
+            raise ReplayError("more frames than recorded")
+        name = self.frames[self.index]
+        self.index += 1
+        return self.archive.extract(name, self.directory)
+
+    def close(self):
+        self.archive.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+class ReplaySolver:
+    """
+    recorded solutions in order, or solver.solve() on the recorded frames if a solver is given
+    """
+
+    def __init__(self, events, solver=None):
+        self.recorded = [e for e in events if e["kind"] == "solve"]
+        self.index = 0
+        self.solver = solver
+
+    def solve(self, path, ra_hrs, spd):
+        if self.index >= len(self.recorded):
+            raise ReplayError("more solutions than recorded")
+        recorded = self.recorded[self.index]
+        self.index += 1
+        if self.solver is not None:
+            return self.solver.solve(path, ra_hrs, spd)
+        if recorded["solution"] is None:
+            return None
+        return tuple(recorded["solution"])
+
+
+def differences(recorded, replayed):
+    """
+    keys of two result dictionaries whose values differ
+    """
+    return {key: [recorded[key], replayed.get(key)] for key in recorded if recorded[key] != replayed.get(key)}
+
+
+def recorded_slew(events, index):
+    """
+    the goto of events[index] was recorded with a slew (m command) rather than custom moves
+    """
+    for event in events[index + 1:]:
+        if event["kind"] in ("goto_result", "calibrate", "goto"):
+            return False
+        if event["kind"] == "command" and event["command"] == "m":
+            return True
+    return False
+
+
+def replay(archive, solver=None, mount=None, camera=None):
+    """
+    runs every recorded calibrate and goto request again
+    returns a list of dictionaries (operation, duration, recorded duration, differences)
+    and the list of commands that were not the recorded ones
+    """
+    events = load_session(archive)
+    mount = mount or SimulatedMount(events)
+    camera = camera or ReplayCamera(archive, events)
+    replay_solver = ReplaySolver(events, solver)
+    results = []
+    try:
+        for index, event in enumerate(events):
+            if event["kind"] not in ("calibrate", "goto"):
+                continue
+            # the result is the next event of the matching kind
+            result_kind = {"calibrate": "calibration", "goto": "goto_result"}[event["kind"]]
+            recorded = next((e for e in events[index + 1:] if e["kind"] == result_kind), None)
+            target = pointing.Target(*event["target"])
+            start = monotonic()
+            try:
+                if event["kind"] == "calibrate":
+                    calibration = pointing.calibrate(mount, camera, replay_solver, target)
+                    replayed = calibration._asdict()
+                else:
+                    calibration = pointing.Calibration(**event["calibration"])
+                    # the moves of the recording (slew or custom moves), not the limits file of this computer
+                    limits = motion.DEFAULT_LIMITS if recorded_slew(events, index) else {}
+                    ra_img, dec_img, compared = pointing.go_to(mount, camera, replay_solver, calibration, target,
+                                                               event["stepper_az"], event["stepper_vc"],
+                                                               pointing.nothing, limits)
+                    replayed = dict(compared, ra_img=ra_img, dec_img=dec_img)
+            except (pointing.PointingError, ReplayError) as error:
+                replayed = {"error": str(error)}
+            duration = monotonic() - start
+            result = {"operation": event["kind"], "duration": duration,
+                      "recorded_duration": recorded["t"] - event["t"] if recorded else None,
+                      "differences": differences(recorded["result"], replayed) if recorded else {"missing": "no recorded result"}}
+            results.append(result)
+    finally:
+        if isinstance(camera, ReplayCamera):
+            camera.close()
+    return results, getattr(mount, "mismatches", [])
+
+
+######################
+######  main  ########
+######################
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="replay a recorded calibrate/goto session")
+    parser.add_argument("archive", help="session archive (.zip)")
+    parser.add_argument("--resolve", action="store_true", help="solve the recorded frames again with astap_cli")
+    args = parser.parse_args()
+
+    results, mismatches = replay(args.archive, AstapSolver() if args.resolve else None)
+    failed = bool(mismatches)
+    for result in results:
+        status = "OK" if not result["differences"] else "DIFFERENT"
+        failed = failed or bool(result["differences"])
+        recorded = result["recorded_duration"]
+        print("{:10s} {:9s} replay {:7.3f} s   recorded {}".format(
+            result["operation"], status, result["duration"], "{:7.1f} s".format(recorded) if recorded is not None else "-"))
+        for key, (before, after) in result["differences"].items():
+            print("    {}: {} -> {}".format(key, before, after))
+    for mismatch in mismatches:
+        print("command mismatch: expected {expected} got {got}".format(**mismatch))
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+
+## about this script
+# image capture (ZWO ASI) and plate solving (astap_cli) without any GUI
+# used by odroid_solve_and_goto_gui.py and by the background loops (table drift, ...)
+
+## functions:
+
+# camera_connected      True if zwo-asi-print finds a camera
+# capture_frame         takes image with the zwo camera, saves it as png and returns it as an array
+# capture_image         takes image with the zwo camera and saves it as png
+# parse_solution        extract ra and dec (degrees) from the output of astap_cli
+# solve_image           runs astap_cli around a hint position, returns ra and dec in degrees
+# ZwoCamera             camera object used by odroid_pointing.py, gives the frames to its listeners
+# AstapSolver           solver object used by odroid_pointing.py, solves a small prepared FITS of the last
+#                           frame of the camera when it has it (odroid_image.prepare_frame)
+
+
+######################
+## import modules ####
+######################
+
+import subprocess                       # run astap_cli
+from time import sleep                  # let the image file be written
+from pathlib import Path                # image and camera configuration paths
+import odroid_scheduling as scheduling  # cores and priority of astap_cli
+import odroid_trace as trace            # timed spans of captures and solves
+from odroid_image import prepare_frame, write_fits
+
+
+IMAGE_DIR = Path("/home/dlg/Documents/python")
+CAMERA_CONF = IMAGE_DIR / "zwo_asi.toml"
+CALIBRATION_IMAGE = IMAGE_DIR / "calibration_image.png"
+# cropped and binned frame given to astap_cli
+SOLVE_IMAGE = IMAGE_DIR / "solve_image.fits"
+ASTAP_DATABASE = "/opt/astap"
+
+
+######################
+####  functions  #####
+######################
+
+def hms_dms_dd(ra, dec, delimiter=" "):
+    """Convert from HMS; DMS to DD.
+    # source: https://gist.github.com/Sunmish/08df2cb5ed7cd34ef786218ac727d86c
+    Examples:
+    >>> ra, dec = hms_dms_dd("00h59m59.3s", "-00d00m01.01s")
+    >>> ra, dec
+    (14.997083333333332, -0.00028055555555555554)
+    >>> ra, dec = hms_dms_dd("23 59 59", "+56 00 00")
+    >>> ra, dec
+    (359.99583333333334, 56.0)
+    >>> ra, dec = hms_dms_dd("24:30:00", "+90:00:00")
+    >>> ra, dec
+    (7.5, 90.0)
+    """
+    try:
+        ra_dd, dec_dd = float(ra), float(dec)
+
+    except ValueError:
+
+        if ":" in ra:
+            delimiter = ":"
+        elif "h" in ra:
+            ra  = ra.replace("h", " ").replace("m", " ").replace("s", " ")
+            dec = dec.replace("d", " ").replace("m", " ").replace("s", " ")
+
+        ra, dec = ra.split(delimiter), dec.split(delimiter)
+
+        # RA:
+        ra_hours_dd = float(ra[0]) * 15.
+        ra_minutes_dd = float(ra[1]) * 15. / 60.
+        ra_seconds_dd = float(ra[2]) * 15. / 3600.
+        ra_dd = ra_hours_dd + ra_minutes_dd + ra_seconds_dd
+        if ra_dd >= 360.:
+            ra_dd = abs(ra_dd  - 360.)
+
+        # DEC:
+        if "-" in dec[0]:
+            dec_dd = float(dec[0]) - (float(dec[1]) / 60.) - (float(dec[2]) / 3600.)
+        else:
+            dec_dd = float(dec[0]) + (float(dec[1]) / 60.) + (float(dec[2]) / 3600.)
+
+    return ra_dd, dec_dd
+
+
+def camera_connected():
+    """
+    zwo-asi-print lists the connected cameras and prints nothing if there is none
+    """
+    try:
+        return bool(subprocess.check_output("zwo-asi-print"))
+    except (OSError, subprocess.CalledProcessError):
+        return False
+
+
+def capture_frame(filepath=CALIBRATION_IMAGE, conf_path=CAMERA_CONF):
+    """ takes image and saves it as png, returns the path and the frame (numpy array, None if the
+    library gives no image back)
+    credits: https://pypi.org/project/camera-zwo-asi/#description
+    """
+    # imported here so that solving can be used on a computer without the camera library
+    import camera_zwo_asi
+
+    with trace.span("camera.capture", file=str(filepath)):
+        # just one camera = index 0
+        with trace.span("camera.open"):
+            camera = camera_zwo_asi.Camera(0)
+            # use configuration in file (exposure 100000 pour 10, gain 100, binning 4, size half/full)
+            camera.configure_from_toml(conf_path)
+        image = camera.capture(filepath=filepath, show=False)
+    return filepath, image.get_image() if hasattr(image, "get_image") else None
+
+
+def capture_image(filepath=CALIBRATION_IMAGE, conf_path=CAMERA_CONF):
+    """ takes image and saves it as png, returns the path
+    """
+    return capture_frame(filepath, conf_path)[0]
+
+
+def parse_solution(answer):
+    """
+    the solution is on the 2nd or 3rd line from last, so find the line that contains "Solution found"
+    it looks like this: "Solution found: 00: 42  49.4 +41d 19  13"
+    returns ra,dec in degrees, or None if astap did not find a solution
+    """
+    solution = None
+    for line in answer.split('\n'):
+        if 'Solution found' in line:
+            solution = line
+    if solution is None:
+        return None
+
+    # remove Solution found, extra spaces, : and d
+    solution = solution.replace('Solution found','')
+    solution = " ".join(solution.split())
+    solution = solution.replace(':','')
+    solution = solution.replace('d','')
+    solution = solution.split()
+
+    ra_img_raw = " ".join(solution[0:3])
+    dec_img_raw = " ".join(solution[3:6])
+    return hms_dms_dd(ra_img_raw, dec_img_raw)
+
+
+def solve_image(filename, ra_hrs, spd, radius=15, fov=0.5):
+    """
+    get image coordinates (solving)
+    example from bash for M15: astap -f '/home/dlg/ekos/DONE/M15/Light_011.fits' -ra 21 -spd 102 -r 10 -fov 0.5
+    to make it faster, use astap_cli and give it the target coordinates (ra in hours, south pole distance
+    = dec + 90 in degrees), a search radius in degrees and the field of view.
+    astap can take png as well as fits
+    source: https://www.hnsky.org/astap.htm#astap_command_line
+    returns ra,dec in degrees, or None if not solved
+    """
+    with trace.span("solver.astap", file=str(filename), ra_hrs=ra_hrs, spd=spd, radius=radius, fov=fov) as s:
+        # an argument list, no shell: the path is given as it is, whatever its quotes or $
+        # astap_cli exits with an error code when it cannot solve, its output says so
+        proc = subprocess.Popen(["astap_cli", "-f", str(filename), "-ra", str(ra_hrs), "-spd", str(spd),
+                                 "-r", str(radius), "-d", str(ASTAP_DATABASE), "-fov", str(fov)],
+                                stdout=subprocess.PIPE, encoding="utf8")
+        try:
+            # astap_cli on the cores of the solver, off the core of the mount, and out of the real time
+            # policy of the thread that started it (odroid_scheduling.py), before it starts its threads
+            scheduling.apply("solver", pid=proc.pid)
+        except ProcessLookupError:
+            pass                            # already finished
+        answer, _ = proc.communicate()
+        solution = parse_solution(answer)
+        s["solved"] = solution is not None
+    return solution
+
+
+class ZwoCamera:
+    """
+    capture() takes an image and returns its path (always the same file)
+    listeners: callables listener(frame, path) given each frame before the file is overwritten by the next
+    one (live stacking, frame store), they must return quickly
+    start_listeners: callables called with no argument when a capture starts: the path does not change,
+    what they kept of the previous frame must not be taken for this one (the library may give no frame back)
+    """
+
+    def __init__(self, filepath=CALIBRATION_IMAGE, conf_path=CAMERA_CONF):
+        self.filepath = filepath
+        self.conf_path = conf_path
+        self.listeners = []
+        self.start_listeners = []
+
+    def capture(self):
+        for listener in list(self.start_listeners):
+            listener()
+        _, frame = capture_frame(self.filepath, self.conf_path)
+        if frame is not None:
+            for listener in list(self.listeners):
+                listener(frame, self.filepath)
+        with trace.span("camera.write_wait"):
+            sleep(1)
+        return self.filepath
+
+
+class AstapSolver:
+    """
+    solve(path, ra_hrs, spd) returns ra,dec in degrees, or None
+    fov is the height of the full frame in degrees
+    listener(frame, path) is a camera listener (ZwoCamera): when the image to solve is the last frame
+    of the camera, astap_cli is given the central roi of it, binned and without hot pixels
+    (odroid_image.prepare_frame) with its own field of view, instead of the full png
+    forget() is a start listener of the camera: a capture without frame is solved from its file
+    """
+
+    def __init__(self, radius=15, fov=0.5, roi=1.0, binning=None, bayer=True, prepared_path=SOLVE_IMAGE):
+        self.radius = radius
+        self.fov = fov
+        self.roi = roi
+        self.binning = binning          # None: binned down to odroid_image.SOLVE_SIZE
+        self.bayer = bayer              # raw frames of the ASI294MC
+        self.prepared_path = prepared_path
+        self.frame = None
+        self.frame_path = None
+
+    def listener(self, frame, path):
+        # only kept: the frame is prepared if it is solved
+        self.frame = frame
+        self.frame_path = str(path)
+
+    def forget(self):
+        self.frame = None
+        self.frame_path = None
+
+    def solve(self, path, ra_hrs, spd):
+        if self.frame is None or self.frame_path != str(path):
+            return solve_image(path, ra_hrs, spd, self.radius, self.fov)
+        with trace.span("solver.prepare", roi=self.roi) as s:
+            prepared = prepare_frame(self.frame, self.roi, self.binning, bayer=self.bayer)
+            write_fits(self.prepared_path, prepared)
+            s["shape"] = list(prepared.shape)
+        # the frame is cropped to its central roi: the field of view is as much smaller
+        return solve_image(self.prepared_path, ra_hrs, spd, self.radius, self.fov * self.roi)
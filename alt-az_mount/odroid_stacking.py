@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+
+## about this script
+# live stacking: the frames taken for calibrate, go to or a live loop are stacked for a preview
+#   instead of being used only for their coordinates
+#   each frame is binned (2x2 by default, the luma of a raw bayer frame, odroid_image.py), registered on
+#   the first frame of the stack by phase correlation (shift of the star field, measured on a frame of at
+#   most REGISTER_SIZE pixels with a sub-pixel peak, rounded to stack pixels), then
+#   added to a running mean with sigma clipping: a pixel further than CLIP_SIGMA from the mean of the
+#   pixels stacked so far (satellite, plane, hot pixel that moves) is not added
+#   all the buffers are allocated once at the first frame: for an ASI294 frame (4144x2822) binned 2x2
+#   the stack holds about 90 MB whatever the number of frames, and the queue of the background
+#   stacker holds one frame: a frame that comes while the previous one is being stacked is dropped
+#   the field rotates on an alt-az mount: the stack is only sharp over a few minutes, and a frame that
+#   cannot be registered (after a go to) starts a new stack after RESTART_AFTER of them
+#
+# usage: see SolveAndGotoGUI (checkbox "live stack"), or
+#   stacker = BackgroundStacker(Stacker()); stacker.start(); camera.listeners.append(stacker.submit)
+
+## functions:
+
+# Stacker               registers and adds frames to a running mean with sigma clipping, preview
+# pgm                   8 bits preview as a PGM image (tkinter PhotoImage reads it without PIL)
+# BackgroundStacker     stacks in a thread the frames given by the camera listeners, bounded queue
+# live                  captures frames in a loop until stopped (the listeners stack them)
+
+
+######################
+## import modules ####
+######################
+
+import queue                            # one frame waiting at most
+import threading
+import numpy as np                      # stack buffers, fft
+from odroid_image import bin_frame
+import odroid_trace as trace            # timed spans of each frame stacked
+
+
+BINNING = 2
+CLIP_SIGMA = 3.0
+# pixels are clipped once this many frames are stacked
+CLIP_AFTER = 3
+# largest shift accepted, fraction of the frame
+MAX_SHIFT = 0.4
+# the registration fft is done on a frame binned again down to this size
+REGISTER_SIZE = 1024
+# peak of the phase correlation over its noise below which a frame is not registered
+MIN_PEAK = 8.0
+# frames that cannot be registered in a row before a new stack is started (the telescope moved)
+RESTART_AFTER = 2
+
+PREVIEW_SIZE = 480
+# stretch of the preview: percentiles of the stacked pixels shown black and white
+STRETCH = (1.0, 99.7)
+
+
+######################
+####  functions  #####
+######################
+
+class Stacker:
+    """
+    add(frame) registers the frame and adds it, returns its shift (dy, dx) in stack pixels or None
+    preview() returns an 8 bits image of the stack, at most PREVIEW_SIZE pixels wide
+    """
+
+    def __init__(self, binning=BINNING, clip_sigma=CLIP_SIGMA, max_shift=MAX_SHIFT):
+        self.binning = binning
+        self.clip_sigma = clip_sigma
+        self.max_shift = max_shift
+        self.lock = threading.Lock()    # add() in the stacking thread, preview() in the GUI thread
+        self.shape = None
+        self.reset()
+
+    def reset(self):
+        """
+        the next frame starts a new stack (the buffers are kept)
+        """
+        self.frames = 0
+        self.rejected = 0
+        self.failed = 0                 # frames not registered in a row
+        self.reference = None           # spectrum of the first frame
+
+    def _allocate(self, shape):
+        self.shape = shape
+        self.factor = -(-max(shape) // REGISTER_SIZE)
+        self.small = np.empty((shape[0] // self.factor, shape[1] // self.factor), dtype=np.float32)
+        self.work = np.empty(shape, dtype=np.float32)
+        self.mean = np.zeros(shape, dtype=np.float32)
+        self.m2 = np.zeros(shape, dtype=np.float32)       # sum of squared differences (Welford)
+        self.count = np.zeros(shape, dtype=np.uint16)
+        self.delta = np.empty(shape, dtype=np.float32)
+        self.step = np.empty(shape, dtype=np.float32)
+        self.keep = np.empty(shape, dtype=bool)
+
+    def _spectrum(self, image):
+        small = bin_frame(image, self.factor, self.small)
+        small -= small.mean()
+        return np.fft.rfft2(small)
+
+    def register(self, image):
+        """
+        (dy, dx) in stack pixels such that image[y + dy, x + dx] is the reference at (y, x)
+        None if the correlation has no clear peak or the shift is too large
+        """
+        cross = self._spectrum(image)
+        cross *= np.conj(self.reference)
+        cross /= np.abs(cross) + 1e-12
+        correlation = np.fft.irfft2(cross, s=self.small.shape)
+        peak = int(correlation.argmax())
+        if correlation.flat[peak] < MIN_PEAK * correlation.std():
+            return None
+        py, px = np.unravel_index(peak, correlation.shape)
+        height, width = correlation.shape
+        shift = []
+        # parabola through the peak and its neighbours on each axis (the correlation wraps around)
+        for index, size, line in ((py, height, correlation[[py - 1, py, (py + 1) % height], px]),
+                                  (px, width, correlation[py, [px - 1, px, (px + 1) % width]])):
+            curvature = line[0] - 2 * line[1] + line[2]
+            offset = 0.5 * (line[0] - line[2]) / curvature if curvature < 0 else 0.0
+            # beyond half the frame the shift is negative
+            position = index + offset - (size if index > size // 2 else 0)
+            if abs(position) > self.max_shift * size:
+                return None
+            shift.append(int(round(position * self.factor)))
+        return tuple(shift)
+
+    def add(self, frame):
+        with trace.span("stack.add") as s, self.lock:
+            shape = (frame.shape[0] // self.binning, frame.shape[1] // self.binning)
+            if shape != self.shape:
+                self._allocate(shape)
+                self.reset()
+            image = bin_frame(frame, self.binning, self.work)
+
+            if self.reference is None:
+                shift = (0, 0)
+            else:
+                shift = self.register(image)
+            if shift is None:
+                self.failed += 1
+                self.rejected += 1
+                s["registered"] = False
+                if self.failed < RESTART_AFTER:
+                    return None
+                # the telescope moved: this frame starts a new stack
+                self.reset()
+                shift = (0, 0)
+            if self.reference is None:
+                self.reference = self._spectrum(image)
+                self.count.fill(0)
+                self.mean.fill(0)
+                self.m2.fill(0)
+            self.failed = 0
+            self._accumulate(image, *shift)
+            self.frames += 1
+            s["frames"] = self.frames
+            return shift
+
+    def _accumulate(self, image, dy, dx):
+        """
+        running mean and variance (Welford) of the overlap, pixels beyond clip_sigma are left out
+        """
+        height, width = self.shape
+        rows = slice(max(0, -dy), height - max(0, dy))
+        columns = slice(max(0, -dx), width - max(0, dx))
+        source = image[max(0, dy):height + min(0, dy), max(0, dx):width + min(0, dx)]
+        mean, m2, count = self.mean[rows, columns], self.m2[rows, columns], self.count[rows, columns]
+        delta = self.delta[:source.shape[0], :source.shape[1]]
+        step = self.step[:source.shape[0], :source.shape[1]]
+        keep = self.keep[:source.shape[0], :source.shape[1]]
+
+        np.subtract(source, mean, out=delta)
+        if self.frames >= CLIP_AFTER:
+            # delta ** 2 <= clip_sigma ** 2 * m2 / (count - 1)
+            np.multiply(delta, delta, out=step)
+            step *= np.maximum(count, 2) - 1
+            np.less_equal(step, m2 * self.clip_sigma ** 2, out=keep)
+            keep |= count < CLIP_AFTER
+        else:
+            keep.fill(True)
+        count += keep
+        step.fill(0)
+        np.divide(delta, count, out=step, where=keep)
+        mean += step
+        np.subtract(source, mean, out=step)
+        step *= delta
+        step *= keep
+        m2 += step
+
+    def preview(self, max_size=PREVIEW_SIZE):
+        """
+        8 bits image of the stack (None before the first frame), square root stretch between percentiles
+        """
+        with self.lock:
+            if self.reference is None:
+                return None
+            step = -(-max(self.shape) // max_size)
+            image = self.mean[::step, ::step].copy()
+            stacked = self.count[::step, ::step] > 0
+        if not stacked.any():
+            return None
+        low, high = np.percentile(image[stacked], STRETCH)
+        image -= low
+        image /= max(high - low, 1e-6)
+        np.clip(image, 0, 1, out=image)
+        np.sqrt(image, out=image)
+        return (image * 255).astype(np.uint8)
+
+
+def pgm(image):
+    """
+    binary PGM of an 8 bits image, tk.PhotoImage(data=pgm(image)) displays it
+    """
+    return b"P5 %d %d 255\n" % (image.shape[1], image.shape[0]) + image.tobytes()
+
+
+class BackgroundStacker:
+    """
+    submit(frame, path) is a camera listener: it returns at once, the frame is stacked in a thread
+    at most one frame waits, dropped counts the frames that came while it was waiting
+    """
+
+    def __init__(self, stacker):
+        self.stacker = stacker
+        self.queue = queue.Queue(maxsize=1)
+        self.dropped = 0
+        self.thread = None
+        self.running = False
+
+    def submit(self, frame, path=None):
+        try:
+            self.queue.put_nowait(frame)
+        except queue.Full:
+            self.dropped += 1
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.run, name="stacker", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def run(self):
+        while self.running:
+            try:
+                frame = self.queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            self.stacker.add(frame)
+
+
+def live(camera, stop, interval=0.0):
+    """
+    capture() in a loop until the threading.Event stop is set, the camera listeners get the frames
+    """
+    while not stop.is_set():
+        with trace.span("stack.live_capture"):
+            camera.capture()
+        stop.wait(interval)
@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+
+## about this script
+# telemetry store: sensor values, dew duties, frame health and span durations kept on disk
+#   instead of being shown once in a label
+#   one directory per night (noon to noon, named after the evening), one file per series and per level:
+#       <series>.raw        12 bytes per sample (time float64, value float32), appended as they come
+#       <series>.60 .900 .3600  rollups: one record per minute / quarter / hour with min, max, sum, count
+#   the rollups are computed as the samples come (one bucket per level in memory) and appended when the
+#   bucket is over: a query reads the rollup of the right level, a few hundred records, never the
+#   samples ("humidity over the last 3 hours" reads 180 minute records, "solve time by night" reads the
+#   hourly records of each night)
+#   the files are not buffered: each record is one append, so the two GUIs and the remote server can
+#   write in the same store; the buckets being filled are written at close (merged at query time)
+#
+# usage:
+#   store = TelemetryStore(); store.record("h_intake", 87.5); record_spans(store)
+#   python3 odroid_telemetry.py                          (lists the series)
+#   python3 odroid_telemetry.py h_intake --hours 3       (humidity over the last 3 hours)
+#   python3 odroid_telemetry.py span.solver.astap --nights   (solve time by night)
+
+## functions:
+
+# night_of              name of the night of a timestamp (date of the evening)
+# TelemetryStore        appends samples and rollups, queries them by time range or by night
+# merge_rollups         rollups of one level with the same bucket merged (e.g. after a restart)
+# record_spans          keep the duration of every span (odroid_trace.py) as series span.<name>, at its end
+# open_store            store that keeps the spans, closed at exit (used by the GUIs and the remote server)
+# main                  command line queries
+
+
+######################
+## import modules ####
+######################
+
+import argparse                         # command line
+import atexit                           # buckets being filled written at exit
+import datetime                         # nights
+import threading                        # spans end in several threads
+import time                             # time of the samples
+from math import isnan                  # DHT22 returns nan when it could not be read
+from pathlib import Path                # store directory
+import numpy as np                      # binary records
+import odroid_trace as trace            # span durations
+
+
+TELEMETRY_DIR = Path("/home/dlg/Documents/python") / "telemetry"
+
+# seconds per bucket of each rollup level
+LEVELS = (60, 900, 3600)
+# a query returns at most this many records (the finest level that fits)
+MAX_POINTS = 500
+
+RAW_TYPE = np.dtype([("time", "<f8"), ("value", "<f4")])
+ROLLUP_TYPE = np.dtype([("time", "<f8"), ("min", "<f4"), ("max", "<f4"), ("sum", "<f8"), ("count", "<u4")])
+
+# a night starts at noon
+NIGHT_START_HOUR = 12
+
+# spans of each line read or written on the serial lines (odroid_trace.TracedSerial): one per empty read
+# while waiting for the arduino, kept in the trace but not in the store
+SERIAL_SPANS = (".readline", ".write")
+
+
+######################
+####  functions  #####
+######################
+
+def night_of(timestamp):
+    """
+    "2024-03-01" for the night from 2024-03-01 noon to 2024-03-02 noon (local time)
+    """
+    moment = datetime.datetime.fromtimestamp(timestamp) - datetime.timedelta(hours=NIGHT_START_HOUR)
+    return moment.strftime("%Y-%m-%d")
+
+
+def _night_range(start, end):
+    """
+    names of the nights between two timestamps
+    """
+    nights = []
+    day = datetime.datetime.fromtimestamp(start) - datetime.timedelta(hours=NIGHT_START_HOUR)
+    last = datetime.datetime.fromtimestamp(end) - datetime.timedelta(hours=NIGHT_START_HOUR)
+    while day.date() <= last.date():
+        nights.append(day.strftime("%Y-%m-%d"))
+        day += datetime.timedelta(days=1)
+    return nights
+
+
+class TelemetryStore:
+    """
+    record(series, value, timestamp) appends a sample, record_many(dict) several series at once
+    query(series, start, end) returns rollup records (time, min, max, mean, count) of the finest level
+    with at most MAX_POINTS records, nights(series) a summary per night
+    """
+
+    def __init__(self, directory=TELEMETRY_DIR):
+        self.directory = Path(directory)
+        self.lock = threading.Lock()
+        self.files = {}                 # (night, series, level) -> open file, level None for the samples
+        self.buckets = {}               # (series, level) -> [night, start, min, max, sum, count]
+        self.night = None
+
+    def _file(self, night, series, level):
+        key = (night, series, level)
+        if key not in self.files:
+            path = self._path(night, series, level)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self.files[key] = open(path, "ab", buffering=0)
+        return self.files[key]
+
+    def _path(self, night, series, level):
+        return self.directory / night / "{}.{}".format(series, "raw" if level is None else level)
+
+    def record(self, series, value, timestamp=None):
+        """
+        missing values (None, nan) are left out
+        """
+        if value is None or isnan(value):
+            return
+        timestamp = time.time() if timestamp is None else timestamp
+        night = night_of(timestamp)
+        sample = np.array([(timestamp, value)], dtype=RAW_TYPE)
+        with self.lock:
+            if night != self.night:
+                self._close_files()
+                self.night = night
+            self._file(night, series, None).write(sample.tobytes())
+            for level in LEVELS:
+                start = timestamp // level * level
+                bucket = self.buckets.get((series, level))
+                if bucket is not None and bucket[1] != start:
+                    self._write_bucket(series, level, bucket)
+                    bucket = None
+                if bucket is None:
+                    self.buckets[(series, level)] = [night, start, value, value, value, 1]
+                else:
+                    bucket[2] = min(bucket[2], value)
+                    bucket[3] = max(bucket[3], value)
+                    bucket[4] += value
+                    bucket[5] += 1
+
+    def record_many(self, values, timestamp=None, prefix=""):
+        """
+        every number of a dictionary (sensors, duties...), other values are left out
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        for key, value in values.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                self.record(prefix + key, value, timestamp)
+
+    def _write_bucket(self, series, level, bucket):
+        night, start, low, high, total, count = bucket
+        record = np.array([(start, low, high, total, count)], dtype=ROLLUP_TYPE)
+        self._file(night, series, level).write(record.tobytes())
+
+    def _close_files(self):
+        for file in self.files.values():
+            file.close()
+        self.files = {}
+
+    def close(self):
+        """
+        the buckets being filled are written as they are (a later record of the same bucket is merged
+        at query time)
+        """
+        with self.lock:
+            for (series, level), bucket in self.buckets.items():
+                self._write_bucket(series, level, bucket)
+            self.buckets = {}
+            self._close_files()
+
+    def series(self):
+        """
+        names of every series recorded, all nights
+        """
+        return sorted({path.name.rsplit(".", 1)[0] for path in self.directory.glob("*/*.raw")})
+
+    def _read(self, series, level, nights):
+        parts = []
+        for night in nights:
+            path = self._path(night, series, level)
+            if path.exists():
+                parts.append(np.fromfile(path, dtype=RAW_TYPE if level is None else ROLLUP_TYPE))
+        with self.lock:
+            # the bucket being filled, not on disk yet
+            bucket = self.buckets.get((series, level))
+            if level is not None and bucket is not None and bucket[0] in nights:
+                parts.append(np.array([tuple(bucket[1:])], dtype=ROLLUP_TYPE))
+        if not parts:
+            return np.empty(0, dtype=RAW_TYPE if level is None else ROLLUP_TYPE)
+        return np.concatenate(parts)
+
+    def query(self, series, start, end=None, points=MAX_POINTS):
+        """
+        records time (start of the bucket), min, max, mean, count between start and end (timestamps)
+        of the finest rollup level that gives at most points records
+        """
+        end = time.time() if end is None else end
+        level = next((level for level in LEVELS if (end - start) / level <= points), LEVELS[-1])
+        records = merge_rollups(self._read(series, level, _night_range(start, end)))
+        records = records[(records["time"] + level > start) & (records["time"] <= end)]
+        return _with_mean(records)
+
+    def raw(self, series, start, end=None):
+        """
+        samples (time, value) between start and end, read with a binary search in each night file
+        """
+        end = time.time() if end is None else end
+        parts = []
+        for night in _night_range(start, end):
+            path = self._path(night, series, None)
+            if not path.exists() or path.stat().st_size < RAW_TYPE.itemsize:
+                continue
+            samples = np.memmap(path, dtype=RAW_TYPE, mode="r")
+            if (np.diff(samples["time"]) < 0).any():
+                # two threads (or two processes) that record at the same moment may append out of order
+                samples = np.sort(samples, order="time", kind="stable")
+            first, last = np.searchsorted(samples["time"], [start, end], side="left")
+            parts.append(np.array(samples[first:last]))
+        return np.concatenate(parts) if parts else np.empty(0, dtype=RAW_TYPE)
+
+    def nights(self, series):
+        """
+        {night: (min, max, mean, count)} from the hourly rollups of each night
+        """
+        result = {}
+        # every night with samples, its last hour may still be in memory
+        for path in sorted(self.directory.glob("*/{}.raw".format(series))):
+            night = path.parent.name
+            records = self._read(series, LEVELS[-1], [night])
+            if len(records):
+                count = int(records["count"].sum())
+                result[night] = (float(records["min"].min()), float(records["max"].max()),
+                                 float(records["sum"].sum()) / count, count)
+        return result
+
+
+def merge_rollups(records):
+    """
+    records with the same bucket start merged into one, in time order
+    """
+    if len(records) < 2:
+        return records
+    records = np.sort(records, order="time", kind="stable")
+    starts = np.flatnonzero(np.r_[True, np.diff(records["time"]) != 0])
+    if len(starts) == len(records):
+        return records
+    merged = np.empty(len(starts), dtype=ROLLUP_TYPE)
+    merged["time"] = records["time"][starts]
+    merged["min"] = np.minimum.reduceat(records["min"], starts)
+    merged["max"] = np.maximum.reduceat(records["max"], starts)
+    merged["sum"] = np.add.reduceat(records["sum"], starts)
+    merged["count"] = np.add.reduceat(records["count"], starts)
+    return merged
+
+
+def _with_mean(records):
+    result = np.empty(len(records), dtype=[("time", "<f8"), ("min", "<f4"), ("max", "<f4"), ("mean", "<f4"),
+                                           ("count", "<u4")])
+    for key in ("time", "min", "max", "count"):
+        result[key] = records[key]
+    result["mean"] = records["sum"] / np.maximum(records["count"], 1)
+    return result
+
+
+def record_spans(store, tracer=trace.TRACER):
+    """
+    the duration in seconds of every span that ends goes to the series span.<name>, at the time it ends:
+    the spans end in that order (a span that holds another one ends after it), so the samples are appended
+    in time order. the serial line spans (SERIAL_SPANS) are left out
+    """
+    def listener(name, start, duration, attributes):
+        if name.endswith(SERIAL_SPANS):
+            return
+        store.record("span." + name, duration, start + duration)
+    tracer.listeners.append(listener)
+    return listener
+
+
+def open_store(directory=TELEMETRY_DIR):
+    """
+    store of the process: the spans go to it and it is closed at exit
+    """
+    store = TelemetryStore(directory)
+    record_spans(store)
+    atexit.register(store.close)
+    return store
+
+
+######################
+######  main  ########
+######################
+
+def main():
+    parser = argparse.ArgumentParser(description="query the telemetry store")
+    parser.add_argument("series", nargs="?", help="e.g. h_intake, span.solver.astap (none: list them)")
+    parser.add_argument("--hours", type=float, default=3, help="range of the query (default 3)")
+    parser.add_argument("--nights", action="store_true", help="one line per night")
+    parser.add_argument("--dir", default=TELEMETRY_DIR, help="store directory")
+    args = parser.parse_args()
+
+    store = TelemetryStore(args.dir)
+    if args.series is None:
+        print("\n".join(store.series()))
+        return
+    if args.nights:
+        print("{:<12} {:>10} {:>10} {:>10} {:>7}".format("night", "min", "max", "mean", "count"))
+        for night, (low, high, mean, count) in store.nights(args.series).items():
+            print("{:<12} {:>10.3f} {:>10.3f} {:>10.3f} {:>7}".format(night, low, high, mean, count))
+        return
+    print("{:<20} {:>10} {:>10} {:>10} {:>7}".format("time", "min", "max", "mean", "count"))
+    for record in store.query(args.series, time.time() - args.hours * 3600):
+        moment = datetime.datetime.fromtimestamp(record["time"]).strftime("%Y-%m-%d %H:%M:%S")
+        print("{:<20} {:>10.3f} {:>10.3f} {:>10.3f} {:>7}".format(moment, record["min"], record["max"],
+                                                                  record["mean"], record["count"]))
+
+
+if __name__ == "__main__":
+    main()
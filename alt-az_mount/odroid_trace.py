@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+
+## about this script
+# timed spans around the calls to the hardware and to the solver (serial commands, captures, solves, moves)
+# a span is: name, start, duration, thread and a few attributes (command, steps, file, ...)
+#   spans are kept in a ring buffer (the last 10000), nothing is written unless asked:
+#       DOBSON_TRACE=/tmp/goto.jsonl python3 odroid_solve_and_goto_gui.py     one json line per span, as they end
+#       DOBSON_TRACE=/tmp/goto.json  python3 odroid_solve_and_goto_gui.py     chrome trace written at exit
+#   a chrome trace opens in chrome://tracing or https://ui.perfetto.dev, nested spans show which step
+#   made a goto slow
+#   listeners(name, start, duration, attributes) are called as each span ends (wall time in seconds),
+#   e.g. to keep the durations in the telemetry store (odroid_telemetry.py)
+#
+# usage in the code:
+#       with trace.span("mount.move", command=command):
+#           ...
+#       @trace.traced("camera.capture")
+#       def capture(self): ...
+
+## functions:
+
+# Tracer                ring buffer of spans, optional jsonl file, listeners, export to jsonl or chrome trace
+# span                  context manager timing a block with the default tracer
+# traced                decorator timing a function with the default tracer
+# TracedSerial          serial line whose write and readline are spans
+# start_from_environment  writes the spans to the file given by DOBSON_TRACE
+# summary               count, total and max duration per span name
+
+
+######################
+## import modules ####
+######################
+
+import atexit                           # chrome trace written at exit
+import functools                        # traced decorator
+import json                             # jsonl and chrome trace
+import os                               # DOBSON_TRACE, pid
+import threading                        # thread of each span, lock of the jsonl file
+from collections import deque           # ring buffer
+from contextlib import contextmanager
+from time import perf_counter_ns, time_ns
+
+
+TRACE_VARIABLE = "DOBSON_TRACE"
+RING_SIZE = 10000
+
+
+class Tracer:
+    """
+    spans are tuples (name, start_ns, end_ns, thread, attributes), start and end from perf_counter_ns
+    wall time of a span = start_ns + offset_ns
+    """
+
+    def __init__(self, size=RING_SIZE):
+        self.spans = deque(maxlen=size)
+        self.enabled = True
+        self.offset_ns = time_ns() - perf_counter_ns()
+        self.file = None
+        self.lock = threading.Lock()
+        self.listeners = []
+
+    @contextmanager
+    def span(self, name, **attributes):
+        """
+        attributes can be added inside the block (e.g. the answer of the arduino): s["answer"] = answer
+        """
+        if not self.enabled:
+            yield attributes
+            return
+        start = perf_counter_ns()
+        try:
+            yield attributes
+        except BaseException as error:
+            attributes["error"] = type(error).__name__
+            raise
+        finally:
+            self.add(name, start, perf_counter_ns(), attributes)
+
+    def add(self, name, start_ns, end_ns, attributes=None):
+        record = (name, start_ns, end_ns, threading.get_ident(), attributes or {})
+        self.spans.append(record)
+        if self.file is not None:
+            line = json.dumps(self.as_dict(record), default=str)
+            with self.lock:
+                self.file.write(line + "\n")
+                self.file.flush()
+        for listener in list(self.listeners):
+            listener(name, (start_ns + self.offset_ns) / 1e9, (end_ns - start_ns) / 1e9, record[4])
+
+    def as_dict(self, record):
+        name, start_ns, end_ns, thread, attributes = record
+        return {"name": name, "start": (start_ns + self.offset_ns) / 1e9, "duration": (end_ns - start_ns) / 1e9,
+                "thread": thread, "attributes": attributes}
+
+    def open_jsonl(self, path):
+        """
+        append every span to a jsonl file as soon as it ends
+        """
+        self.file = open(path, "a")
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def export_jsonl(self, path):
+        with open(path, "w") as file:
+            for record in list(self.spans):
+                file.write(json.dumps(self.as_dict(record), default=str) + "\n")
+
+    def export_chrome(self, path):
+        """
+        chrome trace event format, complete events ("X") in microseconds
+        """
+        pid = os.getpid()
+        events = [{"name": name, "ph": "X", "ts": (start_ns + self.offset_ns) / 1000, "dur": (end_ns - start_ns) / 1000,
+                   "pid": pid, "tid": thread, "args": attributes}
+                  for name, start_ns, end_ns, thread, attributes in list(self.spans)]
+        with open(path, "w") as file:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file, default=str)
+
+    def summary(self):
+        """
+        {name: (count, total seconds, max seconds)}
+        """
+        result = {}
+        for name, start_ns, end_ns, thread, attributes in list(self.spans):
+            count, total, longest = result.get(name, (0, 0.0, 0.0))
+            duration = (end_ns - start_ns) / 1e9
+            result[name] = (count + 1, total + duration, max(longest, duration))
+        return result
+
+
+# default tracer, used by the other odroid modules
+TRACER = Tracer()
+
+
+def span(name, **attributes):
+    return TRACER.span(name, **attributes)
+
+
+def traced(name):
+    """
+    decorator: the whole function is a span
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with TRACER.span(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class TracedSerial:
+    """
+    serial line (pyserial) whose write and readline are spans, everything else is passed through
+    """
+
+    def __init__(self, ser, name="serial"):
+        self.ser = ser
+        self.name = name
+
+    def write(self, data):
+        with TRACER.span(self.name + ".write", data=data.decode("utf-8", "replace")):
+            return self.ser.write(data)
+
+    def readline(self):
+        with TRACER.span(self.name + ".readline") as s:
+            line = self.ser.readline()
+            s["line"] = line.decode("utf-8", "replace").strip()
+            return line
+
+    def __getattr__(self, name):
+        return getattr(self.ser, name)
+
+
+def start_from_environment(tracer=TRACER):
+    """
+    DOBSON_TRACE=file.jsonl: spans written as they end
+    DOBSON_TRACE=file.json:  chrome trace of the ring buffer written at exit
+    returns the file name or None
+    """
+    path = os.environ.get(TRACE_VARIABLE)
+    if not path:
+        return None
+    if path.endswith(".json"):
+        atexit.register(tracer.export_chrome, path)
+    else:
+        tracer.open_jsonl(path)
+        atexit.register(tracer.close)
+    return path
+
+
+def summary(tracer=TRACER):
+    return tracer.summary()
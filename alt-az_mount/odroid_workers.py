@@ -0,0 +1,399 @@
+#!/usr/bin/env python3
+
+## about this script
+# camera, solver and serial line of the mount in their own processes, watched by a supervisor
+#   in one process a capture (USB transfer, 23 MB frame), astap and the frame listeners hold the GIL
+#   between them and the Tk loop or the serial line of the mount wait: with the workers each stage has
+#   its own process (and its own cores and priority, odroid_scheduling.py) and the GUI or the remote server
+#   only waits on a queue
+#   the frames are not pickled: the camera worker writes each frame in a slot of a shared memory ring
+#   (FrameBuffer, FRAME_SLOTS frames) and sends the slot, the listeners of the GUI and the solver worker
+#   read the frame in place (a slot is valid until FRAME_SLOTS more frames have been captured)
+#   the requests and answers are small tuples on multiprocessing queues
+#   a worker that dies (segfault of the camera library, USB reset) or does not answer in time is started
+#   again: the call raises WorkerCrashed, the session goes on and the next call uses the new worker
+#
+# usage: DOBSON_WORKERS=1 python3 odroid_solve_and_goto_gui.py
+#        python3 odroid_remote.py --workers
+#   supervisor = Supervisor(); goto = GotoController(None, supervisor.camera(), supervisor.solver(), catalog)
+#   mount = supervisor.mount()      (None if the arduino is not connected)
+
+## functions:
+
+# WorkerCrashed         raised by a call whose worker died or timed out (it is started again)
+# FrameBuffer           ring of frame slots in shared memory
+# serve                 loop of a worker process: builds its object, answers the requests
+# Supervisor            starts the workers, sends them the calls, starts them again when they die
+# WorkerCamera          ZwoCamera interface: capture() in the camera worker, listeners in this process
+# WorkerSolver          AstapSolver interface: solve() in the solver worker, on the shared frame
+# WorkerMount           MountLink interface: every command in the mount worker
+# workers_enabled       DOBSON_WORKERS is set
+
+
+######################
+## import modules ####
+######################
+
+import atexit                           # workers stopped and frame slots removed at exit
+import itertools                        # request ids
+import multiprocessing                  # worker processes and queues
+import os                               # DOBSON_WORKERS
+import queue                            # timeout of the answers
+import threading                        # one call at a time per worker
+import time                             # call timeouts
+from multiprocessing import shared_memory   # frame slots
+import numpy as np                      # frames
+from odroid_arduino import ARDUINO_PORT, MountLink, open_arduino
+from odroid_solver import CALIBRATION_IMAGE, CAMERA_CONF, AstapSolver, ZwoCamera
+import odroid_scheduling as scheduling  # cores and priority of each worker
+import odroid_trace as trace            # timed spans of the calls
+
+
+WORKERS_VARIABLE = "DOBSON_WORKERS"
+
+# ring of frames: a raw 16 bits or a colour 8 bits frame of the ASI294MC fits in a slot
+FRAME_SLOTS = 3
+FRAME_BYTES = 4144 * 2822 * 3
+
+# s: start of a worker (imports, opening the device), longest call of each worker
+START_TIMEOUT = 30
+CALL_TIMEOUTS = {"camera": 60, "solver": 180, "mount": 300}
+# s between two checks that the worker is alive while waiting for its answer
+CHECK_INTERVAL = 0.5
+
+
+######################
+####  functions  #####
+######################
+
+class WorkerCrashed(RuntimeError):
+    pass
+
+
+class FrameBuffer:
+    """
+    FRAME_SLOTS slots of FRAME_BYTES in one shared memory block, created by the supervisor (name None)
+    and opened by name in the workers
+    put(frame) copies a frame in the next slot and returns (slot, shape, dtype), view(...) reads it in place
+    """
+
+    def __init__(self, name=None, slots=FRAME_SLOTS, slot_bytes=FRAME_BYTES):
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        if name is None:
+            self.memory = shared_memory.SharedMemory(create=True, size=slots * slot_bytes)
+        else:
+            # the workers share the resource tracker of the supervisor (spawn): the block is removed
+            # when the supervisor closes it, or by the tracker if the supervisor is killed
+            self.memory = shared_memory.SharedMemory(name=name)
+        self.owner = name is None
+        self.next_slot = 0
+
+    @property
+    def name(self):
+        return self.memory.name
+
+    def put(self, frame):
+        """
+        None if the frame does not fit in a slot
+        """
+        frame = np.asarray(frame)
+        if frame.nbytes > self.slot_bytes:
+            return None
+        slot = self.next_slot
+        self.next_slot = (slot + 1) % self.slots
+        np.copyto(self.view(slot, frame.shape, frame.dtype.str), frame)
+        return slot, frame.shape, frame.dtype.str
+
+    def view(self, slot, shape, dtype):
+        return np.ndarray(shape, dtype=dtype, buffer=self.memory.buf, offset=slot * self.slot_bytes)
+
+    def close(self):
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
+
+
+class _CameraWorker:
+    """
+    in the camera worker: ZwoCamera whose frames go to the shared slots
+    """
+
+    def __init__(self, frames_name, filepath=CALIBRATION_IMAGE, conf_path=CAMERA_CONF):
+        self.frames = FrameBuffer(frames_name)
+        self.camera = ZwoCamera(filepath, conf_path)
+        self.camera.listeners.append(self.listener)
+        self.frame = None
+
+    def listener(self, frame, path):
+        # a frame too large for a slot is sent through the queue (pickled)
+        self.frame = self.frames.put(frame) or np.asarray(frame)
+
+    def capture(self):
+        """
+        returns the path and (slot, shape, dtype) of the frame, or the frame, or None
+        """
+        self.frame = None
+        path = self.camera.capture()
+        return path, self.frame
+
+
+class _SolverWorker:
+    """
+    in the solver worker: AstapSolver given the frame of the shared slot
+    """
+
+    def __init__(self, frames_name, **options):
+        self.frames = FrameBuffer(frames_name)
+        self.solver = AstapSolver(**options)
+
+    def solve(self, path, ra_hrs, spd, frame=None):
+        if isinstance(frame, tuple):
+            self.solver.listener(self.frames.view(*frame), path)
+        elif frame is not None:
+            self.solver.listener(frame, path)
+        else:
+            # no frame for this capture: the file is solved, not the frame of a previous capture
+            self.solver.forget()
+        return self.solver.solve(path, ra_hrs, spd)
+
+
+def _open_mount(port=ARDUINO_PORT, timeout=.5):
+    ser = open_arduino(port, timeout)
+    return MountLink(ser) if ser is not None else None
+
+
+def serve(factory, args, kwargs, roles, name, requests, replies):
+    """
+    worker process: takes the cores and priority of its role, builds factory(*args, **kwargs), says if
+    it is ready, then answers (id, method, args) with (id, True, result) or (id, False, exception)
+    until it gets None
+    """
+    scheduling.apply(name, roles)
+    try:
+        target = factory(*args, **kwargs)
+    except Exception as error:              # device unplugged while opening, missing library...
+        print("worker: " + str(error))
+        target = None
+    replies.put(("ready", target is not None, None))
+    if target is None:
+        return
+    while True:
+        request = requests.get()
+        if request is None:
+            return
+        request_id, method, call_args = request
+        try:
+            replies.put((request_id, True, getattr(target, method)(*call_args)))
+        except Exception as error:
+            try:
+                replies.put((request_id, False, error))
+            except Exception:               # an exception that cannot be pickled
+                replies.put((request_id, False, RuntimeError(repr(error))))
+
+
+class _Worker:
+    """
+    a process, its queues and how to start it again
+    """
+
+    def __init__(self, name, factory, args, kwargs):
+        self.name = name
+        self.factory = factory
+        self.args = args
+        self.kwargs = kwargs
+        self.lock = threading.Lock()
+        self.process = None
+        self.requests = None
+        self.replies = None
+        self.restarts = 0
+
+
+class Supervisor:
+    """
+    camera(), solver(), mount() start a worker and return the object that the controllers use in its place
+    call(name, method, *args) runs target.method(*args) in the worker and returns the result, raises the
+    exception of the worker or WorkerCrashed (the worker is then started again)
+    """
+
+    def __init__(self, roles=None, timeouts=CALL_TIMEOUTS):
+        self.context = multiprocessing.get_context("spawn")
+        self.roles = scheduling.policy() if roles is None else roles
+        self.timeouts = timeouts
+        self.workers = {}
+        self.ids = itertools.count()
+        self.frames = FrameBuffer()
+        self.last_frame = (None, None)  # path and slot of the last frame of the camera worker
+        atexit.register(self.close)
+
+    def start(self, name, factory, *args, **kwargs):
+        """
+        starts the worker (stops the one of the same name), True if its object could be built
+        """
+        if name in self.workers:
+            self.stop(name)
+        worker = _Worker(name, factory, args, kwargs)
+        self.workers[name] = worker
+        return self._spawn(worker)
+
+    def _spawn(self, worker):
+        worker.requests = self.context.Queue()
+        worker.replies = self.context.Queue()
+        worker.process = self.context.Process(
+            target=serve, name="dobson-" + worker.name, daemon=True,
+            args=(worker.factory, worker.args, worker.kwargs, self.roles, worker.name, worker.requests,
+                  worker.replies))
+        with trace.span("workers.start", worker=worker.name) as s:
+            worker.process.start()
+            try:
+                _, ready, _ = worker.replies.get(timeout=START_TIMEOUT)
+            except queue.Empty:
+                ready = False
+            s["ready"] = ready
+        if not ready:
+            self._kill(worker)
+        return ready
+
+    def _kill(self, worker):
+        if worker.process.is_alive():
+            worker.process.terminate()
+        worker.process.join(timeout=5)
+
+    def restart(self, name):
+        worker = self.workers[name]
+        self._kill(worker)
+        worker.restarts += 1
+        return self._spawn(worker)
+
+    def call(self, name, method, *args, timeout=None):
+        worker = self.workers[name]
+        timeout = self.timeouts.get(name) if timeout is None else timeout
+        with worker.lock, trace.span("workers.call", worker=name, method=method):
+            if not worker.process.is_alive() and not self.restart(name):
+                raise WorkerCrashed("{} worker could not be started".format(name))
+            request_id = next(self.ids)
+            worker.requests.put((request_id, method, args))
+            start = time.monotonic()
+            while True:
+                try:
+                    reply_id, ok, result = worker.replies.get(timeout=CHECK_INTERVAL)
+                except queue.Empty:
+                    if not worker.process.is_alive():
+                        reason = "died (exit code {})".format(worker.process.exitcode)
+                    elif timeout is not None and time.monotonic() - start > timeout:
+                        reason = "did not answer in {} s".format(timeout)
+                    else:
+                        continue
+                    self.restart(name)
+                    raise WorkerCrashed("{} worker {} during {}, started again".format(name, reason, method))
+                if reply_id != request_id:
+                    continue
+                if not ok:
+                    raise result
+                return result
+
+    def stop(self, name):
+        worker = self.workers.pop(name, None)
+        if worker is None:
+            return
+        if worker.process.is_alive():
+            worker.requests.put(None)
+            worker.process.join(timeout=5)
+        self._kill(worker)
+
+    def close(self):
+        for name in list(self.workers):
+            self.stop(name)
+        if self.frames is not None:
+            self.frames.close()
+            self.frames = None
+
+    def camera(self, filepath=CALIBRATION_IMAGE, conf_path=CAMERA_CONF):
+        self.start("camera", _CameraWorker, self.frames.name, filepath, conf_path)
+        return WorkerCamera(self, filepath)
+
+    def solver(self, **options):
+        self.start("solver", _SolverWorker, self.frames.name, **options)
+        return WorkerSolver(self)
+
+    def mount(self, port=ARDUINO_PORT, timeout=.5):
+        """
+        None if the arduino is not connected
+        """
+        if not self.start("mount", _open_mount, port, timeout):
+            self.workers.pop("mount", None)
+            return None
+        return WorkerMount(self, self.workers["mount"])
+
+
+class WorkerCamera:
+    """
+    capture() returns the path of the frame taken by the camera worker, the listeners get the frame
+    in its shared slot (no copy)
+    """
+
+    def __init__(self, supervisor, filepath=CALIBRATION_IMAGE):
+        self.supervisor = supervisor
+        self.filepath = filepath
+        self.listeners = []
+        self.start_listeners = []
+
+    def capture(self):
+        for listener in list(self.start_listeners):
+            listener()
+        self.supervisor.last_frame = (None, None)
+        path, frame = self.supervisor.call("camera", "capture")
+        self.supervisor.last_frame = (str(path), frame)
+        if frame is not None:
+            if isinstance(frame, tuple):
+                frame = self.supervisor.frames.view(*frame)
+            for listener in list(self.listeners):
+                listener(frame, path)
+        return path
+
+
+class WorkerSolver:
+    """
+    solve(path, ra_hrs, spd) in the solver worker, given the slot of the frame when path is the last
+    frame of the camera worker (the worker prepares it, see odroid_solver.AstapSolver)
+    """
+
+    def __init__(self, supervisor):
+        self.supervisor = supervisor
+
+    def solve(self, path, ra_hrs, spd):
+        last_path, frame = self.supervisor.last_frame
+        frame = frame if last_path == str(path) else None
+        return self.supervisor.call("solver", "solve", path, ra_hrs, spd, frame)
+
+
+class WorkerMount:
+    """
+    MountLink commands run in the mount worker, settle waits here
+    ser.close() (what the GUIs do with the link of an arduino unplugged) stops the worker, unless the
+    arduino has been plugged again and a new worker already replaced it
+    """
+
+    def __init__(self, supervisor, worker):
+        self.supervisor = supervisor
+        self.worker = worker
+
+    @property
+    def ser(self):
+        return self
+
+    def close(self):
+        if self.supervisor.workers.get("mount") is self.worker:
+            self.supervisor.stop("mount")
+
+    def settle(self, seconds):
+        time.sleep(seconds)
+
+    def __getattr__(self, method):
+        if method.startswith("_"):
+            raise AttributeError(method)
+        return lambda *args: self.supervisor.call("mount", method, *args)
+
+
+def workers_enabled():
+    return bool(os.environ.get(WORKERS_VARIABLE))
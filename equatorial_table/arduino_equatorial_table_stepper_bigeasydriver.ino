@@ -14,6 +14,14 @@
 /////////// recode following changes //////////////// 
 // removed pot - set fixed speed
 // red LED ON = stopped, blink = running
+// serial commands from the Odroid (odroid_eq_table.py), 115200 baud, one command per line ending with \n:
+//   Y          telemetry
+//   V725.0     set tracking speed in steps/s
+//   R          reset position and tracking time (table has been rewound)
+//   D128       PWM duty of the fan (0-255, dew control of the odroid)
+// every command answers with one telemetry line, "key":value like the rocker Mega:
+//   "speed":725.00,"running":1,"stop_switch":0,"flip_switch":1,"elapsed":12.3,"position":8917,"fan":0,"temp":24.41
+// the serial line is read without blocking so that runSpeed() keeps being called
 
 #include <AccelStepper.h>
 
@@ -28,6 +36,7 @@ AccelStepper stepper1(AccelStepper::DRIVER, 9, 8);//step,dir
 #define  STOP_SWITCH  4   // switch de butée
 #define  LM35 A0
 #define  PIN_Sleep  10
+#define  PIN_FAN  3     // PWM, through a MOSFET
 
 // LED RGB
 #define PIN_BLUE 11
@@ -41,6 +50,17 @@ unsigned int currentMillis = 0;
 unsigned int measurepreviousMillis = 0;
 float temp = 0.0;
 
+// tracking speed (steps/s), can be changed by the Odroid
+float stepper_speed = 725.0;
+// PWM duty of the fan, set by the Odroid
+int fan_duty = 0;
+// time spent tracking since last reset (ms), only counted while the motor runs
+unsigned long tracking_ms = 0;
+unsigned long last_loop_ms = 0;
+// command being received from the Odroid
+char command[16];
+byte command_length = 0;
+
 void setup() {
   // The only AccelStepper value we have to set here is the max speeed, which is higher than we'll ever go
   stepper1.setMaxSpeed(10000.0);
@@ -57,13 +77,63 @@ void setup() {
   pinMode(PIN_GREEN, OUTPUT);
   pinMode(PIN_BLUE,  OUTPUT);
 
-   Serial.begin(9600);
+  pinMode(PIN_FAN, OUTPUT);
+  analogWrite(PIN_FAN, 0);
+
+   Serial.begin(115200);
+
+}
+
+void send_status() {
+  Serial.print("\"speed\":");Serial.print(stepper_speed);Serial.print(",");
+  Serial.print("\"running\":");Serial.print(stepper1.speed() != 0.0 ? 1 : 0);Serial.print(",");
+  Serial.print("\"stop_switch\":");Serial.print(digitalRead(STOP_SWITCH) == 0 ? 1 : 0);Serial.print(",");
+  Serial.print("\"flip_switch\":");Serial.print(digitalRead(FLIP_SWITCH));Serial.print(",");
+  Serial.print("\"elapsed\":");Serial.print(tracking_ms / 1000.0, 1);Serial.print(",");
+  Serial.print("\"position\":");Serial.print(-stepper1.currentPosition());Serial.print(",");
+  Serial.print("\"fan\":");Serial.print(fan_duty);Serial.print(",");
+  Serial.print("\"temp\":");Serial.println(temp);
+}
+
+void run_command() {
+  if (command[0] == 'V') {
+    float requested = atof(command + 1);
+    // keep a sane range, a typo must not send the table to the end stop
+    if ( (requested > 0) && (requested < 2000) ) {
+      stepper_speed = requested;
+    }
+  }
+  if (command[0] == 'R') {
+    stepper1.setCurrentPosition(0);
+    tracking_ms = 0;
+  }
+  if (command[0] == 'D') {
+    fan_duty = constrain(atoi(command + 1), 0, 255);
+    analogWrite(PIN_FAN, fan_duty);
+  }
+  // Y and all the commands above answer with the telemetry
+  send_status();
+}
 
+void read_serial() {
+  while (Serial.available()) {
+    char c = Serial.read();
+    if (c == '\n') {
+      command[command_length] = '\0';
+      if (command_length > 0) {
+        run_command();
+      }
+      command_length = 0;
+    }
+    else if ( (c != '\r') && (command_length < sizeof(command) - 1) ) {
+      command[command_length] = c;
+      command_length++;
+    }
+  }
 }
 
 void loop() {
 
-  const int stepper_speed = 725;
   static char sign = 0;                     // Holds -1 or 0 to turn the motor on/off 
   static float new_speed = 0.0;
 
@@ -123,4 +193,12 @@ measurepreviousMillis = millis();
 new_speed = sign * stepper_speed;
   stepper1.setSpeed(new_speed);
   stepper1.runSpeed();
+
+// tracking time and Odroid commands
+unsigned long now_ms = millis();
+if (sign != 0) {
+  tracking_ms += now_ms - last_loop_ms;
+}
+last_loop_ms = now_ms;
+read_serial();
 }